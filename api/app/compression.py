@@ -0,0 +1,160 @@
+"""
+Negotiated response compression (ASGI middleware).
+
+Brotli is used when the client accepts it and the optional brotli package is
+installed, otherwise gzip. Complete bodies below COMPRESSION_MIN_BYTES are
+sent as they are. Streamed bodies (exports) are compressed chunk by chunk and
+flushed after each one, so clients still receive data as it is produced.
+
+Compressed responses get the content coding appended to their ETag. A 304
+carries the same suffixed tag when the client revalidates with it, so the
+validator it has cached stays the one the server sends.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app import config
+from app.etags import ENCODING_SUFFIXES
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None for identity"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    accepted = [coding for coding in candidates if qualities.get(coding, qualities.get("*", 0.0)) > 0]
+    # Prefer the higher q-value; on a tie brotli, which compresses JSON better
+    return max(accepted, key=lambda coding: qualities.get(coding, qualities.get("*", 0.0)), default=None)
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The tag of the `encoding`-coded representation of a response tagged etag"""
+    # A strong tag must differ between encodings of the same content
+    suffix = ENCODING_SUFFIXES[0] if encoding == "gzip" else ENCODING_SUFFIXES[1]
+    return f'{etag[:-1]}{suffix}"' if etag.endswith('"') else etag + suffix
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config.BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 31: gzip container
+            self._zlib = zlib.compressobj(config.GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size, headers.get("if-none-match", "")))
+
+class _CompressingSend:
+    """Wraps send(): holds back the response start until the first body chunk shows how to encode it"""
+
+    def __init__(self, send, encoding: Optional[str], minimum_size: int, if_none_match: str = ""):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.if_none_match = if_none_match
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.compressor is not None:
+            more_body = message.get("more_body", False)
+            body = self.compressor.compress(message.get("body", b""), final=not more_body)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        await self._first_body(message)
+
+    async def _first_body(self, message):
+        headers = MutableHeaders(raw=self.start["headers"])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start["status"] == 304:
+            self._tag_not_modified(headers)
+
+        compressible = (
+            200 <= self.start["status"] < 300
+            and self.start["status"] != 204
+            and "content-encoding" not in headers
+            and "no-transform" not in headers.get("cache-control", "")
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+        if compressible:
+            # The representation depends on Accept-Encoding even when this one is sent as is
+            headers.add_vary_header("Accept-Encoding")
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.minimum_size):
+            self.passthrough = True
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag:
+            headers["ETag"] = encoded_etag(etag, self.encoding)
+        self.compressor = _Compressor(self.encoding)
+        body = self.compressor.compress(body, final=not more_body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _tag_not_modified(self, headers: MutableHeaders) -> None:
+        """Give a 304 the coded tag the client revalidated with, as the 200 it stands for had"""
+        etag = headers.get("etag")
+        if not etag or self.encoding is None:
+            return
+        coded = encoded_etag(etag, self.encoding)
+        listed = {tag.strip() for tag in self.if_none_match.split(",")}
+        if coded in listed or f"W/{coded}" in listed:
+            headers["ETag"] = coded
+            headers.add_vary_header("Accept-Encoding")
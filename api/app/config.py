@@ -2,7 +2,143 @@ import os
 from pathlib import Path
 
 # Database path
-DB_PATH = os.path.join(os.path.dirname(__file__), "../data/weather.db")
+DB_PATH = os.getenv("DB_PATH") or os.path.join(os.path.dirname(__file__), "../data/weather.db")
 
 # Ensure data directory exists
-Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+
+# Upstream response cache (Open-Meteo current/forecast)
+# Coordinates are snapped to this grid (degrees) so nearby lookups share an entry
+WEATHER_GRID_DEGREES = float(os.getenv("WEATHER_GRID_DEGREES", "0.1"))
+# Open-Meteo refreshes "current" conditions every 15 minutes and model output hourly
+CURRENT_CACHE_TTL = int(os.getenv("CURRENT_CACHE_TTL", "900"))
+FORECAST_CACHE_TTL = int(os.getenv("FORECAST_CACHE_TTL", "3600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "2048"))
+# Expired entries are kept this much longer and served flagged "stale" while a
+# refresh is in flight or upstream is failing
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", str(6 * 3600)))
+
+# Background refresher: every REFRESH_INTERVAL seconds, refresh the REFRESH_TOP_N
+# most requested weather entries expiring within REFRESH_LEAD_SECONDS. These and
+# the refreshes of stale entries served to clients share one budget of at most
+# REFRESH_BUDGET_PER_MINUTE upstream calls per minute
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "5"))
+REFRESH_TOP_N = int(os.getenv("REFRESH_TOP_N", "100"))
+# Refresh-ahead window, by default a fifteenth of the current-weather TTL (60 s).
+# An entry refreshed inside the window isn't refreshed again until the window has
+# passed, so a hot entry is refetched ahead of its update boundary and once after it
+REFRESH_LEAD_SECONDS = float(os.getenv("REFRESH_LEAD_SECONDS", str(CURRENT_CACHE_TTL / 15)))
+REFRESH_BUDGET_PER_MINUTE = int(os.getenv("REFRESH_BUDGET_PER_MINUTE", "60"))
+# Request counts halve over this many seconds so popularity follows recent traffic
+REFRESH_HALF_LIFE = float(os.getenv("REFRESH_HALF_LIFE", "600"))
+
+# Geocoding cache (in-memory LRU in front of the geocode_cache SQLite table)
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", "600"))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "4096"))
+# Reverse lookups are keyed by coordinates rounded to this many decimals (3 ~ 110 m)
+REVERSE_GEOCODE_PRECISION = int(os.getenv("REVERSE_GEOCODE_PRECISION", "3"))
+
+# Typeahead cache for /location/search results (keyed by normalized query and limit)
+TYPEAHEAD_CACHE_TTL = int(os.getenv("TYPEAHEAD_CACHE_TTL", "3600"))
+TYPEAHEAD_CACHE_MAX_ENTRIES = int(os.getenv("TYPEAHEAD_CACHE_MAX_ENTRIES", "2048"))
+
+# Upstream endpoints. UPSTREAM_BASE_URL points every upstream at one server
+# (e.g. bench/fake_upstream.py) keeping each API's path; the per-API variables
+# override single endpoints
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL", "").rstrip("/")
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL") or (f"{UPSTREAM_BASE_URL}/v1/forecast" if UPSTREAM_BASE_URL else "https://api.open-meteo.com/v1/forecast")
+GEOCODING_URL = os.getenv("GEOCODING_URL") or (f"{UPSTREAM_BASE_URL}/v1/search" if UPSTREAM_BASE_URL else "https://geocoding-api.open-meteo.com/v1/search")
+ARCHIVE_URL = os.getenv("ARCHIVE_URL") or (f"{UPSTREAM_BASE_URL}/v1/archive" if UPSTREAM_BASE_URL else "https://archive-api.open-meteo.com/v1/archive")
+NOMINATIM_URL = os.getenv("NOMINATIM_URL") or (f"{UPSTREAM_BASE_URL}/reverse" if UPSTREAM_BASE_URL else "https://nominatim.openstreetmap.org/reverse")
+YOUTUBE_SEARCH_URL = os.getenv("YOUTUBE_SEARCH_URL") or (f"{UPSTREAM_BASE_URL}/youtube/v3/search" if UPSTREAM_BASE_URL else "https://www.googleapis.com/youtube/v3/search")
+
+# Shared upstream HTTP client: keep-alive pool size per upstream host and
+# (connect, read) timeouts in seconds per upstream endpoint
+UPSTREAM_POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "20"))
+UPSTREAM_POOL_SIZES = {
+    "nominatim": int(os.getenv("NOMINATIM_POOL_MAXSIZE", "2")),
+}
+UPSTREAM_DEFAULT_TIMEOUT = (3.05, 10)
+UPSTREAM_TIMEOUTS = {
+    "open_meteo": (3.05, float(os.getenv("OPEN_METEO_READ_TIMEOUT", "10"))),
+    "geocoding": (3.05, float(os.getenv("GEOCODING_READ_TIMEOUT", "5"))),
+    "archive": (3.05, float(os.getenv("ARCHIVE_READ_TIMEOUT", "30"))),
+    "nominatim": (3.05, float(os.getenv("NOMINATIM_READ_TIMEOUT", "5"))),
+    "youtube": (3.05, float(os.getenv("YOUTUBE_READ_TIMEOUT", "10"))),
+}
+# Per-upstream token buckets as (requests per second, burst), following each
+# provider's published limits: Open-Meteo 600/minute, Nominatim 1/second,
+# YouTube search 100 units of a 10,000/day quota per call
+UPSTREAM_RATE_LIMITS = {
+    "open_meteo": (float(os.getenv("OPEN_METEO_RATE_LIMIT", "10")), 20),
+    "geocoding": (float(os.getenv("GEOCODING_RATE_LIMIT", "10")), 20),
+    "archive": (float(os.getenv("ARCHIVE_RATE_LIMIT", "10")), 20),
+    "nominatim": (float(os.getenv("NOMINATIM_RATE_LIMIT", "1")), 1),
+    "youtube": (float(os.getenv("YOUTUBE_RATE_LIMIT", str(100 / 86400))), 10),
+}
+# Longest a call waits for a rate-limit token before failing fast
+UPSTREAM_RATE_LIMIT_MAX_WAIT = float(os.getenv("UPSTREAM_RATE_LIMIT_MAX_WAIT", "1"))
+# Circuit breaker: open after this many consecutive failures (timeouts, transport
+# errors, 429 and 5xx responses), then probe again after the reset timeout
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+
+# Worker threads used to run blocking SQLite calls off the event loop
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
+
+# Local archive store for historical weather
+ARCHIVE_GRID_DEGREES = float(os.getenv("ARCHIVE_GRID_DEGREES", "0.1"))
+# Archive days newer than this are still provisional upstream and are not stored
+ARCHIVE_FINAL_AFTER_DAYS = int(os.getenv("ARCHIVE_FINAL_AFTER_DAYS", "7"))
+# Missing-day gaps separated by at most this many stored days are fetched in one request
+ARCHIVE_GAP_MERGE_DAYS = int(os.getenv("ARCHIVE_GAP_MERGE_DAYS", "7"))
+
+# Streaming exports flush encoded output in chunks of roughly this many bytes
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+# SQLite connection tuning (applied to every connection)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {SQLITE_SYNCHRONOUS}")
+# Negative values are KiB, so -20000 is a ~20 MB page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "256"))
+
+# POST /history/batch limits
+HISTORY_BATCH_MAX_ITEMS = int(os.getenv("HISTORY_BATCH_MAX_ITEMS", "500"))
+HISTORY_BATCH_CONCURRENCY = int(os.getenv("HISTORY_BATCH_CONCURRENCY", "8"))
+
+# Multi-location /current and /forecast
+MULTI_LOCATION_MAX = int(os.getenv("MULTI_LOCATION_MAX", "50"))
+# Coordinates sent per Open-Meteo request (bounded by URL length)
+OPEN_METEO_MAX_LOCATIONS_PER_REQUEST = int(os.getenv("OPEN_METEO_MAX_LOCATIONS_PER_REQUEST", "50"))
+
+# Rows per row group / record batch in Parquet and Arrow exports
+COLUMNAR_ROW_GROUP_SIZE = int(os.getenv("COLUMNAR_ROW_GROUP_SIZE", "65536"))
+
+# Offline gazetteer for location autocomplete: a GeoNames cities file such as
+# cities15000.txt (empty disables it). countryInfo.txt and admin1CodesASCII.txt
+# in the same directory, if present, supply country and region names.
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "")
+# Binary index compiled from GAZETTEER_PATH, rebuilt whenever the source is newer
+GAZETTEER_INDEX_PATH = os.getenv("GAZETTEER_INDEX_PATH", "") or (f"{GAZETTEER_PATH}.idx" if GAZETTEER_PATH else "")
+# Reverse geocoding with a gazetteer: nearest place within this distance
+REVERSE_GEOCODE_MAX_KM = float(os.getenv("REVERSE_GEOCODE_MAX_KM", "100"))
+# Also ask Nominatim (1 request/second policy) when the gazetteer finds nothing
+REVERSE_GEOCODE_NOMINATIM_FALLBACK = os.getenv("REVERSE_GEOCODE_NOMINATIM_FALLBACK", "false").lower() in ("1", "true", "yes")
+# Points accepted by POST /location/reverse when a gazetteer is loaded
+REVERSE_GEOCODE_BATCH_MAX = int(os.getenv("REVERSE_GEOCODE_BATCH_MAX", "1000"))
+# Points one request may send to Nominatim, one per second: the whole batch
+# without a gazetteer, the gazetteer's misses with the fallback enabled
+REVERSE_GEOCODE_NOMINATIM_BATCH_MAX = int(os.getenv("REVERSE_GEOCODE_NOMINATIM_BATCH_MAX", "5"))
+
+# Base temperature (°C) for heating/cooling degree-days in /weather/stats
+DEGREE_DAY_BASE = float(os.getenv("DEGREE_DAY_BASE", "18"))
+
+# Response compression (gzip, or brotli when the brotli package is installed)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
@@ -0,0 +1,68 @@
+"""
+ETags and conditional GETs.
+
+Weather payloads are tagged with a hash of the response body, which is built
+from cached upstream data, and may be cached until the next upstream update.
+Record listings and exports are tagged with the records version, a counter
+SQLite triggers bump on every change to weather_records, so a client that
+already has the current version gets a 304 without the records being read.
+
+CompressionMiddleware appends the content coding to the tags of compressed
+responses ("abc" -> "abc-gzip"), including the 304s answering a client that
+revalidates with such a tag; If-None-Match matching ignores that suffix.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# Suffixes CompressionMiddleware adds to the ETags of compressed representations
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def body_etag(body: bytes) -> str:
+    return f'"{_digest(body)}"'
+
+def records_etag(request: Request, version: str, weak: bool = False) -> str:
+    """Tag for a representation of the records at version; the URL distinguishes representations"""
+    tag = f'"{_digest(f"{version} {request.url.path}?{request.url.query}".encode("utf-8"))}"'
+    return f"W/{tag}" if weak else tag
+
+def _opaque(tag: str) -> str:
+    """The quoted part of a tag, without W/ or a content-coding suffix"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+def matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match lists etag (weak comparison, as RFC 9110 requires for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+def cache_headers(etag: str, max_age: Optional[int] = None) -> Dict[str, str]:
+    """ETag plus Cache-Control: max-age when the data has a known lifetime, else revalidate every time"""
+    cache_control = f"max-age={max(0, int(max_age))}" if max_age is not None else "no-cache"
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+def not_modified(etag: str, max_age: Optional[int] = None) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
+
+def json_response(request: Request, content: Any, max_age: Optional[int] = None) -> Response:
+    """Render content, tag it with a hash of the body and answer 304 if the client already has it"""
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    etag = body_etag(body)
+    if matches(request, etag):
+        return not_modified(etag, max_age)
+    return Response(body, media_type="application/json", headers=cache_headers(etag, max_age))
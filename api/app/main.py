@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -13,11 +14,29 @@ from app.routes.history import router as history_router
 from app.routes.export import router as export_router
 from app.routes.integrations import router as integrations_router
 from app.routes.location_search import router as location_search_router
+from app.routes.stats import router as stats_router
+from app.routes.weather_stats import router as weather_stats_router
+from app.routes.metrics import router as metrics_router
 
+from app.compression import CompressionMiddleware
+from app.metrics import MetricsMiddleware
 from app.repository.db import init_db
+from app.repository.weather_repo import backfill_daily_rollups, backfill_observations, encode_stored_weather_json
+from app.services.gazetteer import load_gazetteer
+from app.services.http_client import upstream_client
+from app.services.weather_service import refresh_scheduler
 
-app = FastAPI(title="Weather App API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    refresh_scheduler.start()
+    yield
+    await refresh_scheduler.stop()
+    await upstream_client.aclose()
 
+app = FastAPI(title="Weather App API", lifespan=lifespan)
+
+# Innermost, so it sees each route's own headers (Content-Type, ETag) and compresses the body once
+app.add_middleware(CompressionMiddleware)
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,19 +45,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so recorded latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
 
 init_db()
+backfill_observations()
+backfill_daily_rollups()
+encode_stored_weather_json()
+load_gazetteer()
 
 app.include_router(current_router, prefix="/api/weather")
 app.include_router(forecast_router, prefix="/api/weather")
 app.include_router(history_router, prefix="/api/weather")
 app.include_router(export_router, prefix="/api/weather")
+app.include_router(weather_stats_router, prefix="/api/weather")
 app.include_router(integrations_router, prefix="/api")
 app.include_router(location_search_router, prefix="/api/location")
+app.include_router(stats_router, prefix="/api/stats")
+app.include_router(metrics_router)
 
 
 @app.get("/")
-def root():
+async def root():
     return {"status": "ok", "message": "Weather API - try /api/weather/current?location=Toronto"}
 
 
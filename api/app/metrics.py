@@ -0,0 +1,220 @@
+"""
+Prometheus-style metrics (text exposition format, served at /metrics).
+
+Recording is lock-free on the hot path: every thread writes to its own shard,
+a plain dict only that thread mutates, and a scrape sums the shards. The event
+loop and each database executor thread therefore never contend with each other;
+a lock is only taken the first time a thread records anything.
+"""
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds; request and upstream latencies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; SQLite calls are mostly sub-millisecond
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+_local = threading.local()
+_shards: List[Dict[Tuple, list]] = []
+_shards_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+def _shard() -> Dict[Tuple, list]:
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+def _merged(metric: "_Metric") -> Dict[Tuple[str, ...], list]:
+    """Sum one metric's cells across every thread's shard"""
+    with _shards_lock:
+        shards = list(_shards)
+    merged: Dict[Tuple[str, ...], list] = {}
+    for shard in shards:
+        # dict.copy() is atomic under the GIL, so a concurrent first write can't break iteration
+        for (owner, labels), cells in shard.copy().items():
+            if owner is not metric:
+                continue
+            total = merged.get(labels)
+            if total is None:
+                merged[labels] = list(cells)
+            else:
+                for i, value in enumerate(cells):
+                    total[i] += value
+    return merged
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def _cells(self, labels: Tuple[str, ...], size: int) -> list:
+        shard = _shard()
+        key = (self, labels)
+        cells = shard.get(key)
+        if cells is None:
+            cells = shard[key] = [0] * size
+        return cells
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, cells in sorted(_merged(self).items()):
+            lines.extend(self._render_cells(labels, cells))
+        return lines
+
+    def _render_cells(self, labels: Tuple[str, ...], cells: list) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, labels)} {cells[0]}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._cells(labels, 1)[0] += amount
+
+class Gauge(_Metric):
+    """Gauge built from per-thread deltas, so inc and dec may happen on different threads"""
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._cells(labels, 1)[0] += amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._cells(labels, 1)[0] -= amount
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        # Cells: one count per bucket, one for +Inf, then the sum
+        cells = self._cells(labels, len(self.buckets) + 2)
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def _render_cells(self, labels: Tuple[str, ...], cells: list) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), cells):
+            cumulative += count
+            bucket_labels = _format_labels(self.labels, labels, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {cells[-1]}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served")
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "upstream_request_duration_seconds", "Upstream API call latency", ("upstream", "host")
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total", "Failed upstream API calls by error kind (timeout, transport or HTTP status class)",
+    ("upstream", "host", "error")
+)
+UPSTREAM_REJECTED = Counter(
+    "upstream_rejected_total", "Upstream calls refused locally (rate_limited or circuit_open)", ("upstream", "reason")
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Upstream API calls in progress", ("upstream",))
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent in weather_repo functions (generators: time inside the generator)",
+    ("function",), buckets=DB_BUCKETS
+)
+
+def timed_query(func):
+    """Record a repository function's duration in DB_QUERY_SECONDS, labelled with its name"""
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            # Only time spent producing rows counts, not time the consumer holds each one
+            generator = func(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                generator.close()
+                DB_QUERY_SECONDS.observe(elapsed, name)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, name)
+    return wrapper
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; label by its template to bound cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status[0])
+            )
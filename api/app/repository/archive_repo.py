@@ -0,0 +1,44 @@
+import json
+from .db import get_connection
+
+def get_archive_cell(grid_lat, grid_lon):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT meta_json FROM archive_cells WHERE grid_lat = ? AND grid_lon = ?",
+        (grid_lat, grid_lon)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return json.loads(row["meta_json"])
+
+def put_archive_cell(grid_lat, grid_lon, meta):
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO archive_cells (grid_lat, grid_lon, meta_json) VALUES (?, ?, ?)",
+            (grid_lat, grid_lon, json.dumps(meta))
+        )
+
+def read_archive_days(grid_lat, grid_lon, start_day, end_day):
+    """Return {day: hourly arrays} for the stored days of a grid cell within [start_day, end_day]"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT day, hourly_json FROM archive_days WHERE grid_lat = ? AND grid_lon = ? AND day BETWEEN ? AND ?",
+        (grid_lat, grid_lon, start_day, end_day)
+    )
+    rows = cursor.fetchall()
+    return {row["day"]: json.loads(row["hourly_json"]) for row in rows}
+
+def write_archive_days(grid_lat, grid_lon, days):
+    """Store {day: hourly arrays} for a grid cell"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO archive_days (grid_lat, grid_lon, day, hourly_json) VALUES (?, ?, ?, ?)",
+            [(grid_lat, grid_lon, day, json.dumps(hourly)) for day, hourly in days.items()]
+        )
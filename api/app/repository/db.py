@@ -1,17 +1,57 @@
+import asyncio
+import functools
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from app import config
 
 # ensure data directory exists
 Path(config.DB_PATH).parent.mkdir(parents=True, exist_ok=True)
 
-def get_connection():
-    conn = sqlite3.connect(config.DB_PATH)
+# SQLite calls are blocking, so async code runs them on this dedicated pool
+_db_executor = ThreadPoolExecutor(max_workers=config.DB_EXECUTOR_WORKERS, thread_name_prefix="sqlite")
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking repository function without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+# One persistent connection per thread; sqlite3 keeps a prepared-statement cache on each
+_local = threading.local()
+
+def open_connection(check_same_thread=False):
+    """
+    Open a new tuned connection that the caller owns and closes. Streaming
+    generators use these because they are resumed on whichever threadpool
+    thread serves the next chunk.
+    """
+    conn = sqlite3.connect(
+        config.DB_PATH,
+        timeout=config.SQLITE_BUSY_TIMEOUT,
+        check_same_thread=check_same_thread,
+        cached_statements=config.SQLITE_CACHED_STATEMENTS
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {config.SQLITE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {config.SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+def get_connection():
+    """Persistent connection for the calling thread (do not close it)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = open_connection(check_same_thread=True)
+        _local.conn = conn
     return conn
 
 def init_db():
-    conn = get_connection()
+    conn = open_connection()
+    # WAL lets readers proceed while a writer commits; the mode is stored in the database file
+    conn.execute("PRAGMA journal_mode = WAL")
     cursor = conn.cursor()
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS weather_records (
@@ -23,5 +63,76 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    # Backs keyset pagination over (created_at, id)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weather_records_created_at_id ON weather_records (created_at, id)")
+    # Hourly series of each record, one typed row per (record, timestamp)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_observations (
+            record_id INTEGER NOT NULL,
+            time TEXT NOT NULL,
+            temperature_2m REAL,
+            precipitation REAL,
+            wind_speed_10m REAL,
+            PRIMARY KEY (record_id, time)
+        ) WITHOUT ROWID
+    """)
+    # Per-day aggregates of each record's hourly series, maintained on insert/update (see rollups.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_daily_rollups (
+            record_id INTEGER PRIMARY KEY,
+            first_day TEXT NOT NULL,
+            last_day TEXT NOT NULL,
+            days INTEGER NOT NULL,
+            rollup BLOB NOT NULL
+        )
+    """)
+    # Bumped by triggers on every change to weather_records; record listings and exports
+    # are tagged with it (see etags.py). The random generation keeps tags from repeating
+    # if the database is recreated and the counter starts over.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weather_records_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO weather_records_version VALUES (1, lower(hex(randomblob(8))), 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS weather_records_version_{event.lower()}
+            AFTER {event} ON weather_records
+            BEGIN
+                UPDATE weather_records_version SET version = version + 1 WHERE id = 1;
+            END
+        """)
+    # Forward/reverse geocoding results; a NULL result_json marks a cached "not found"
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            kind TEXT NOT NULL,
+            query_key TEXT NOT NULL,
+            result_json TEXT,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (kind, query_key)
+        )
+    """)
+    cursor.execute("DELETE FROM geocode_cache WHERE expires_at < ?", (time.time(),))
+    # Local archive store: response metadata per grid cell, hourly arrays per (grid cell, day)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_cells (
+            grid_lat REAL NOT NULL,
+            grid_lon REAL NOT NULL,
+            meta_json TEXT NOT NULL,
+            PRIMARY KEY (grid_lat, grid_lon)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archive_days (
+            grid_lat REAL NOT NULL,
+            grid_lon REAL NOT NULL,
+            day TEXT NOT NULL,
+            hourly_json TEXT NOT NULL,
+            PRIMARY KEY (grid_lat, grid_lon, day)
+        ) WITHOUT ROWID
+    """)
     conn.commit()
     conn.close()
@@ -0,0 +1,177 @@
+"""
+Compact storage encoding for weather_records.weather_json.
+
+Archive responses are mostly hourly float arrays with a matching list of ISO
+timestamps. They are stored as a zlib-compressed blob holding a small JSON
+header (response metadata, start + step for the timestamps, per-variable
+precision and which values are ints) followed by one packed little-endian
+float32 array per variable, with NaN for missing values. decode_weather_json() rebuilds the original JSON
+text, so callers never see the difference.
+"""
+import json
+import math
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+MAGIC = b"WXZ1"
+TIME_FORMAT = "%Y-%m-%dT%H:%M"
+# Values with more decimals than this are stored as float64 instead
+MAX_FLOAT32_DECIMALS = 4
+# Larger ints can't be stored exactly as float64; such series stay JSON
+MAX_EXACT_INT = 2 ** 53
+# What earlier versions stored for an empty weather_json; the migration resets it to ''
+LEGACY_EMPTY = MAGIC + zlib.compress(struct.pack("<I", 0))
+
+def _pack(values, typecode):
+    packed = array(typecode, (math.nan if value is None else value for value in values))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed
+
+def _encode_series(values):
+    """Return (descriptor, bytes) for a numeric series, or None if it isn't one"""
+    if not all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in values):
+        return None
+    int_positions = [index for index, value in enumerate(values) if isinstance(value, int)]
+    if any(abs(values[index]) > MAX_EXACT_INT for index in int_positions):
+        return None
+
+    if len(int_positions) == sum(value is not None for value in values):
+        kind = {"kind": "int"}
+    elif int_positions:
+        # Mixed series: the ints decode back to ints, not to equal floats
+        kind = {"kind": "mixed", "int_positions": int_positions}
+    else:
+        kind = {"kind": "float"}
+    packed = _pack(values, "f")
+    # Use the fewest decimals that round float32 values back to the originals exactly
+    for precision in range(MAX_FLOAT32_DECIMALS + 1):
+        if all(value is None or round(stored, precision) == value for value, stored in zip(values, packed)):
+            return {"typecode": "f", "decimals": precision, **kind}, packed.tobytes()
+
+    return {"typecode": "d", "decimals": None, **kind}, _pack(values, "d").tobytes()
+
+def _encode_times(times):
+    """Describe a regular timestamp series as start + step, else keep the list"""
+    try:
+        parsed = [datetime.strptime(value, TIME_FORMAT) for value in times[:2]]
+    except (TypeError, ValueError):
+        return {"values": times}
+    if not parsed:
+        return {"values": times}
+
+    step = int((parsed[1] - parsed[0]).total_seconds()) if len(parsed) > 1 else 3600
+    spec = {"start": times[0], "step": step, "count": len(times)}
+    if step <= 0 or _decode_times(spec) != times:
+        return {"values": times}
+    return spec
+
+def encode_weather_json(weather_json):
+    """Encode an archive response (JSON text) for storage; returns bytes, or an empty value unchanged"""
+    if not weather_json:
+        # Kept empty so has_weather_data (length(weather_json) > 0) stays false
+        return weather_json
+    try:
+        data = json.loads(weather_json)
+    except (TypeError, ValueError):
+        data = None
+    hourly = data.get("hourly") if isinstance(data, dict) else None
+    if not isinstance(hourly, dict):
+        # Not an archive response: keep the text as-is, just compressed
+        return MAGIC + zlib.compress(struct.pack("<I", 0) + weather_json.encode("utf-8"))
+
+    header = {
+        "keys": list(data.keys()),
+        "meta": {key: value for key, value in data.items() if key != "hourly"},
+        "hourly_keys": list(hourly.keys()),
+        "time": _encode_times(hourly.get("time", [])),
+        "series": [],
+        "extra": {},
+    }
+    chunks = []
+    for name, values in hourly.items():
+        if name == "time":
+            continue
+        encoded = _encode_series(values) if isinstance(values, list) else None
+        if encoded is None:
+            header["extra"][name] = values
+            continue
+        descriptor, packed = encoded
+        header["series"].append({"name": name, "length": len(values), **descriptor})
+        chunks.append(packed)
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return MAGIC + zlib.compress(struct.pack("<I", len(header_bytes)) + header_bytes + b"".join(chunks))
+
+def _decode_times(spec):
+    if "values" in spec:
+        return spec["values"]
+    start = datetime.strptime(spec["start"], TIME_FORMAT)
+    step, count = spec["step"], spec["count"]
+    offset = start.hour * 3600 + start.minute * 60
+
+    if 86400 % step or offset % step or step % 60:
+        delta = timedelta(seconds=step)
+        return [(start + delta * i).strftime(TIME_FORMAT) for i in range(count)]
+
+    # Steps that tile the day: format each date once and append precomputed "THH:MM" suffixes
+    suffixes = [f"T{seconds // 3600:02d}:{seconds % 3600 // 60:02d}" for seconds in range(0, 86400, step)]
+    times = []
+    day = start.date()
+    first = offset // step
+    while len(times) < count:
+        prefix = day.isoformat()
+        times.extend(prefix + suffix for suffix in suffixes[first:])
+        first = 0
+        day += timedelta(days=1)
+    return times[:count]
+
+def _decode_series(descriptor, payload, offset):
+    typecode = descriptor["typecode"]
+    values = array(typecode)
+    end = offset + values.itemsize * descriptor["length"]
+    values.frombytes(payload[offset:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    # NaN != NaN marks missing values
+    decimals = descriptor["decimals"]
+    if descriptor["kind"] == "int":
+        decoded = [None if value != value else int(value) for value in values]
+    elif decimals is None:
+        decoded = [None if value != value else value for value in values]
+    else:
+        decoded = [None if value != value else round(value, decimals) for value in values]
+    for index in descriptor.get("int_positions", ()):
+        decoded[index] = int(decoded[index])
+    return decoded, end
+
+def decode_weather_json(value):
+    """Return the JSON text for a stored weather_json value (encoded blob or legacy text)"""
+    if not isinstance(value, (bytes, memoryview)) or not bytes(value[:4]) == MAGIC:
+        return value
+    payload = zlib.decompress(bytes(value[4:]))
+    (header_length,) = struct.unpack_from("<I", payload)
+    if header_length == 0:
+        return payload[4:].decode("utf-8")
+
+    header = json.loads(payload[4:4 + header_length])
+    offset = 4 + header_length
+    series = {}
+    for descriptor in header["series"]:
+        series[descriptor["name"]], offset = _decode_series(descriptor, payload, offset)
+
+    hourly = {}
+    for name in header["hourly_keys"]:
+        if name == "time":
+            hourly[name] = _decode_times(header["time"])
+        elif name in series:
+            hourly[name] = series[name]
+        else:
+            hourly[name] = header["extra"][name]
+
+    data = {key: hourly if key == "hourly" else header["meta"][key] for key in header["keys"]}
+    return json.dumps(data)
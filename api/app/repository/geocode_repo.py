@@ -0,0 +1,22 @@
+from .db import get_connection
+
+def get_geocode(kind, query_key):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT result_json, expires_at FROM geocode_cache WHERE kind = ? AND query_key = ?",
+        (kind, query_key)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(row)
+
+def put_geocode(kind, query_key, result_json, expires_at):
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO geocode_cache (kind, query_key, result_json, expires_at) VALUES (?, ?, ?, ?)",
+            (kind, query_key, result_json, expires_at)
+        )
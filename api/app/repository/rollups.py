@@ -0,0 +1,78 @@
+"""
+Daily rollups of a record's hourly arrays, stored in weather_daily_rollups
+when the record is written so stats queries never re-parse weather_json.
+
+Each record gets one row whose blob packs its days column-wise: the days (as
+int32 days since 1970-01-01) followed by one float64 array per ROLLUP_COLUMNS
+entry, all little-endian. Reading thousands of records is then one small row
+and a few np.frombuffer calls each, instead of a row per day.
+
+Days keep sums and counts rather than means, so they combine exactly into
+months, years or multi-record groups. Missing hourly values (None) are
+skipped; a day with no values for a variable has NaN for its min/max.
+"""
+import numpy as np
+
+ROLLUP_COLUMNS = (
+    "hours",
+    "temp_min", "temp_max", "temp_sum", "temp_count",
+    "precip_sum", "precip_count",
+    "wind_max", "wind_sum", "wind_count",
+)
+DAY_DTYPE = np.dtype("<i4")
+VALUE_DTYPE = np.dtype("<f8")
+
+def _series(hourly, name, count):
+    """Hourly values as float64 with NaN for None, padded to count like weather_observations"""
+    values = hourly.get(name) or []
+    series = np.full(count, np.nan)
+    length = min(count, len(values))
+    series[:length] = np.array(values[:length], dtype=float)
+    return series
+
+def _sum_count(values, starts):
+    valid = ~np.isnan(values)
+    return np.add.reduceat(np.where(valid, values, 0.0), starts), np.add.reduceat(valid.astype(float), starts)
+
+def daily_rollup_row(record_id, hourly):
+    """(record_id, first_day, last_day, days, blob) for an archive response's hourly block, or None if it has no hours"""
+    times = hourly.get("time") or []
+    if not times:
+        return None
+
+    try:
+        # 'YYYY-MM-DDTHH:MM' truncated to the day
+        days = np.array(times, dtype="U10").astype("datetime64[D]")
+        temperature = _series(hourly, "temperature_2m", len(times))
+        precipitation = _series(hourly, "precipitation", len(times))
+        wind = _series(hourly, "wind_speed_10m", len(times))
+    except (TypeError, ValueError):
+        # Not an archive response; the record simply has no rollup
+        return None
+
+    # A stable sort groups each day's hours
+    order = np.argsort(days, kind="stable")
+    days, temperature, precipitation, wind = days[order], temperature[order], precipitation[order], wind[order]
+    starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+
+    temp_sum, temp_count = _sum_count(temperature, starts)
+    precip_sum, precip_count = _sum_count(precipitation, starts)
+    wind_sum, wind_count = _sum_count(wind, starts)
+    values = np.stack([
+        np.diff(np.append(starts, len(days))).astype(float),
+        # fmin/fmax skip NaN unless every value of the day is NaN
+        np.fmin.reduceat(temperature, starts), np.fmax.reduceat(temperature, starts), temp_sum, temp_count,
+        precip_sum, precip_count,
+        np.fmax.reduceat(wind, starts), wind_sum, wind_count,
+    ])
+
+    day_numbers = days[starts].astype(np.int64)
+    blob = day_numbers.astype(DAY_DTYPE).tobytes() + values.astype(VALUE_DTYPE).tobytes()
+    first_day, last_day = str(days[starts[0]]), str(days[starts[-1]])
+    return record_id, first_day, last_day, len(starts), blob
+
+def unpack_rollup(days, blob):
+    """(days since 1970-01-01 as int32, {column: float64 array}) from a stored rollup"""
+    day_numbers = np.frombuffer(blob, dtype=DAY_DTYPE, count=days)
+    values = np.frombuffer(blob, dtype=VALUE_DTYPE, offset=days * DAY_DTYPE.itemsize).reshape(len(ROLLUP_COLUMNS), days)
+    return day_numbers, dict(zip(ROLLUP_COLUMNS, values))
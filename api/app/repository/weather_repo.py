@@ -1,49 +1,345 @@
-from .db import get_connection
+import json
+from app.metrics import timed_query
+from .db import get_connection, open_connection
+from .encoding import LEGACY_EMPTY, decode_weather_json, encode_weather_json
+from .rollups import daily_rollup_row
 
+# Typed hourly columns of weather_observations
+OBSERVATION_COLUMNS = ("temperature_2m", "precipitation", "wind_speed_10m")
+
+RECORD_COLUMNS = ("id", "location", "start_date", "end_date", "weather_json", "created_at")
+# Derived columns that can be selected without loading weather_json
+DERIVED_RECORD_COLUMNS = {"has_weather_data": "length(weather_json) > 0 AS has_weather_data"}
+
+def _record_from_row(row):
+    """Row -> dict, decoding the stored weather_json back to JSON text"""
+    record = dict(row)
+    if record.get("weather_json") is not None:
+        record["weather_json"] = decode_weather_json(record["weather_json"])
+    return record
+
+def _select_list(columns):
+    if not columns:
+        return "*"
+    unknown = [column for column in columns if column not in RECORD_COLUMNS and column not in DERIVED_RECORD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown record fields: {', '.join(unknown)}")
+    return ", ".join(DERIVED_RECORD_COLUMNS.get(column, column) for column in columns)
+
+def _parse_hourly(weather_json):
+    """The hourly block of an archive response, or {} if there is none"""
+    try:
+        return json.loads(weather_json).get("hourly", {})
+    except (TypeError, ValueError, AttributeError):
+        return {}
+
+def _observation_rows(record_id, hourly):
+    """Flatten the hourly arrays of an archive response into weather_observations rows"""
+    times = hourly.get("time", [])
+    series = [hourly.get(column, []) for column in OBSERVATION_COLUMNS]
+    return [
+        (record_id, time_str, *(values[i] if i < len(values) else None for values in series))
+        for i, time_str in enumerate(times)
+    ]
+
+INSERT_OBSERVATION_SQL = f"INSERT OR REPLACE INTO weather_observations (record_id, time, {', '.join(OBSERVATION_COLUMNS)}) VALUES (?, ?, ?, ?, ?)"
+INSERT_ROLLUP_SQL = "INSERT OR REPLACE INTO weather_daily_rollups (record_id, first_day, last_day, days, rollup) VALUES (?, ?, ?, ?, ?)"
+
+def _derived_rows(record_id, weather_json):
+    """(weather_observations rows, weather_daily_rollups rows) for a record, parsing weather_json once"""
+    hourly = _parse_hourly(weather_json)
+    rollup = daily_rollup_row(record_id, hourly)
+    return _observation_rows(record_id, hourly), [rollup] if rollup else []
+
+def _insert_derived_rows(cursor, record_id, weather_json):
+    observations, rollups = _derived_rows(record_id, weather_json)
+    cursor.executemany(INSERT_OBSERVATION_SQL, observations)
+    cursor.executemany(INSERT_ROLLUP_SQL, rollups)
+
+@timed_query
 def create_record(location, start_date, end_date, weather_json):
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO weather_records (location, start_date, end_date, weather_json) VALUES (?, ?, ?, ?)",
-        (location, start_date, end_date, weather_json)
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO weather_records (location, start_date, end_date, weather_json) VALUES (?, ?, ?, ?)",
+            (location, start_date, end_date, encode_weather_json(weather_json))
+        )
+        record_id = cursor.lastrowid
+        _insert_derived_rows(cursor, record_id, weather_json)
+    return record_id
 
+@timed_query
+def create_records(records):
+    """
+    Insert many (location, start_date, end_date, weather_json) records in a
+    single transaction. Returns the new ids in input order. Derived rows are
+    written record by record, so only one record's observations are held in
+    memory at a time.
+    """
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        record_ids = []
+        for location, start_date, end_date, weather_json in records:
+            cursor.execute(
+                "INSERT INTO weather_records (location, start_date, end_date, weather_json) VALUES (?, ?, ?, ?)",
+                (location, start_date, end_date, encode_weather_json(weather_json))
+            )
+            record_ids.append(cursor.lastrowid)
+            _insert_derived_rows(cursor, cursor.lastrowid, weather_json)
+    return record_ids
+
+@timed_query
 def read_all_records():
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM weather_records ORDER BY created_at DESC")
     rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return [_record_from_row(row) for row in rows]
+
+@timed_query
+def read_records_page(limit=None, after=None, columns=None):
+    """
+    Records newest first using keyset pagination on (created_at, id).
+    after is the (created_at, id) of the last record of the previous page.
+    Returns (records, has_more).
+    """
+    if columns:
+        # The pagination key is always returned so callers can build the next cursor
+        columns = ["id", "created_at"] + [column for column in columns if column not in ("id", "created_at")]
+    query = f"SELECT {_select_list(columns)} FROM weather_records"
+    params = []
+    if after is not None:
+        query += " WHERE (created_at, id) < (?, ?)"
+        params.extend(after)
+    query += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
 
-def update_record(record_id, location=None, start_date=None, end_date=None, weather_json=None):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE weather_records
-        SET location = COALESCE(?, location),
-            start_date = COALESCE(?, start_date),
-            end_date = COALESCE(?, end_date),
-            weather_json = COALESCE(?, weather_json)
-        WHERE id = ?
-    """, (location, start_date, end_date, weather_json, record_id))
-    conn.close()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+
+    has_more = limit is not None and len(rows) > limit
+    return [_record_from_row(row) for row in rows[:limit]], has_more
+
+@timed_query
+def update_record(record_id, location=None, start_date=None, end_date=None, weather_json=None):
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE weather_records
+            SET location = COALESCE(?, location),
+                start_date = COALESCE(?, start_date),
+                end_date = COALESCE(?, end_date),
+                weather_json = COALESCE(?, weather_json)
+            WHERE id = ?
+        """, (location, start_date, end_date, encode_weather_json(weather_json) if weather_json is not None else None, record_id))
+        if weather_json is not None and cursor.rowcount:
+            cursor.execute("DELETE FROM weather_observations WHERE record_id = ?", (record_id,))
+            cursor.execute("DELETE FROM weather_daily_rollups WHERE record_id = ?", (record_id,))
+            _insert_derived_rows(cursor, record_id, weather_json)
 
+@timed_query
 def delete_record(record_id):
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM weather_records WHERE id = ?", (record_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM weather_observations WHERE record_id = ?", (record_id,))
+        cursor.execute("DELETE FROM weather_daily_rollups WHERE record_id = ?", (record_id,))
+        cursor.execute("DELETE FROM weather_records WHERE id = ?", (record_id,))
 
-def return_record(record_id):
+@timed_query
+def return_record(record_id, columns=None):
+    """One record, or None. columns limits it to RECORD_COLUMNS/DERIVED_RECORD_COLUMNS, e.g. to skip decoding weather_json"""
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM weather_records WHERE id = ?", (record_id,))
+    cursor.execute(f"SELECT {_select_list(columns)} FROM weather_records WHERE id = ?", (record_id,))
     row = cursor.fetchone()
-    conn.close()
     if row is None:
         return None
-    return dict(row)
\ No newline at end of file
+    return _record_from_row(row)
+
+@timed_query
+def read_observations(record_id, start_time=None, end_time=None, columns=None):
+    """
+    Hourly rows of a record, optionally limited to a time slice
+    (inclusive ISO prefixes such as '2024-01-01' or '2024-01-01T06:00')
+    and a subset of OBSERVATION_COLUMNS
+    """
+    columns = list(columns) if columns else list(OBSERVATION_COLUMNS)
+    unknown = [column for column in columns if column not in OBSERVATION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown observation columns: {', '.join(unknown)}")
+
+    query = f"SELECT time, {', '.join(columns)} FROM weather_observations WHERE record_id = ?"
+    params = [record_id]
+    if start_time:
+        query += " AND time >= ?"
+        params.append(start_time)
+    if end_time:
+        # Pad date-only bounds so the whole end day is included
+        query += " AND time <= ?"
+        params.append(end_time if "T" in end_time else f"{end_time}T99")
+    query += " ORDER BY time"
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    return [dict(row) for row in rows]
+
+@timed_query
+def record_exists(record_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM weather_records WHERE id = ?", (record_id,))
+    return cursor.fetchone() is not None
+
+@timed_query
+def read_daily_rollups(record_id=None, location=None, start_day=None, end_day=None):
+    """
+    (record_id, location, days, rollup) rows, newest record first, of records
+    with days in [start_day, end_day]. Unpack rollups with rollups.unpack_rollup
+    """
+    query = """
+        SELECT r.record_id, w.location, r.days, r.rollup
+        FROM weather_daily_rollups r JOIN weather_records w ON w.id = r.record_id
+        WHERE 1 = 1
+    """
+    params = []
+    if record_id is not None:
+        query += " AND r.record_id = ?"
+        params.append(record_id)
+    if location:
+        query += " AND w.location = ? COLLATE NOCASE"
+        params.append(location)
+    if start_day:
+        query += " AND r.last_day >= ?"
+        params.append(start_day)
+    if end_day:
+        query += " AND r.first_day <= ?"
+        params.append(end_day)
+    query += " ORDER BY r.record_id DESC"
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    return [tuple(row) for row in rows]
+
+@timed_query
+def records_version():
+    """Opaque string that changes whenever any weather record is created, updated or deleted"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT generation, version FROM weather_records_version WHERE id = 1")
+    generation, version = cursor.fetchone()
+    return f"{generation}-{version}"
+
+@timed_query
+def count_records():
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM weather_records")
+    count = cursor.fetchone()[0]
+    return count
+
+@timed_query
+def iter_records(columns=None, batch_size=500):
+    """Yield records newest first straight from a cursor, optionally projecting columns"""
+    conn = open_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {_select_list(columns)} FROM weather_records ORDER BY created_at DESC, id DESC")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _record_from_row(row)
+    finally:
+        conn.close()
+
+@timed_query
+def iter_record_observations(record_id=None, batch_size=2000):
+    """
+    Yield (record_id, location, time, temperature_2m, precipitation, wind_speed_10m)
+    tuples for one record, or for every record newest first
+    """
+    conn = open_connection()
+    try:
+        cursor = conn.cursor()
+        if record_id is None:
+            cursor.execute("SELECT id, location FROM weather_records ORDER BY created_at DESC, id DESC")
+        else:
+            cursor.execute("SELECT id, location FROM weather_records WHERE id = ?", (record_id,))
+        records = cursor.fetchall()
+
+        for record in records:
+            location = record["location"]
+            cursor.execute(
+                f"SELECT time, {', '.join(OBSERVATION_COLUMNS)} FROM weather_observations WHERE record_id = ? ORDER BY time",
+                (record["id"],)
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield (record["id"], location, *row)
+    finally:
+        conn.close()
+
+@timed_query
+def backfill_observations():
+    """Populate weather_observations for records stored before the table existed"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, weather_json FROM weather_records
+            WHERE id NOT IN (SELECT DISTINCT record_id FROM weather_observations)
+        """)
+        for row in cursor.fetchall():
+            _insert_derived_rows(cursor, row["id"], decode_weather_json(row["weather_json"]))
+
+@timed_query
+def backfill_daily_rollups():
+    """Populate weather_daily_rollups for records stored before the table existed"""
+    conn = get_connection()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, weather_json FROM weather_records
+            WHERE id NOT IN (SELECT record_id FROM weather_daily_rollups)
+        """)
+        for row in cursor.fetchall():
+            rollup = daily_rollup_row(row["id"], _parse_hourly(decode_weather_json(row["weather_json"])))
+            if rollup:
+                cursor.execute(INSERT_ROLLUP_SQL, rollup)
+
+@timed_query
+def encode_stored_weather_json(batch_size=200):
+    """Migrate records still holding plain-text weather_json to the compact encoding"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    with conn:
+        cursor.execute("UPDATE weather_records SET weather_json = '' WHERE weather_json = ?", (LEGACY_EMPTY,))
+    while True:
+        cursor.execute(
+            "SELECT id, weather_json FROM weather_records WHERE typeof(weather_json) = 'text' AND weather_json != '' LIMIT ?",
+            (batch_size,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        with conn:
+            conn.executemany(
+                "UPDATE weather_records SET weather_json = ? WHERE id = ?",
+                [(encode_weather_json(row["weather_json"]), row["id"]) for row in rows]
+            )
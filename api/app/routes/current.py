@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Query, HTTPException, Request
+from typing import List, Optional
 
-from app.services import weather_service
+from app import config, etags
+from app.services import downsample, weather_service
+from app.services.resilience import UpstreamUnavailable
 from app.repository import weather_repo
 
 import traceback
@@ -10,19 +12,48 @@ from datetime import datetime, timezone
 router = APIRouter()
 
 @router.get("/current", summary="Get current weather for a location")
-def get_current(location: str = Query(..., description="City name, postal code, landmark, or 'lat,lon' coordinates")):
+async def get_current(
+    request: Request,
+    location: str = Query(..., description="City name, postal code, landmark, or 'lat,lon' coordinates"),
+    resolution: str = Query("hourly", regex="^(hourly|daily|weekly)$", description="Aggregate the hourly arrays into days or weeks"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample the hourly arrays to at most this many points (LTTB)")
+):
     """
     Example: /api/weather/current?location=Toronto
-    Returns current weather with hourly data from Open-Meteo
+    Returns current weather with hourly data from Open-Meteo, tagged with an ETag
+    and cacheable until the upstream data is next updated
     """
     try:
-        data = weather_service.fetch_current_weather(location)
+        data = await weather_service.fetch_current_weather(location)
+        if resolution != "hourly" or max_points:
+            data = downsample.downsample_payload(
+                data, "hourly_times", weather_service.CURRENT_HOURLY_SERIES, resolution, max_points,
+                primary="hourly_temperature"
+            )
         
         # Return the data directly as it's already properly formatted
-        return {"status": "success", "data": data}
+        max_age = weather_service.client_max_age(config.CURRENT_CACHE_TTL, data["stale"])
+        return etags.json_response(request, {"status": "success", "data": data}, max_age)
 
+    except UpstreamUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"Could not fetch weather for '{location}': {str(exc)}")
     except Exception as exc:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Could not fetch weather for '{location}': {str(exc)}")
 
-    
\ No newline at end of file
+@router.get("/current/multi", summary="Get current weather for several locations")
+async def get_current_multi(locations: List[str] = Query(..., description="Repeat for each location, e.g. ?locations=Toronto&locations=Paris")):
+    """
+    Example: /api/weather/current/multi?locations=Toronto&locations=Paris
+    Returns one entry per location, in request order, each with the /current payload or an error
+    """
+    if len(locations) > config.MULTI_LOCATION_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {config.MULTI_LOCATION_MAX} locations per request")
+    
+    try:
+        data = await weather_service.fetch_current_weather_many(locations)
+        return {"status": "success", "data": data}
+    
+    except Exception as exc:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"Could not fetch weather: {str(exc)}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 import json
 import csv
@@ -6,213 +6,328 @@ import io
 from datetime import datetime
 from typing import Optional
 
+from app import config, etags
 from app.repository import weather_repo
 
 router = APIRouter()
 
+CSV_HEADER = ['Date', 'Time', 'Temperature (°C)', 'Precipitation (mm)', 'Wind Speed (m/s)', 'Location']
+
+def _stream_csv(rows):
+    """
+    Encode observation rows as CSV: the header at once, so the client gets its
+    first byte before any row is read, then rows in chunks of about EXPORT_CHUNK_BYTES
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for _, location, time_str, temp, precip, wind in rows:
+        # Open-Meteo timestamps are 'YYYY-MM-DDTHH:MM', so slicing replaces datetime parsing
+        writer.writerow([time_str[:10], time_str[11:16], temp, precip, wind, location])
+        if buffer.tell() >= config.EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class _ChunkSink:
+    """Minimal writable file object that collects pyarrow output until drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+COLUMNAR_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+def _import_pyarrow():
+    """pyarrow is optional: columnar exports answer 501 when it is not installed"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Columnar export requires the pyarrow package")
+    return pyarrow
+
+def _stream_columnar(pa, rows, fmt):
+    """Encode observation rows as Parquet or an Arrow IPC stream, one row group per COLUMNAR_ROW_GROUP_SIZE rows"""
+    schema = pa.schema([
+        ('record_id', pa.int64()),
+        ('location', pa.dictionary(pa.int32(), pa.string())),
+        # Local time at the record's location, as returned by Open-Meteo
+        ('time', pa.timestamp('s')),
+        ('temperature_2m', pa.float32()),
+        ('precipitation', pa.float32()),
+        ('wind_speed_10m', pa.float32()),
+    ])
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    def batch(columns):
+        record_ids, locations, times, temps, precips, winds = columns
+        return pa.record_batch([
+            pa.array(record_ids, pa.int64()),
+            pa.array(locations, pa.string()).dictionary_encode(),
+            pa.compute.strptime(pa.array(times, pa.string()), format='%Y-%m-%dT%H:%M', unit='s'),
+            pa.array(temps, pa.float32()),
+            pa.array(precips, pa.float32()),
+            pa.array(winds, pa.float32()),
+        ], schema=schema)
+
+    columns = ([], [], [], [], [], [])
+    for row in rows:
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) >= config.COLUMNAR_ROW_GROUP_SIZE:
+            writer.write_batch(batch(columns))
+            columns = ([], [], [], [], [], [])
+            yield sink.drain()
+
+    if columns[0]:
+        writer.write_batch(batch(columns))
+    writer.close()
+    yield sink.drain()
+
+def _columnar_response(rows, fmt, filename, etag):
+    pa = _import_pyarrow()
+    media_type, extension = COLUMNAR_FORMATS[fmt]
+    return StreamingResponse(
+        _stream_columnar(pa, rows, fmt),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+            **etags.cache_headers(etag)
+        }
+    )
+
+def _check_version(request, weak=False):
+    """
+    ETag for an export of the records at their current version, and a 304 to
+    return instead of the export if the client already has it (else None)
+    """
+    etag = etags.records_etag(request, weather_repo.records_version(), weak)
+    return etag, etags.not_modified(etag) if etags.matches(request, etag) else None
+
+def _stream_json(records):
+    """Encode records as a JSON array one record at a time"""
+    yield b'[\n'
+    first = True
+    for record in records:
+        # Convert weather_json strings back to objects for better readability
+        if record.get('weather_json'):
+            try:
+                record['weather_data'] = json.loads(record['weather_json'])
+            except json.JSONDecodeError:
+                record['weather_data'] = record['weather_json']
+
+        chunk = json.dumps(record, indent=2, default=str)
+        yield (chunk if first else ',\n' + chunk).encode('utf-8')
+        first = False
+    yield b'\n]\n'
+
+def _stream_markdown(total_records):
+    """Render the Markdown summary from two cursor passes over the records table"""
+    summary_fields = ['id', 'location', 'start_date', 'end_date', 'created_at', 'has_weather_data']
+
+    yield f"""# Weather Records Export
+Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Total Records: {total_records}
+
+## Records Summary
+
+| ID | Location | Start Date | End Date | Created At |
+|---|---|---|---|---|
+""".encode('utf-8')
+
+    lines = []
+    for record in weather_repo.iter_records(summary_fields):
+        lines.append(f"| {record['id']} | {record['location']} | {record['start_date'] or ''} | {record['end_date'] or ''} | {record['created_at'] or ''} |\n")
+        if len(lines) >= 500:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+
+    lines.append("\n## Detailed Records\n\n")
+
+    for record in weather_repo.iter_records(summary_fields):
+        lines.append(f"""### Record {record['id']}: {record['location']}
+- **Location**: {record['location']}
+- **Date Range**: {record['start_date'] or ''} to {record['end_date'] or ''}
+- **Created**: {record['created_at'] or ''}
+- **Weather Data**: {'Available' if record['has_weather_data'] else 'Not available'}
+
+""")
+        if len(lines) >= 500:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+
+    yield ''.join(lines).encode('utf-8')
+
 @router.get("/export/json", summary="Export weather records as JSON")
-def export_json():
+def export_json(request: Request):
     """Export all weather records as JSON file"""
     try:
-        records = weather_repo.read_all_records()
-        
-        # Convert weather_json strings back to objects for better readability
-        for record in records:
-            if record.get('weather_json'):
-                try:
-                    record['weather_data'] = json.loads(record['weather_json'])
-                except json.JSONDecodeError:
-                    record['weather_data'] = record['weather_json']
-        
-        # Create JSON response
-        json_data = json.dumps(records, indent=2, default=str)
-        
-        # Create file-like object
-        json_file = io.StringIO(json_data)
-        
+        etag, not_modified = _check_version(request)
+        if not_modified:
+            return not_modified
+
         return StreamingResponse(
-            io.BytesIO(json_file.getvalue().encode('utf-8')),
+            _stream_json(weather_repo.iter_records()),
             media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=weather_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"}
+            headers={"Content-Disposition": f"attachment; filename=weather_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json", **etags.cache_headers(etag)}
         )
-        
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export JSON: {str(e)}")
 
 @router.get("/export/csv", summary="Export weather records as CSV")
-def export_csv():
+def export_csv(request: Request):
     """Export all weather records as CSV file with actual weather data"""
     try:
-        records = weather_repo.read_all_records()
-        
-        if not records:
+        etag, not_modified = _check_version(request)
+        if not_modified:
+            return not_modified
+
+        if weather_repo.count_records() == 0:
             raise HTTPException(status_code=404, detail="No records found to export")
-        
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header for weather data
-        writer.writerow(['Date', 'Time', 'Temperature (°C)', 'Precipitation (mm)', 'Wind Speed (m/s)', 'Location'])
-        
-        # Process each record and extract weather data
-        for record in records:
-            if not record.get('weather_json'):
-                continue
-                
-            try:
-                weather_data = json.loads(record['weather_json'])
-                location = record.get('location', '')
-                
-                # Extract hourly data arrays
-                times = weather_data.get('hourly', {}).get('time', [])
-                temperatures = weather_data.get('hourly', {}).get('temperature_2m', [])
-                precipitations = weather_data.get('hourly', {}).get('precipitation', [])
-                wind_speeds = weather_data.get('hourly', {}).get('wind_speed_10m', [])
-                
-                # Write each hourly data point as a row
-                for i, time_str in enumerate(times):
-                    # Parse datetime string (format: 2023-01-01T00:00)
-                    dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-                    date_str = dt.strftime('%Y-%m-%d')
-                    time_str_formatted = dt.strftime('%H:%M')
-                    
-                    # Get corresponding values (handle missing data gracefully)
-                    temp = temperatures[i] if i < len(temperatures) else ''
-                    precip = precipitations[i] if i < len(precipitations) else ''
-                    wind = wind_speeds[i] if i < len(wind_speeds) else ''
-                    
-                    writer.writerow([
-                        date_str,
-                        time_str_formatted,
-                        temp,
-                        precip,
-                        wind,
-                        location
-                    ])
-                    
-            except (json.JSONDecodeError, KeyError, ValueError) as e:
-                # Skip records with invalid weather data
-                continue
-        
-        # Create file-like object
-        csv_content = output.getvalue()
-        
+
         return StreamingResponse(
-            io.BytesIO(csv_content.encode('utf-8')),
+            _stream_csv(weather_repo.iter_record_observations()),
             media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=weather_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+            headers={"Content-Disposition": f"attachment; filename=weather_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", **etags.cache_headers(etag)}
         )
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export CSV: {str(e)}")
 
 @router.get("/export/markdown", summary="Export weather records as Markdown")
-def export_markdown():
+def export_markdown(request: Request):
     """Export all weather records as Markdown file"""
     try:
-        records = weather_repo.read_all_records()
-        
-        if not records:
-            raise HTTPException(status_code=404, detail="No records found to export")
-        
-        # Create Markdown content
-        markdown_content = f"""# Weather Records Export
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Total Records: {len(records)}
+        etag, not_modified = _check_version(request, weak=True)
+        if not_modified:
+            return not_modified
 
-## Records Summary
+        total_records = weather_repo.count_records()
+
+        if total_records == 0:
+            raise HTTPException(status_code=404, detail="No records found to export")
 
-| ID | Location | Start Date | End Date | Created At |
-|---|---|---|---|---|
-"""
-        
-        for record in records:
-            markdown_content += f"| {record.get('id', '')} | {record.get('location', '')} | {record.get('start_date', '')} | {record.get('end_date', '')} | {record.get('created_at', '')} |\n"
-        
-        markdown_content += "\n## Detailed Records\n\n"
-        
-        for record in records:
-            markdown_content += f"""### Record {record.get('id', '')}: {record.get('location', '')}
-- **Location**: {record.get('location', '')}
-- **Date Range**: {record.get('start_date', '')} to {record.get('end_date', '')}
-- **Created**: {record.get('created_at', '')}
-- **Weather Data**: {'Available' if record.get('weather_json') else 'Not available'}
-
-"""
-        
         return StreamingResponse(
-            io.BytesIO(markdown_content.encode('utf-8')),
+            _stream_markdown(total_records),
             media_type="text/markdown",
-            headers={"Content-Disposition": f"attachment; filename=weather_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"}
+            headers={"Content-Disposition": f"attachment; filename=weather_records_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md", **etags.cache_headers(etag)}
         )
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export Markdown: {str(e)}")
 
 @router.get("/export/record/{record_id}/csv", summary="Export specific weather record as CSV")
-def export_record_csv(record_id: int):
+def export_record_csv(request: Request, record_id: int):
     """Export a specific weather record as CSV file with actual weather data"""
     try:
-        record = weather_repo.return_record(record_id)
-        
+        etag, not_modified = _check_version(request)
+        if not_modified:
+            return not_modified
+
+        record = weather_repo.return_record(record_id, ['has_weather_data'])
+
         if not record:
             raise HTTPException(status_code=404, detail="Record not found")
-        
-        if not record.get('weather_json'):
+
+        if not record['has_weather_data']:
             raise HTTPException(status_code=404, detail="No weather data available for this record")
-        
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header for weather data
-        writer.writerow(['Date', 'Time', 'Temperature (°C)', 'Precipitation (mm)', 'Wind Speed (m/s)', 'Location'])
-        
-        try:
-            weather_data = json.loads(record['weather_json'])
-            location = record.get('location', '')
-            
-            # Extract hourly data arrays
-            times = weather_data.get('hourly', {}).get('time', [])
-            temperatures = weather_data.get('hourly', {}).get('temperature_2m', [])
-            precipitations = weather_data.get('hourly', {}).get('precipitation', [])
-            wind_speeds = weather_data.get('hourly', {}).get('wind_speed_10m', [])
-            
-            # Write each hourly data point as a row
-            for i, time_str in enumerate(times):
-                # Parse datetime string (format: 2023-01-01T00:00)
-                dt = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
-                date_str = dt.strftime('%Y-%m-%d')
-                time_str_formatted = dt.strftime('%H:%M')
-                
-                # Get corresponding values (handle missing data gracefully)
-                temp = temperatures[i] if i < len(temperatures) else ''
-                precip = precipitations[i] if i < len(precipitations) else ''
-                wind = wind_speeds[i] if i < len(wind_speeds) else ''
-                
-                writer.writerow([
-                    date_str,
-                    time_str_formatted,
-                    temp,
-                    precip,
-                    wind,
-                    location
-                ])
-                
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
-            raise HTTPException(status_code=500, detail=f"Failed to parse weather data: {str(e)}")
-        
-        # Create file-like object
-        csv_content = output.getvalue()
-        
+
         return StreamingResponse(
-            io.BytesIO(csv_content.encode('utf-8')),
+            _stream_csv(weather_repo.iter_record_observations(record_id)),
             media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=weather_record_{record_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+            headers={"Content-Disposition": f"attachment; filename=weather_record_{record_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", **etags.cache_headers(etag)}
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export record CSV: {str(e)}")
+
+@router.get("/export/{fmt}", summary="Export weather data as Parquet or Arrow")
+def export_columnar(request: Request, fmt: str):
+    """Export every observation as a Parquet file or Arrow IPC stream"""
+    try:
+        etag, not_modified = _check_version(request)
+        if not_modified:
+            return not_modified
+
+        if fmt not in COLUMNAR_FORMATS:
+            raise HTTPException(status_code=404, detail="Unknown export format")
+
+        if weather_repo.count_records() == 0:
+            raise HTTPException(status_code=404, detail="No records found to export")
+
+        return _columnar_response(weather_repo.iter_record_observations(), fmt, 'weather_data', etag)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export {fmt}: {str(e)}")
+
+@router.get("/export/record/{record_id}/{fmt}", summary="Export specific weather record as Parquet or Arrow")
+def export_record_columnar(request: Request, record_id: int, fmt: str):
+    """Export a specific weather record's observations as a Parquet file or Arrow IPC stream"""
+    try:
+        etag, not_modified = _check_version(request)
+        if not_modified:
+            return not_modified
+
+        if fmt not in COLUMNAR_FORMATS:
+            raise HTTPException(status_code=404, detail="Unknown export format")
+
+        record = weather_repo.return_record(record_id, ['has_weather_data'])
+
+        if not record:
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        if not record['has_weather_data']:
+            raise HTTPException(status_code=404, detail="No weather data available for this record")
+
+        return _columnar_response(weather_repo.iter_record_observations(record_id), fmt, f'weather_record_{record_id}', etag)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export record {fmt}: {str(e)}")
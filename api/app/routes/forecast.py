@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional
-from app.services.weather_service import fetch_5day_forecast
+from fastapi import APIRouter, Query, HTTPException, Request
+from typing import List, Optional
+from app import config, etags
+from app.services.weather_service import client_max_age, fetch_5day_forecast, fetch_5day_forecast_many
+from app.services.resilience import UpstreamUnavailable
 from app.repository import weather_repo
 
 import traceback
@@ -9,16 +11,37 @@ from datetime import datetime, timezone
 router = APIRouter()
 
 @router.get("/forecast", summary="Get 5-day forecast for a location")
-def get_forecast(location: str = Query(..., description="City name, postal code, landmark, or 'lat,lon' coordinates")):
+async def get_forecast(request: Request, location: str = Query(..., description="City name, postal code, landmark, or 'lat,lon' coordinates")):
     """
     Example: /api/weather/forecast?location=Toronto
-    Returns 5-day forecast from Open-Meteo with temps, precipitation, and wind
+    Returns 5-day forecast from Open-Meteo with temps, precipitation, and wind,
+    tagged with an ETag and cacheable until the upstream data is next updated
     """
     try:
-        data = fetch_5day_forecast(location)
+        data = await fetch_5day_forecast(location)
         
-        return {"status": "success", "data": data}
+        max_age = client_max_age(config.FORECAST_CACHE_TTL, data["stale"])
+        return etags.json_response(request, {"status": "success", "data": data}, max_age)
         
+    except UpstreamUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"Could not fetch forecast for '{location}': {str(exc)}")
     except Exception as exc:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Could not fetch forecast for '{location}': {str(exc)}")
+
+@router.get("/forecast/multi", summary="Get 5-day forecasts for several locations")
+async def get_forecast_multi(locations: List[str] = Query(..., description="Repeat for each location, e.g. ?locations=Toronto&locations=Paris")):
+    """
+    Example: /api/weather/forecast/multi?locations=Toronto&locations=Paris
+    Returns one entry per location, in request order, each with the /forecast payload or an error
+    """
+    if len(locations) > config.MULTI_LOCATION_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {config.MULTI_LOCATION_MAX} locations per request")
+    
+    try:
+        data = await fetch_5day_forecast_many(locations)
+        return {"status": "success", "data": data}
+        
+    except Exception as exc:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"Could not fetch forecasts: {str(exc)}")
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Query, HTTPException, Path
-from pydantic import BaseModel, validator
+from fastapi import APIRouter, Query, HTTPException, Path, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError, validator
+from typing import Any, Dict, List, Optional
 from datetime import datetime, date
+import asyncio
+import base64
 import json
 
+from app import config, etags
 from app.repository import weather_repo
-from app.services import weather_service
+from app.repository.db import run_db
+from app.services import downsample, geocode_cache, weather_service
+from app.services.resilience import UpstreamUnavailable
 from app.services.weather_service import fetch_historical_weather, geocode_location
 
 router = APIRouter()
@@ -78,43 +85,155 @@ class UpdateWeatherRequest(BaseModel):
                 raise ValueError('Date must be in YYYY-MM-DD format')
         return v
 
-def get_coordinates(location):
+class BatchCreateWeatherRequest(BaseModel):
+    # Items are validated one by one so a bad item is reported instead of failing the batch
+    items: List[Dict[str, Any]]
+    
+    @validator('items')
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError('At least one item is required')
+        if len(v) > config.HISTORY_BATCH_MAX_ITEMS:
+            raise ValueError(f'A batch cannot exceed {config.HISTORY_BATCH_MAX_ITEMS} items')
+        return v
+
+async def get_coordinates(location):
     """
     Convert location string to lat/lon coordinates.
     Handles coordinates (43.65,-79.38) or city names (Toronto).
     """
     try:
-        return geocode_location(location)
+        return await geocode_location(location)
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid location: {str(e)}")
 
 @router.post("/history", summary="Create a new weather record")
-def create_record(request: CreateWeatherRequest):
+async def create_record(request: CreateWeatherRequest):
     try:
-        latitude, longitude = get_coordinates(request.location)
-        data = fetch_historical_weather(longitude, latitude, request.start_date, request.end_date)
+        latitude, longitude = await get_coordinates(request.location)
+        data = await fetch_historical_weather(longitude, latitude, request.start_date, request.end_date)
         
         if data:
             weather_json = json.dumps(data)
-            weather_repo.create_record(request.location, request.start_date, request.end_date, weather_json)
+            await run_db(weather_repo.create_record, request.location, request.start_date, request.end_date, weather_json)
             return {"status": "success", "message": "Weather record created successfully"}
         else:
             return {"status": "error", "message": "Failed to fetch weather data"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     
+@router.post("/history/batch", summary="Create many weather records at once")
+async def create_records_batch(request: BatchCreateWeatherRequest):
+    """
+    Geocodes each distinct location once, fetches archives concurrently
+    (bounded by HISTORY_BATCH_CONCURRENCY) and inserts every successful item
+    in one transaction. Reports success or failure per item.
+    """
+    results: List[Dict[str, Any]] = [None] * len(request.items)
+    valid = []
+    for index, item in enumerate(request.items):
+        try:
+            valid.append((index, CreateWeatherRequest(**item)))
+        except (ValidationError, TypeError) as e:
+            results[index] = {"index": index, "status": "error", "message": str(e)}
+    
+    semaphore = asyncio.Semaphore(config.HISTORY_BATCH_CONCURRENCY)
+    
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+    
+    # Geocode each distinct location once
+    location_keys = {geocode_cache.forward_key(item.location): item.location for _, item in valid}
+    coordinates = dict(zip(location_keys, await asyncio.gather(
+        *[bounded(geocode_location(location)) for location in location_keys.values()],
+        return_exceptions=True
+    )))
+    
+    async def fetch(index, item):
+        coords = coordinates[geocode_cache.forward_key(item.location)]
+        if isinstance(coords, Exception):
+            raise ValueError(f"Invalid location: {str(coords)}")
+        latitude, longitude = coords
+        data = await bounded(fetch_historical_weather(longitude, latitude, item.start_date, item.end_date))
+        if not data:
+            raise ValueError("Failed to fetch weather data")
+        return data
+    
+    fetched = await asyncio.gather(*[fetch(index, item) for index, item in valid], return_exceptions=True)
+    
+    rows = []
+    row_indexes = []
+    for (index, item), data in zip(valid, fetched):
+        if isinstance(data, Exception):
+            results[index] = {"index": index, "status": "error", "message": str(data)}
+        else:
+            rows.append((item.location, item.start_date, item.end_date, json.dumps(data)))
+            row_indexes.append(index)
+    
+    try:
+        record_ids = await run_db(weather_repo.create_records, rows) if rows else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store weather records: {str(e)}")
+    
+    for index, record_id in zip(row_indexes, record_ids):
+        results[index] = {"index": index, "status": "success", "id": record_id}
+    
+    return {
+        "status": "success",
+        "data": {
+            "created": len(record_ids),
+            "failed": len(results) - len(record_ids),
+            "results": results
+        }
+    }
+
+def encode_cursor(record):
+    """Opaque pagination cursor for the (created_at, id) of the last record on a page"""
+    raw = json.dumps([record['created_at'], record['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return created_at, int(record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/history", summary="Get all weather records")
-def get_all_records():
+async def get_all_records(
+    http_request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit to return every record"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,location,start_date,end_date,created_at,has_weather_data")
+):
     try: 
-        records = weather_repo.read_all_records()
-        return {"status": "success", "data": records}
+        # Read the version before the records, so a concurrent write can only make the tag older than the data
+        etag = etags.records_etag(http_request, await run_db(weather_repo.records_version))
+        if etags.matches(http_request, etag):
+            return etags.not_modified(etag)
+        
+        after = decode_cursor(cursor) if cursor else None
+        columns = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        records, has_more = await run_db(weather_repo.read_records_page, limit, after, columns)
+        next_cursor = encode_cursor(records[-1]) if has_more else None
+        return JSONResponse(
+            {"status": "success", "data": records, "next_cursor": next_cursor},
+            headers=etags.cache_headers(etag)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/history/{record_id}", summary="Update a weather record")
-def update_record(record_id: int, request: UpdateWeatherRequest):
+async def update_record(record_id: int, request: UpdateWeatherRequest):
     try:
-        record = weather_repo.return_record(record_id)
+        record = await run_db(weather_repo.return_record, record_id)
         if record is None:
             raise HTTPException(status_code=404, detail="Record not found")
         
@@ -129,17 +248,17 @@ def update_record(record_id: int, request: UpdateWeatherRequest):
         )
         
         if should_fetch:
-            latitude, longitude = get_coordinates(location)
-            data = fetch_historical_weather(longitude, latitude, start_date, end_date)
+            latitude, longitude = await get_coordinates(location)
+            data = await fetch_historical_weather(longitude, latitude, start_date, end_date)
             
             if data:
                 weather_json = json.dumps(data)
             else:
                 raise HTTPException(status_code=400, detail="Failed to fetch weather data")
         else:
-            weather_json = record['weather_json']
+            weather_json = None
         
-        weather_repo.update_record(record_id, location, start_date, end_date, weather_json)
+        await run_db(weather_repo.update_record, record_id, location, start_date, end_date, weather_json)
         
         return {"status": "success", "message": "Weather record updated successfully"}
         
@@ -149,9 +268,37 @@ def update_record(record_id: int, request: UpdateWeatherRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/history/{record_id}", summary="Delete a weather record")
-def delete_record(record_id: int):
+async def delete_record(record_id: int):
     try:
-        weather_repo.delete_record(record_id)
+        await run_db(weather_repo.delete_record, record_id)
         return {"status": "success", "message": "Weather record deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/history/{record_id}/observations", summary="Get hourly observations of a weather record")
+async def get_record_observations(
+    http_request: Request,
+    record_id: int,
+    start: Optional[str] = Query(None, description="Start of the slice, e.g. 2024-01-01 or 2024-01-01T06:00"),
+    end: Optional[str] = Query(None, description="End of the slice (inclusive)"),
+    columns: Optional[str] = Query(None, description="Comma-separated subset of temperature_2m,precipitation,wind_speed_10m"),
+    resolution: str = Query("hourly", regex="^(hourly|daily|weekly)$", description="Aggregate hours into days or weeks"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample to at most this many points (LTTB on the first column)")
+):
+    try:
+        etag = etags.records_etag(http_request, await run_db(weather_repo.records_version))
+        if not await run_db(weather_repo.record_exists, record_id):
+            raise HTTPException(status_code=404, detail="Record not found")
+        if etags.matches(http_request, etag):
+            return etags.not_modified(etag)
+        
+        selected = [column.strip() for column in columns.split(',') if column.strip()] if columns else None
+        observations = await run_db(weather_repo.read_observations, record_id, start, end, selected)
+        if resolution != "hourly" or max_points:
+            # CPU-only, so it doesn't take a thread from the SQLite pool
+            observations = await asyncio.to_thread(downsample.downsample_rows, observations, resolution, max_points)
+        return JSONResponse({"status": "success", "data": observations}, headers=etags.cache_headers(etag))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
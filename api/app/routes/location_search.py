@@ -1,21 +1,31 @@
 from fastapi import APIRouter, Query, HTTPException
+from pydantic import BaseModel, confloat
 from typing import List
 
-from app.services.location_search import search_locations, get_location_details
+from app import config
+from app.services import gazetteer
+from app.services.location_search import search_locations, get_location_details, get_locations_details
 
 router = APIRouter()
 
+class ReversePoint(BaseModel):
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+
+class ReverseGeocodeRequest(BaseModel):
+    points: List[ReversePoint]
+
 @router.get("/search", summary="Search for locations with autocomplete")
-def search_locations_endpoint(
+async def search_locations_endpoint(
     query: str = Query(..., description="Search query for location", min_length=2),
     limit: int = Query(5, description="Maximum number of results", ge=1, le=10)
 ):
     """
-    Search for locations using Open-Meteo geocoding API.
+    Search for locations using the offline gazetteer or the Open-Meteo geocoding API.
     Returns location suggestions for autocomplete functionality.
     """
     try:
-        locations = search_locations(query, limit)
+        locations = await search_locations(query, limit)
         return {
             "status": "success",
             "data": {
@@ -28,7 +38,7 @@ def search_locations_endpoint(
         raise HTTPException(status_code=500, detail=f"Failed to search locations: {str(e)}")
 
 @router.get("/details", summary="Get detailed information about a location")
-def get_location_details_endpoint(
+async def get_location_details_endpoint(
     latitude: float = Query(..., description="Latitude coordinate"),
     longitude: float = Query(..., description="Longitude coordinate")
 ):
@@ -36,7 +46,7 @@ def get_location_details_endpoint(
     Get detailed information about a specific location using coordinates.
     """
     try:
-        details = get_location_details(latitude, longitude)
+        details = await get_location_details(latitude, longitude)
         if not details:
             raise HTTPException(status_code=404, detail="Location not found")
         
@@ -48,3 +58,25 @@ def get_location_details_endpoint(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get location details: {str(e)}")
+
+@router.post("/reverse", summary="Reverse geocode many coordinates at once")
+async def reverse_geocode_endpoint(request: ReverseGeocodeRequest):
+    """
+    Find the nearest place for each point. Results are in request order, with
+    null for points that could not be placed. Without a gazetteer every point
+    goes to Nominatim at one request per second, so batches are much smaller.
+    """
+    if not request.points:
+        raise HTTPException(status_code=400, detail="At least one point is required")
+    batch_max = config.REVERSE_GEOCODE_BATCH_MAX if gazetteer.is_loaded() else config.REVERSE_GEOCODE_NOMINATIM_BATCH_MAX
+    if len(request.points) > batch_max:
+        raise HTTPException(status_code=400, detail=f"At most {batch_max} points per request")
+    
+    try:
+        details = await get_locations_details([(point.latitude, point.longitude) for point in request.points])
+        return {
+            "status": "success",
+            "data": [result or None for result in details]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reverse geocode: {str(e)}")
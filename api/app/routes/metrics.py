@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Request, upstream and database latency histograms, error counters and
+    in-flight gauges in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+
+from app.services import geocode_cache, location_search, weather_service
+from app.services.http_client import upstream_client
+
+router = APIRouter()
+
+@router.get("/cache", summary="Get upstream cache hit/miss counters")
+async def get_cache_stats():
+    """
+    Returns hit/miss counters for the Open-Meteo response, geocoding and typeahead caches.
+    """
+    return {
+        "status": "success",
+        "data": {
+            "weather": weather_service.cache_stats(),
+            "geocoding": geocode_cache.stats(),
+            "typeahead": location_search.typeahead_stats(),
+            "coalesced_upstream_calls": weather_service.coalescing_stats(),
+            "refresh": weather_service.refresh_stats()
+        }
+    }
+
+@router.get("/upstream", summary="Get upstream connection pool usage")
+async def get_upstream_stats():
+    """
+    Returns per-upstream connection pool size, in-flight requests and saturation counts.
+    """
+    return {
+        "status": "success",
+        "data": upstream_client.pool_stats()
+    }
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Query, HTTPException
+from typing import Optional
+
+from app import config
+from app.repository import weather_repo
+from app.repository.db import run_db
+from app.services import weather_stats
+
+router = APIRouter()
+
+PERIOD_DESCRIPTION = "Aggregation period: day, month, year or all"
+BASE_DESCRIPTION = "Base temperature (°C) for heating/cooling degree-days"
+
+@router.get("/stats", summary="Aggregate stored weather records by location and period")
+async def get_stats(
+    period: str = Query("month", description=PERIOD_DESCRIPTION),
+    group_by: str = Query("location", description="Group records by location or record"),
+    location: Optional[str] = Query(None, description="Only records of this location (case-insensitive)"),
+    start: Optional[str] = Query(None, description="First day to include, e.g. 2024-01-01"),
+    end: Optional[str] = Query(None, description="Last day to include (inclusive)"),
+    base: float = Query(config.DEGREE_DAY_BASE, description=BASE_DESCRIPTION)
+):
+    """
+    Example: /api/weather/stats?period=month&location=Toronto
+    Returns min/max/mean temperature, precipitation total, max/mean wind and
+    degree-days per location (or record) and period. Days covered by several
+    records of a location are counted once, from the newest record.
+    """
+    try:
+        data = await weather_stats.grouped_stats(period, group_by, base, location, start, end)
+        return {"status": "success", "data": data}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stats/record/{record_id}", summary="Aggregate one weather record by period")
+async def get_record_stats(
+    record_id: int,
+    period: str = Query("day", description=PERIOD_DESCRIPTION),
+    start: Optional[str] = Query(None, description="First day to include, e.g. 2024-01-01"),
+    end: Optional[str] = Query(None, description="Last day to include (inclusive)"),
+    base: float = Query(config.DEGREE_DAY_BASE, description=BASE_DESCRIPTION)
+):
+    try:
+        if not await run_db(weather_repo.record_exists, record_id):
+            raise HTTPException(status_code=404, detail="Record not found")
+
+        data = await weather_stats.record_stats(record_id, period, base, start, end)
+        return {"status": "success", "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,6 +1,10 @@
-import requests
+import httpx
 import os
 from typing import Optional, Dict, Any
+from app import config
+from app.services.http_client import upstream_client
+
+YOUTUBE_SEARCH_URL = config.YOUTUBE_SEARCH_URL
 
 class AdditionalAPIService:
     """Service for integrating Youtube API"""
@@ -8,7 +12,7 @@ class AdditionalAPIService:
     def __init__(self):
         self.youtube_api_key = os.getenv('YOUTUBE_API_KEY', '')
     
-    def get_location_videos(self, location: str, max_results: int = 5) -> Dict[str, Any]:
+    async def get_location_videos(self, location: str, max_results: int = 5) -> Dict[str, Any]:
         """
         Get YouTube videos related to a location
         """
@@ -30,7 +34,7 @@ class AdditionalAPIService:
                 try:
                     from app.services.location_search import get_location_details
                     lat, lon = float(city_name), float(location_parts[1].strip())
-                    location_details = get_location_details(lat, lon)
+                    location_details = await get_location_details(lat, lon)
                     if location_details and location_details.get('name'):
                         city_name = location_details['name']
                         search_query = f'"{city_name}" city guide attractions'
@@ -49,7 +53,6 @@ class AdditionalAPIService:
                     f'"{city_name}" landmarks attractions'
                 ]
                 search_query = search_queries[0]
-            url = "https://www.googleapis.com/youtube/v3/search"
             params = {
                 'part': 'snippet',
                 'q': search_query,
@@ -59,7 +62,7 @@ class AdditionalAPIService:
                 'order': 'relevance'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = await upstream_client.get("youtube", YOUTUBE_SEARCH_URL, params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -83,7 +86,7 @@ class AdditionalAPIService:
                 "total_results": len(videos)
             }
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 "error": f"YouTube API request failed: {str(e)}",
                 "videos": [],
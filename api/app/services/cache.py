@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with per-entry TTL and bounded LRU eviction.
+    With stale_ttl, expired entries are kept that much longer for get_stale()
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300, stale_ttl: float = 0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        entry = self.get_stale(key)
+        if entry is None or not entry[1]:
+            return default
+        return entry[0]
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """
+        Return (value, fresh) for key, where an expired entry still within
+        stale_ttl comes back with fresh=False, or None if there is no usable entry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] + self.stale_ttl <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry[1] <= now:
+                self.stale_hits += 1
+                return entry[0], False
+            self.hits += 1
+            return entry[0], True
+
+    def expires_in(self, key: Hashable) -> Optional[float]:
+        """Seconds until key expires (negative once expired), or None if not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else entry[1] - time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key for ttl seconds (default_ttl if not given)"""
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
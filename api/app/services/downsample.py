@@ -0,0 +1,149 @@
+"""
+Reduce hourly series to chart-sized payloads.
+
+resample() aggregates hours into calendar days or ISO weeks (Monday start):
+precipitation is summed, weather codes take the maximum (the most severe
+weather), everything else is averaged. lttb_indices() picks max_points
+samples with Largest-Triangle-Three-Buckets, which keeps peaks and troughs
+that plain striding would drop. Missing values (None) are skipped by both.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RESOLUTIONS = ("hourly", "daily", "weekly")
+# How each series is aggregated by resample(); anything else is averaged
+AGGREGATIONS = {
+    "precipitation": "sum",
+    "hourly_precipitation": "sum",
+    "weather_code": "max",
+    "hourly_weather_codes": "max",
+}
+
+Series = Dict[str, list]
+
+def _to_array(values: Sequence) -> np.ndarray:
+    # None becomes NaN
+    return np.array(values, dtype=float)
+
+def _to_list(array: np.ndarray) -> list:
+    return [None if value != value else value for value in np.round(array, 2).tolist()]
+
+def _day_numbers(times: Sequence[str]) -> np.ndarray:
+    """Days since 1970-01-01 from 'YYYY-MM-DDTHH:MM' timestamps"""
+    return np.array(times, dtype="U10").astype("datetime64[D]").astype(np.int64)
+
+def resample(times: Sequence[str], series: Series, resolution: str) -> Tuple[List[str], Series]:
+    """Aggregate hourly series into days or weeks; returned times are each period's first day"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(RESOLUTIONS)}")
+    if resolution == "hourly" or not len(times):
+        return list(times), series
+
+    periods = _day_numbers(times)
+    if resolution == "weekly":
+        # 1970-01-01 was a Thursday; step back to the Monday of each week
+        periods = periods - (periods + 3) % 7
+    order = np.argsort(periods, kind="stable")
+    periods = periods[order]
+    starts = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+    labels = np.datetime_as_string(periods[starts].astype("datetime64[D]")).tolist()
+
+    resampled = {}
+    for name, values in series.items():
+        values = _to_array(values)[order]
+        valid = ~np.isnan(values)
+        aggregation = AGGREGATIONS.get(name, "mean")
+        if aggregation == "max":
+            # Codes stay integers
+            resampled[name] = [None if value != value else int(value) for value in np.fmax.reduceat(values, starts).tolist()]
+            continue
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        count = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = np.where(count > 0, total if aggregation == "sum" else total / count, np.nan)
+        resampled[name] = _to_list(result)
+    return labels, resampled
+
+def _positions(times: Sequence[str]) -> np.ndarray:
+    """x coordinates for LTTB: minutes since the epoch, or the index if times don't parse"""
+    try:
+        return np.array(times, dtype="datetime64[m]").astype(np.int64).astype(float)
+    except (TypeError, ValueError):
+        return np.arange(len(times), dtype=float)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the max_points samples Largest-Triangle-Three-Buckets keeps.
+    The first and last samples are always kept; the rest are split into
+    max_points - 2 buckets and each contributes the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    Bucket averages and triangle areas are computed with NumPy; only the walk
+    from bucket to bucket, which depends on the previous choice, is a loop.
+    """
+    count = len(y)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+    bucket_starts, bucket_ends = edges[:-1], edges[1:]
+
+    # Average of every bucket, with the last sample standing in after the last bucket
+    valid = ~np.isnan(y)
+    y_filled = np.where(valid, y, 0.0)
+    x_sums = np.add.reduceat(x[:count - 1], bucket_starts)
+    y_sums = np.add.reduceat(y_filled[:count - 1], bucket_starts)
+    y_counts = np.add.reduceat(valid[:count - 1].astype(np.int64), bucket_starts)
+    sizes = bucket_ends - bucket_starts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average_x = np.append(x_sums / sizes, x[-1])[1:]
+        average_y = np.append(np.where(y_counts > 0, y_sums / y_counts, np.nan), y[-1])[1:]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(bucket_starts.tolist(), bucket_ends.tolist())):
+        ax, ay = x[previous], y[previous]
+        cx, cy = average_x[bucket], average_y[bucket]
+        bx, by = x[start:end], y[start:end]
+        areas = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+        # A missing value is only kept if the whole bucket is missing
+        areas = np.where(np.isnan(areas), np.where(np.isnan(by), -2.0, -1.0), areas)
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample(times: Sequence[str], series: Series, resolution: str = "hourly",
+               max_points: Optional[int] = None, primary: Optional[str] = None) -> Tuple[List[str], Series]:
+    """
+    Resample to resolution, then, if more than max_points remain, keep the
+    LTTB samples of the primary series (the first series by default) across
+    every series, so rows stay aligned
+    """
+    times, series = resample(times, series, resolution)
+    if max_points is None or len(times) <= max_points or not series:
+        return list(times), series
+
+    primary = primary or next(iter(series))
+    indices = lttb_indices(_positions(times), _to_array(series[primary]), max_points).tolist()
+    return [times[i] for i in indices], {name: [values[i] for i in indices] for name, values in series.items()}
+
+def downsample_rows(rows: List[dict], resolution: str = "hourly", max_points: Optional[int] = None,
+                    time_key: str = "time") -> List[dict]:
+    """downsample() for row dicts such as read_observations() returns"""
+    if not rows or (resolution == "hourly" and (max_points is None or len(rows) <= max_points)):
+        return rows
+    names = [name for name in rows[0] if name != time_key]
+    times, series = downsample(
+        [row[time_key] for row in rows],
+        {name: [row[name] for row in rows] for name in names},
+        resolution, max_points
+    )
+    return [dict(zip((time_key, *names), values)) for values in zip(times, *series.values())]
+
+def downsample_payload(payload: dict, time_key: str, series_keys: Sequence[str], resolution: str = "hourly",
+                       max_points: Optional[int] = None, primary: Optional[str] = None) -> dict:
+    """Apply downsample() to parallel arrays inside a payload such as the /current response"""
+    series = {key: payload[key] for key in series_keys if payload.get(key) is not None}
+    times, series = downsample(payload.get(time_key) or [], series, resolution, max_points, primary)
+    return {**payload, time_key: times, **series}
@@ -0,0 +1,339 @@
+"""
+Offline gazetteer for location autocomplete and reverse geocoding.
+
+Built from a GeoNames cities file (cities500/1000/5000/15000.txt). The text
+file is compiled once into a binary index next to it and memory-mapped, so
+startup is fast and pages are only loaded as lookups touch them:
+
+    header   magic, place count, key count, section offsets
+    places   fixed-width (latitude, longitude, population, name, admin1,
+             country, timezone) rows; strings are offsets into the string table
+    keys     fixed-width (key, place, population) rows sorted by key bytes
+    strings  length-prefixed UTF-8 strings, each stored once
+    cells    start offsets into the cell entries, one per CELL_DEGREES grid cell
+    entries  (latitude, longitude, place) rows grouped by grid cell
+
+Each place is indexed under its normalized name and ASCII name. A prefix
+search is two binary searches over the key table followed by picking the most
+populous places in that range. A reverse lookup scans the grid cells within
+REVERSE_GEOCODE_MAX_KM of the point for the nearest place.
+"""
+import heapq
+import math
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app import config
+
+MAGIC = b"WXG2"
+HEADER = struct.Struct("<4sIIIIIII")
+PLACE = struct.Struct("<ddIIIII")
+KEY = struct.Struct("<III")
+STRING_LENGTH = struct.Struct("<H")
+CELL_OFFSET = struct.Struct("<II")
+CELL_ENTRY = struct.Struct("<ffI")
+CELL_ENTRY_DTYPE = np.dtype([("latitude", "<f4"), ("longitude", "<f4"), ("place", "<u4")])
+
+CELL_DEGREES = 0.5
+GRID_ROWS = int(180 / CELL_DEGREES)
+GRID_COLUMNS = int(360 / CELL_DEGREES)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# GeoNames main-table columns
+NAME, ASCII_NAME, LATITUDE, LONGITUDE, COUNTRY_CODE, ADMIN1_CODE, POPULATION, TIMEZONE = 1, 2, 4, 5, 8, 10, 14, 17
+
+def normalize(text: str) -> str:
+    """Case-fold and collapse whitespace so keys and queries compare equal"""
+    return " ".join(text.casefold().split())
+
+def _cell(latitude: float, longitude: float):
+    """(row, column) of the grid cell containing a point"""
+    row = min(GRID_ROWS - 1, max(0, int((latitude + 90) / CELL_DEGREES)))
+    column = int((longitude + 180) / CELL_DEGREES) % GRID_COLUMNS
+    return row, column
+
+def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _read_country_names(path: str) -> Dict[str, str]:
+    """ISO code -> country name from GeoNames countryInfo.txt"""
+    names = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as source:
+            for line in source:
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > 4:
+                    names[fields[0]] = fields[4]
+    return names
+
+def _read_admin1_names(path: str) -> Dict[str, str]:
+    """'CC.code' -> first-level division name from GeoNames admin1CodesASCII.txt"""
+    names = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as source:
+            for line in source:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > 1:
+                    names[fields[0]] = fields[1]
+    return names
+
+def build_index(source_path: str, index_path: str) -> None:
+    """Compile a GeoNames cities file into the binary index format"""
+    directory = os.path.dirname(os.path.abspath(source_path))
+    countries = _read_country_names(os.path.join(directory, "countryInfo.txt"))
+    admin1 = _read_admin1_names(os.path.join(directory, "admin1CodesASCII.txt"))
+
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        offset = string_offsets.get(text)
+        if offset is None:
+            encoded = text.encode("utf-8")[:0xFFFF]
+            offset = string_offsets[text] = len(strings)
+            strings.extend(STRING_LENGTH.pack(len(encoded)) + encoded)
+        return offset
+
+    places = bytearray()
+    keys = []
+    cells: Dict[int, List[bytes]] = {}
+    with open(source_path, encoding="utf-8") as source:
+        for line in source:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) <= TIMEZONE:
+                continue
+            try:
+                latitude, longitude = float(fields[LATITUDE]), float(fields[LONGITUDE])
+                population = min(int(fields[POPULATION] or 0), 0xFFFFFFFF)
+            except ValueError:
+                continue
+
+            country_code = fields[COUNTRY_CODE]
+            place = len(places) // PLACE.size
+            places += PLACE.pack(
+                latitude,
+                longitude,
+                population,
+                intern(fields[NAME]),
+                intern(admin1.get(f"{country_code}.{fields[ADMIN1_CODE]}", "")),
+                intern(countries.get(country_code, country_code)),
+                intern(fields[TIMEZONE])
+            )
+            row, column = _cell(latitude, longitude)
+            cells.setdefault(row * GRID_COLUMNS + column, []).append(CELL_ENTRY.pack(latitude, longitude, place))
+            for key in {normalize(fields[NAME]), normalize(fields[ASCII_NAME])}:
+                if key:
+                    keys.append((key.encode("utf-8"), place, population))
+
+    keys.sort()
+    key_table = bytearray()
+    for key, place, population in keys:
+        key_table += KEY.pack(intern(key.decode("utf-8")), place, population)
+
+    # Offset table has one extra slot so cell i spans offsets[i]..offsets[i + 1]
+    cell_offsets = bytearray()
+    cell_entries = bytearray()
+    for cell in range(GRID_ROWS * GRID_COLUMNS):
+        cell_offsets += struct.pack("<I", len(cell_entries) // CELL_ENTRY.size)
+        cell_entries += b"".join(cells.get(cell, ()))
+    cell_offsets += struct.pack("<I", len(cell_entries) // CELL_ENTRY.size)
+
+    places_offset = HEADER.size
+    keys_offset = places_offset + len(places)
+    strings_offset = keys_offset + len(key_table)
+    cells_offset = strings_offset + len(strings)
+    entries_offset = cells_offset + len(cell_offsets)
+    header = HEADER.pack(
+        MAGIC, len(places) // PLACE.size, len(keys),
+        places_offset, keys_offset, strings_offset, cells_offset, entries_offset
+    )
+
+    # Write to a temporary file so a running process never maps a half-written index
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, "wb") as index:
+        index.write(header)
+        index.write(places)
+        index.write(key_table)
+        index.write(strings)
+        index.write(cell_offsets)
+        index.write(cell_entries)
+    os.replace(temp_path, index_path)
+
+class Gazetteer:
+    """Read-only view of a memory-mapped gazetteer index"""
+
+    def __init__(self, index_path: str):
+        with open(index_path, "rb") as index:
+            self._map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{index_path} is not a current gazetteer index")
+        (_, self.place_count, self.key_count, self._places, self._keys,
+         self._strings, self._cells, self._entries) = HEADER.unpack_from(self._map)
+
+    def _string(self, offset: int) -> str:
+        start = self._strings + offset
+        (length,) = STRING_LENGTH.unpack_from(self._map, start)
+        return self._map[start + 2:start + 2 + length].decode("utf-8")
+
+    def _key(self, position: int) -> bytes:
+        (offset,) = struct.unpack_from("<I", self._map, self._keys + position * KEY.size)
+        start = self._strings + offset
+        (length,) = STRING_LENGTH.unpack_from(self._map, start)
+        return self._map[start + 2:start + 2 + length]
+
+    def place(self, index: int) -> Dict[str, Any]:
+        """Return a place in the shape of an Open-Meteo geocoding result"""
+        latitude, longitude, population, name, admin1, country, timezone = PLACE.unpack_from(
+            self._map, self._places + index * PLACE.size
+        )
+        return {
+            "name": self._string(name),
+            "country": self._string(country),
+            "admin1": self._string(admin1),
+            "admin2": "",
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone": self._string(timezone),
+            "population": population,
+        }
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Most populous places whose name starts with the query. Anything after a
+        comma ("Springfield, Illinois") must prefix-match the admin1 or country
+        """
+        parts = [normalize(part) for part in query.split(",")]
+        prefix = parts[0].encode("utf-8")
+        qualifiers = [part for part in parts[1:] if part]
+        if not prefix:
+            return []
+
+        positions = range(self.key_count)
+        low = bisect_left(positions, prefix, key=self._key)
+        # UTF-8 never contains 0xFF, so this sorts after every key with the prefix
+        high = bisect_left(positions, prefix + b"\xff", lo=low, key=self._key)
+        if low == high:
+            return []
+
+        # A place can match under both its name and its ASCII name
+        populations = {
+            place: population
+            for _, place, population in KEY.iter_unpack(self._map[self._keys + low * KEY.size:self._keys + high * KEY.size])
+        }
+        ranked = heapq.nlargest(len(populations) if qualifiers else limit, populations, key=populations.get)
+
+        results = []
+        for place in ranked:
+            details = self.place(place)
+            if qualifiers and not all(
+                normalize(details["admin1"]).startswith(qualifier) or normalize(details["country"]).startswith(qualifier)
+                for qualifier in qualifiers
+            ):
+                continue
+            results.append(details)
+            if len(results) >= limit:
+                break
+        return results
+
+    def _candidates(self, row: int, column: int, max_km: float) -> np.ndarray:
+        """CELL_ENTRY_DTYPE records for every place in cells that may lie within max_km of the cell"""
+        row_span = math.ceil(max_km / KM_PER_DEGREE / CELL_DEGREES)
+        # Longitude degrees shrink towards the poles, so size the span for the band's poleward edge
+        edge = min(90.0, max(abs(row * CELL_DEGREES - 90), abs((row + 1) * CELL_DEGREES - 90)) + row_span * CELL_DEGREES)
+        shrink = math.cos(math.radians(edge))
+        column_span = GRID_COLUMNS if shrink < 1e-6 else math.ceil(max_km / (KM_PER_DEGREE * shrink) / CELL_DEGREES)
+        columns = range(GRID_COLUMNS) if 2 * column_span + 1 >= GRID_COLUMNS else [
+            (column + offset) % GRID_COLUMNS for offset in range(-column_span, column_span + 1)
+        ]
+
+        chunks = []
+        for candidate_row in range(max(0, row - row_span), min(GRID_ROWS - 1, row + row_span) + 1):
+            for candidate_column in columns:
+                start, end = CELL_OFFSET.unpack_from(self._map, self._cells + (candidate_row * GRID_COLUMNS + candidate_column) * 4)
+                if start != end:
+                    # Slicing copies, so no array keeps the map from being closed on reload
+                    chunks.append(self._map[self._entries + start * CELL_ENTRY.size:self._entries + end * CELL_ENTRY.size])
+        return np.frombuffer(b"".join(chunks), dtype=CELL_ENTRY_DTYPE)
+
+    def nearest_many(self, points: List[tuple], max_km: float) -> List[Optional[Dict[str, Any]]]:
+        """
+        Nearest place within max_km for each (latitude, longitude), or None.
+        Points in the same grid cell share one candidate scan, and each point's
+        distances to all candidates are computed at once with NumPy
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(points)
+        by_cell: Dict[tuple, List[int]] = {}
+        for position, (latitude, longitude) in enumerate(points):
+            by_cell.setdefault(_cell(latitude, longitude), []).append(position)
+
+        for (row, column), positions in by_cell.items():
+            candidates = self._candidates(row, column, max_km)
+            if not len(candidates):
+                continue
+            candidate_phi = np.radians(candidates["latitude"].astype(float))
+            candidate_lambda = np.radians(candidates["longitude"].astype(float))
+            cos_candidate_phi = np.cos(candidate_phi)
+            for position in positions:
+                latitude, longitude = points[position]
+                phi, lam = math.radians(latitude), math.radians(longitude)
+                # Same formula as haversine_km
+                a = (np.sin((candidate_phi - phi) / 2) ** 2
+                     + math.cos(phi) * cos_candidate_phi * np.sin((candidate_lambda - lam) / 2) ** 2)
+                distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+                best = int(np.argmin(distances))
+                if distances[best] <= max_km:
+                    place = int(candidates["place"][best])
+                    results[position] = {**self.place(place), "distance_km": round(float(distances[best]), 3)}
+        return results
+
+    def close(self) -> None:
+        self._map.close()
+
+_gazetteer: Optional[Gazetteer] = None
+
+def load_gazetteer() -> Optional[Gazetteer]:
+    """Open the configured gazetteer, (re)building its index if the source file is newer"""
+    global _gazetteer
+    if not config.GAZETTEER_PATH:
+        return None
+
+    source_path, index_path = config.GAZETTEER_PATH, config.GAZETTEER_INDEX_PATH
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(source_path):
+        build_index(source_path, index_path)
+
+    if _gazetteer is not None:
+        _gazetteer.close()
+    try:
+        _gazetteer = Gazetteer(index_path)
+    except ValueError:
+        # Index written by an older format version
+        build_index(source_path, index_path)
+        _gazetteer = Gazetteer(index_path)
+    return _gazetteer
+
+def is_loaded() -> bool:
+    return _gazetteer is not None
+
+def search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """Local prefix search; empty when no gazetteer is loaded or nothing matches"""
+    if _gazetteer is None:
+        return []
+    return _gazetteer.search(query, limit)
+
+def nearest_many(points: List[tuple]) -> List[Optional[Dict[str, Any]]]:
+    """Local reverse geocoding for many points; all None when no gazetteer is loaded"""
+    if _gazetteer is None:
+        return [None] * len(points)
+    return _gazetteer.nearest_many(points, config.REVERSE_GEOCODE_MAX_KM)
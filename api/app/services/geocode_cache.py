@@ -0,0 +1,60 @@
+import json
+import time
+from typing import Any, Optional
+
+from app import config
+from app.repository import geocode_repo
+from app.repository.db import run_db
+from app.services.cache import TTLCache
+
+FORWARD = "forward"
+REVERSE = "reverse"
+
+# Returned by lookup() for a negatively cached ("not found") query
+NOT_FOUND = object()
+
+# In-memory LRU in front of the persistent geocode_cache table
+_memory = TTLCache(max_entries=config.GEOCODE_CACHE_MAX_ENTRIES, default_ttl=config.GEOCODE_CACHE_TTL)
+
+def forward_key(name: str) -> str:
+    """Normalize a place name so trivially different spellings share an entry"""
+    return " ".join(name.lower().split())
+
+def reverse_key(latitude: float, longitude: float) -> str:
+    """Key reverse lookups by rounded coordinates"""
+    precision = config.REVERSE_GEOCODE_PRECISION
+    return f"{latitude:.{precision}f},{longitude:.{precision}f}"
+
+async def lookup(kind: str, query_key: str) -> Optional[Any]:
+    """
+    Return the cached result for a query, NOT_FOUND if the query is
+    negatively cached, or None if nothing usable is cached
+    """
+    value = _memory.get((kind, query_key))
+    if value is not None:
+        return value
+
+    row = await run_db(geocode_repo.get_geocode, kind, query_key)
+    now = time.time()
+    if row is None or row["expires_at"] <= now:
+        return None
+
+    value = NOT_FOUND if row["result_json"] is None else json.loads(row["result_json"])
+    _memory.set((kind, query_key), value, ttl=row["expires_at"] - now)
+    return value
+
+async def store(kind: str, query_key: str, result: Optional[Any]) -> None:
+    """Cache a result; None caches a "not found" with the short negative TTL"""
+    ttl = config.GEOCODE_NEGATIVE_TTL if result is None else config.GEOCODE_CACHE_TTL
+    _memory.set((kind, query_key), NOT_FOUND if result is None else result, ttl=ttl)
+    await run_db(
+        geocode_repo.put_geocode,
+        kind,
+        query_key,
+        None if result is None else json.dumps(result),
+        time.time() + ttl
+    )
+
+def stats():
+    """Hit/miss counters for the in-memory layer"""
+    return _memory.stats()
@@ -0,0 +1,132 @@
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import config, metrics
+from app.services.resilience import CircuitBreaker, TokenBucket, UpstreamUnavailable
+
+class UpstreamClient:
+    """
+    Shared async HTTP client with a keep-alive connection pool, a rate limiter
+    and a circuit breaker per upstream host
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._limiters: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _register(self, upstream: str, url: str) -> Dict[str, Any]:
+        """Create a dedicated connection pool for an upstream on first use"""
+        stats = self._stats.get(upstream)
+        if stats is None:
+            pool_maxsize = config.UPSTREAM_POOL_SIZES.get(upstream, config.UPSTREAM_POOL_MAXSIZE)
+            connect, read = config.UPSTREAM_TIMEOUTS.get(upstream, config.UPSTREAM_DEFAULT_TIMEOUT)
+            # Requests beyond the pool size open throwaway connections (no keep-alive)
+            self._clients[upstream] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_maxsize),
+                timeout=httpx.Timeout(read, connect=connect)
+            )
+            rate = config.UPSTREAM_RATE_LIMITS.get(upstream)
+            if rate is not None:
+                self._limiters[upstream] = TokenBucket(*rate)
+            self._breakers[upstream] = CircuitBreaker(config.UPSTREAM_BREAKER_FAILURES, config.UPSTREAM_BREAKER_RESET_SECONDS)
+            stats = {
+                "host": urlsplit(url).netloc,
+                "pool_maxsize": pool_maxsize,
+                "in_flight": 0,
+                "peak_in_flight": 0,
+                "requests": 0,
+                "saturated_requests": 0,
+                "rate_limited": 0,
+                "circuit_open": 0,
+            }
+            self._stats[upstream] = stats
+        return stats
+
+    async def get(self, upstream: str, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        GET url through the pool for the named upstream, using that upstream's
+        (connect, read) timeouts from config.UPSTREAM_TIMEOUTS. Raises
+        UpstreamUnavailable without calling out when the upstream's circuit is
+        open or no rate-limit token frees up within UPSTREAM_RATE_LIMIT_MAX_WAIT
+        """
+        stats = self._register(upstream, url)
+        breaker = self._breakers[upstream]
+        if not breaker.allow():
+            self._reject(upstream, stats, "circuit_open")
+        limiter = self._limiters.get(upstream)
+        if limiter is not None and not await limiter.acquire(config.UPSTREAM_RATE_LIMIT_MAX_WAIT):
+            # Nothing reached the upstream, so a half-open circuit's probe is still to be made
+            breaker.release()
+            self._reject(upstream, stats, "rate_limited")
+        
+        stats["requests"] += 1
+        if stats["in_flight"] >= stats["pool_maxsize"]:
+            stats["saturated_requests"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        metrics.UPSTREAM_REQUESTS_IN_FLIGHT.inc(upstream)
+        start = time.perf_counter()
+        try:
+            response = await self._clients[upstream].get(url, params=params, headers=headers)
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            metrics.UPSTREAM_ERRORS.inc(upstream, stats["host"], "timeout")
+            raise
+        except httpx.HTTPError:
+            breaker.record_failure()
+            metrics.UPSTREAM_ERRORS.inc(upstream, stats["host"], "transport")
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            metrics.UPSTREAM_REQUESTS_IN_FLIGHT.dec(upstream)
+            metrics.UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, upstream, stats["host"])
+        
+        if response.status_code >= 400:
+            metrics.UPSTREAM_ERRORS.inc(upstream, stats["host"], f"{response.status_code // 100}xx")
+        # Other 4xx responses are our request's fault, not a sign the upstream is unhealthy
+        if response.status_code == 429 or response.status_code >= 500:
+            breaker.record_failure(_retry_after(response))
+        else:
+            breaker.record_success()
+        return response
+
+    def _reject(self, upstream: str, stats: Dict[str, Any], reason: str) -> None:
+        stats[reason] += 1
+        metrics.UPSTREAM_REJECTED.inc(upstream, reason)
+        raise UpstreamUnavailable(upstream, reason)
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-upstream pool usage, including how often the pool was saturated"""
+        return {
+            upstream: {
+                **stats,
+                "saturation": round(stats["in_flight"] / stats["pool_maxsize"], 4),
+                "circuit": self._breakers[upstream].state,
+            }
+            for upstream, stats in self._stats.items()
+        }
+
+    async def aclose(self) -> None:
+        """Close every pooled connection (called on application shutdown)"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        self._limiters.clear()
+        self._breakers.clear()
+        self._stats.clear()
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (the delta-seconds form only)"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+# Create a global instance
+upstream_client = UpstreamClient()
@@ -1,15 +1,71 @@
-import requests
-from typing import List, Dict, Any
+import asyncio
+import httpx
+from typing import List, Dict, Any, Tuple
+from app import config
+from app.services import gazetteer, geocode_cache
+from app.services.cache import TTLCache
+from app.services.http_client import upstream_client
 from app.services.weather_service import GEOCODING_URL
 
-def search_locations(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+NOMINATIM_URL = config.NOMINATIM_URL
+
+# Upstream search results keyed by (normalized query, limit). A result with
+# fewer entries than its limit is every match for that query, so it is also
+# stored under (query, COMPLETE) and reused to answer longer queries locally.
+# Upstream only exact-matches names shorter than TYPEAHEAD_MIN_PREFIX, so
+# shorter queries never count as complete.
+_typeahead = TTLCache(max_entries=config.TYPEAHEAD_CACHE_MAX_ENTRIES, default_ttl=config.TYPEAHEAD_CACHE_TTL)
+COMPLETE = "complete"
+TYPEAHEAD_MIN_PREFIX = 3
+
+def _match_keys(result: Dict[str, Any]) -> Tuple[str, ...]:
+    """Normalized fields of an upstream result a query prefix can match: names and postal codes"""
+    fields = [result.get("name") or "", format_location_name(result)]
+    fields.extend(result.get("postcodes") or [])
+    return tuple(geocode_cache.forward_key(str(field)) for field in fields)
+
+def _cached_suggestions(query_key: str, limit: int):
+    """Cached suggestions for a query, narrowed from a shorter complete prefix if needed"""
+    cached = _typeahead.get((query_key, limit))
+    if cached is not None:
+        return cached
+    
+    for end in range(len(query_key), TYPEAHEAD_MIN_PREFIX - 1, -1):
+        complete = _typeahead.get((query_key[:end], COMPLETE))
+        if complete is None:
+            continue
+        # Only entries whose every result matched the prefix on a field kept here can
+        # be narrowed; upstream may have matched others on alternate names we don't store
+        if not all(any(key.startswith(query_key[:end]) for key in keys) for keys, _ in complete):
+            continue
+        return [
+            location for keys, location in complete
+            if any(key.startswith(query_key) for key in keys)
+        ][:limit]
+    return None
+
+def typeahead_stats():
+    """Hit/miss counters for the typeahead cache"""
+    return _typeahead.stats()
+
+async def search_locations(query: str, limit: int = 5) -> List[Dict[str, Any]]:
     """
-    Search for locations using Open-Meteo geocoding API
+    Search for locations using the offline gazetteer when one is configured,
+    falling back to the Open-Meteo geocoding API when it has no match
     Returns a list of location suggestions with details
     """
     if not query or len(query.strip()) < 2:
         return []
     
+    local = gazetteer.search(query, limit)
+    if local:
+        return [_location_info(result) for result in local]
+    
+    query_key = geocode_cache.forward_key(query)
+    cached = _cached_suggestions(query_key, limit)
+    if cached is not None:
+        return cached
+    
     try:
         params = {
             "name": query.strip(),
@@ -18,31 +74,35 @@ def search_locations(query: str, limit: int = 5) -> List[Dict[str, Any]]:
             "format": "json"
         }
         
-        response = requests.get(GEOCODING_URL, params=params, timeout=5)
+        response = await upstream_client.get("geocoding", GEOCODING_URL, params=params)
         response.raise_for_status()
         data = response.json()
         
-        locations = []
-        for result in data.get("results", []):
-            location_info = {
-                "name": result.get("name", ""),
-                "country": result.get("country", ""),
-                "admin1": result.get("admin1", ""),  # State/Province
-                "admin2": result.get("admin2", ""),  # County
-                "latitude": result.get("latitude", 0),
-                "longitude": result.get("longitude", 0),
-                "display_name": format_location_name(result),
-                "search_query": f"{result.get('latitude')},{result.get('longitude')}"
-            }
-            locations.append(location_info)
-        
+        results = data.get("results", [])
+        locations = [_location_info(result) for result in results]
+        _typeahead.set((query_key, limit), locations)
+        if len(locations) < limit and len(query_key) >= TYPEAHEAD_MIN_PREFIX:
+            _typeahead.set((query_key, COMPLETE), [(_match_keys(result), location) for result, location in zip(results, locations)])
         return locations
         
-    except requests.exceptions.RequestException:
+    except httpx.HTTPError:
         return []
     except Exception:
         return []
 
+def _location_info(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a geocoding result (upstream or gazetteer) as a search suggestion"""
+    return {
+        "name": result.get("name", ""),
+        "country": result.get("country", ""),
+        "admin1": result.get("admin1", ""),  # State/Province
+        "admin2": result.get("admin2", ""),  # County
+        "latitude": result.get("latitude", 0),
+        "longitude": result.get("longitude", 0),
+        "display_name": format_location_name(result),
+        "search_query": f"{result.get('latitude')},{result.get('longitude')}"
+    }
+
 def format_location_name(result: Dict[str, Any]) -> str:
     """
     Format location name for display in search suggestions
@@ -62,14 +122,66 @@ def format_location_name(result: Dict[str, Any]) -> str:
     
     return ", ".join(parts)
 
-def get_location_details(latitude: float, longitude: float) -> Dict[str, Any]:
+async def get_location_details(latitude: float, longitude: float) -> Dict[str, Any]:
     """
     Get detailed information about a specific location using reverse geocoding
-    Uses OpenStreetMap Nominatim API for reverse geocoding
     """
+    return (await get_locations_details([(latitude, longitude)]))[0]
+
+async def get_locations_details(points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """
+    Reverse geocode many (latitude, longitude) points, {} where nothing is found.
+    Uses the offline gazetteer when one is configured, and OpenStreetMap
+    Nominatim without one or, if REVERSE_GEOCODE_NOMINATIM_FALLBACK is set,
+    for points the gazetteer can't place. At most
+    REVERSE_GEOCODE_NOMINATIM_BATCH_MAX points go to Nominatim; any further
+    misses stay {}
+    """
+    if gazetteer.is_loaded():
+        # Off the event loop, and off the SQLite pool: this is pure distance math
+        places = await asyncio.to_thread(gazetteer.nearest_many, points)
+        results = [
+            {} if place is None else _details_from_place(place, latitude, longitude)
+            for place, (latitude, longitude) in zip(places, points)
+        ]
+        if not config.REVERSE_GEOCODE_NOMINATIM_FALLBACK:
+            return results
+        misses = [position for position, details in enumerate(results) if not details]
+    else:
+        results = [{} for _ in points]
+        misses = list(range(len(points)))
+    
+    # One at a time: Nominatim's usage policy allows about one request per second
+    for position in misses[:config.REVERSE_GEOCODE_NOMINATIM_BATCH_MAX]:
+        results[position] = await _nominatim_details(*points[position])
+    return results
+
+def _details_from_place(place: Dict[str, Any], latitude: float, longitude: float) -> Dict[str, Any]:
+    """Shape a gazetteer place like a Nominatim-derived details response"""
+    return {
+        "name": place["name"],
+        "country": place["country"],
+        "admin1": place["admin1"],
+        "admin2": place["admin2"],
+        "latitude": latitude,
+        "longitude": longitude,
+        "display_name": format_location_name(place),
+        "timezone": place["timezone"],
+        "population": place["population"],
+        "distance_km": place["distance_km"]
+    }
+
+async def _nominatim_details(latitude: float, longitude: float) -> Dict[str, Any]:
+    """Reverse geocode one point with OpenStreetMap Nominatim (cached)"""
+    cache_key = geocode_cache.reverse_key(latitude, longitude)
+    cached = await geocode_cache.lookup(geocode_cache.REVERSE, cache_key)
+    if cached is geocode_cache.NOT_FOUND:
+        return {}
+    if cached is not None:
+        return {**cached, "latitude": latitude, "longitude": longitude}
+    
     try:
         # Use OpenStreetMap Nominatim for reverse geocoding
-        nominatim_url = "https://nominatim.openstreetmap.org/reverse"
         params = {
             "lat": latitude,
             "lon": longitude,
@@ -82,13 +194,13 @@ def get_location_details(latitude: float, longitude: float) -> Dict[str, Any]:
             "User-Agent": "WeatherApp/1.0"  # Required by Nominatim
         }
         
-        response = requests.get(nominatim_url, params=params, headers=headers, timeout=5)
+        response = await upstream_client.get("nominatim", NOMINATIM_URL, params=params, headers=headers)
         response.raise_for_status()
         data = response.json()
         
         if data and data.get("address"):
             address = data["address"]
-            return {
+            details = {
                 "name": address.get("city") or address.get("town") or address.get("village") or address.get("hamlet") or "Unknown",
                 "country": address.get("country", ""),
                 "admin1": address.get("state") or address.get("province") or "",
@@ -99,7 +211,10 @@ def get_location_details(latitude: float, longitude: float) -> Dict[str, Any]:
                 "timezone": "",  # Nominatim doesn't provide timezone
                 "population": 0   # Nominatim doesn't provide population
             }
+            await geocode_cache.store(geocode_cache.REVERSE, cache_key, details)
+            return details
         
+        await geocode_cache.store(geocode_cache.REVERSE, cache_key, None)
         return {}
         
     except Exception:
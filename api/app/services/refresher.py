@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import math
+import time
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from app.services.cache import TTLCache
+
+class RefreshScheduler:
+    """
+    Keep popular cache entries warm. Callers report each request with touch();
+    request counts decay with a half-life so popularity follows recent traffic.
+    Every interval the top_n keys whose entries expire within lead seconds, and
+    that weren't refreshed in the last lead seconds, are refreshed. Those and
+    background refreshes of stale entries share one budget of
+    budget_per_minute refreshes per minute
+    """
+
+    def __init__(self, cache: TTLCache, top_n: int, lead: float, budget_per_minute: int,
+                 interval: float, half_life: float):
+        self.cache = cache
+        self.top_n = top_n
+        self.lead = lead
+        self.budget_per_minute = budget_per_minute
+        self.interval = interval
+        self.half_life = half_life
+        self._counts: Dict[Hashable, float] = {}
+        self._refreshers: Dict[Hashable, Callable[[], Awaitable[Any]]] = {}
+        self._refreshed_at: Dict[Hashable, float] = {}
+        self._tokens = float(budget_per_minute)
+        self._refilled_at = time.monotonic()
+        self._last_tick = self._refilled_at
+        self._task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Future] = set()
+        self._background_keys: Set[Hashable] = set()
+        self.refreshed = 0
+        self.failed = 0
+        self.over_budget = 0
+        self.background_refreshes = 0
+
+    def touch(self, key: Hashable, refresh: Callable[[], Awaitable[Any]]) -> None:
+        """Count a request for key; refresh() re-fetches and re-caches its entry"""
+        self._counts[key] = self._counts.get(key, 0.0) + 1
+        self._refreshers[key] = refresh
+
+    def refresh_in_background(self, key: Hashable) -> None:
+        """
+        Refresh a stale entry without making the caller wait for it. Skipped
+        when the budget is spent or the key is already being refreshed; the
+        stale entry is served meanwhile either way
+        """
+        refresh = self._refreshers.get(key)
+        if refresh is None or key in self._background_keys:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        if self._tokens < 1:
+            self.over_budget += 1
+            return
+        self._tokens -= 1
+        self._refreshed_at[key] = now
+        self.background_refreshes += 1
+        task = asyncio.ensure_future(self._refresh(refresh))
+        # Hold a reference until done so the task isn't garbage collected mid-flight
+        self._background.add(task)
+        self._background_keys.add(key)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda _: self._background_keys.discard(key))
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.budget_per_minute), self._tokens + (now - self._refilled_at) * self.budget_per_minute / 60)
+        self._refilled_at = now
+
+    async def _refresh(self, refresh: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await refresh()
+            self.refreshed += 1
+        except Exception:
+            # The cached entry stays in place and keeps being served as stale
+            self.failed += 1
+
+    async def tick(self) -> None:
+        """Refresh the hottest due entries within the remaining budget, then decay counts"""
+        now = time.monotonic()
+        elapsed, self._last_tick = now - self._last_tick, now
+        self._refill(now)
+
+        due = []
+        for key in heapq.nlargest(self.top_n, self._counts, key=self._counts.get):
+            expires_in = self.cache.expires_in(key)
+            # A refresh inside the lead window may still expire within it (entries expire at
+            # upstream update boundaries), so wait out the window before refreshing again
+            recently_refreshed = now - self._refreshed_at.get(key, -math.inf) < self.lead
+            if expires_in is not None and expires_in <= self.lead and not recently_refreshed:
+                due.append(key)
+
+        allowed = due[:int(self._tokens)]
+        self._tokens -= len(allowed)
+        for key in allowed:
+            self._refreshed_at[key] = now
+        self.over_budget += len(due) - len(allowed)
+        await asyncio.gather(*(self._refresh(self._refreshers[key]) for key in allowed))
+
+        self._decay(elapsed)
+
+    def _decay(self, elapsed: float) -> None:
+        factor = 0.5 ** (elapsed / self.half_life)
+        for key, count in list(self._counts.items()):
+            count *= factor
+            if count < 0.1:
+                self._forget(key)
+            else:
+                self._counts[key] = count
+
+        # Don't track more keys than the cache can hold
+        if len(self._counts) > self.cache.max_entries:
+            keep = set(heapq.nlargest(self.cache.max_entries, self._counts, key=self._counts.get))
+            for key in list(self._counts):
+                if key not in keep:
+                    self._forget(key)
+
+    def _forget(self, key: Hashable) -> None:
+        del self._counts[key]
+        del self._refreshers[key]
+        self._refreshed_at.pop(key, None)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.tick()
+
+    def start(self) -> None:
+        """Start the refresh loop on the running event loop (application startup)"""
+        if self._task is None:
+            self._last_tick = self._refilled_at = time.monotonic()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop the refresh loop and any background refreshes (application shutdown)"""
+        tasks = list(self._background)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked_keys": len(self._counts),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "over_budget": self.over_budget,
+            "background_refreshes": self.background_refreshes,
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+class UpstreamUnavailable(httpx.HTTPError):
+    """
+    Raised instead of calling an upstream that is rate limited or whose circuit
+    is open. Subclasses httpx.HTTPError so existing upstream error handling applies
+    """
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"{upstream} is temporarily unavailable ({reason.replace('_', ' ')})")
+        self.upstream = upstream
+        self.reason = reason
+
+class TokenBucket:
+    """
+    Rate limiter allowing `rate` calls per second with bursts of up to `burst`.
+    Callers reserve a token up front, so concurrent waiters queue in order
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Take a token, returning how long to wait before using it, or None if that exceeds max_wait"""
+        self._refill()
+        wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        if wait > max_wait:
+            return None
+        self._tokens -= 1
+        return wait
+
+    async def acquire(self, max_wait: float) -> bool:
+        """Wait for a token; False (without waiting) if none is available within max_wait"""
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds. Then it is half-open: one probe call is let through,
+    and its outcome closes the circuit or opens it again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._open_until = 0.0
+        self._probe_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now < self._open_until:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) doesn't block recovery forever
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+        return True
+
+    def release(self) -> None:
+        """Give back the probe slot allow() took for a call that was never made"""
+        if self.state == self.HALF_OPEN:
+            self._probe_started = None
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        """Count a failure; retry_after (from a 429/503) opens the circuit for at least that long"""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold or retry_after:
+            self.state = self.OPEN
+            self._open_until = time.monotonic() + max(self.reset_timeout, retry_after or 0)
+            self._probe_started = None
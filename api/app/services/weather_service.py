@@ -1,8 +1,36 @@
-import requests
+import asyncio
+import httpx
+import time
+from datetime import date, timedelta
+from app import config
+from app.repository import archive_repo
+from app.repository.db import run_db
 from app.repository.weather_repo import create_record
+from app.services import geocode_cache
+from app.services.cache import TTLCache
+from app.services.http_client import upstream_client
+from app.services.refresher import RefreshScheduler
+from app.services.resilience import UpstreamUnavailable
+from app.services.singleflight import SingleFlight
 
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
-GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+OPEN_METEO_URL = config.OPEN_METEO_URL
+GEOCODING_URL = config.GEOCODING_URL
+ARCHIVE_URL = config.ARCHIVE_URL
+ARCHIVE_HOURLY_VARIABLES = ["temperature_2m", "precipitation", "wind_speed_10m"]
+
+# Cached Open-Meteo responses keyed by grid cell + requested variables
+weather_cache = TTLCache(max_entries=config.WEATHER_CACHE_MAX_ENTRIES, stale_ttl=config.WEATHER_STALE_TTL)
+# Identical concurrent geocode/forecast/archive lookups share one upstream call
+_inflight = SingleFlight()
+# Keeps the most requested weather_cache entries refreshed (started in the app lifespan)
+refresh_scheduler = RefreshScheduler(
+    weather_cache,
+    top_n=config.REFRESH_TOP_N,
+    lead=config.REFRESH_LEAD_SECONDS,
+    budget_per_minute=config.REFRESH_BUDGET_PER_MINUTE,
+    interval=config.REFRESH_INTERVAL,
+    half_life=config.REFRESH_HALF_LIFE
+)
 
 def get_weather_icon(weather_code):
     """Map Open-Meteo weather codes to emoji icons"""
@@ -72,7 +100,7 @@ def get_weather_description(weather_code):
     }
     return weather_descriptions.get(weather_code, "Unknown")
 
-def geocode_location(location):
+async def geocode_location(location):
     """Convert location string to coordinates using geocoding"""
     if not location or not location.strip():
         raise ValueError("Location cannot be empty")
@@ -105,42 +133,193 @@ def geocode_location(location):
     elif len(location) < 2:
         raise ValueError("Location must be at least 2 characters long")
     
+    cache_key = geocode_cache.forward_key(location)
+    return await _inflight.do(("geocode", cache_key), lambda: _geocode_name(location, cache_key))
+
+async def _geocode_name(location, cache_key):
+    """Resolve a place name through the geocoding cache, then Open-Meteo geocoding"""
+    not_found = f"Location '{location}' not found. Please check spelling or try a different format."
+    cached = await geocode_cache.lookup(geocode_cache.FORWARD, cache_key)
+    if cached is geocode_cache.NOT_FOUND:
+        raise ValueError(not_found)
+    if cached is not None:
+        return cached["latitude"], cached["longitude"]
+    
     # Geocode the location using Open-Meteo geocoding API
     params = {"name": location, "count": 1}
     try:
-        response = requests.get(GEOCODING_URL, params=params, timeout=10)
+        response = await upstream_client.get("geocoding", GEOCODING_URL, params=params)
         response.raise_for_status()
         data = response.json()
-        
-        if data.get("results"):
-            result = data["results"][0]
-            return result["latitude"], result["longitude"]
-        else:
-            raise ValueError(f"Location '{location}' not found. Please check spelling or try a different format.")
+        results = data.get("results")
             
-    except requests.exceptions.Timeout:
+    except UpstreamUnavailable:
+        # Fail fast without a negative cache entry; the caller can tell this apart from "not found"
+        raise
+    except httpx.TimeoutException:
         raise ValueError("Location lookup timed out. Please try again.")
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise ValueError(f"Failed to lookup location: {str(e)}")
     except Exception as e:
         raise ValueError(f"Unexpected error during geocoding: {str(e)}")
-
-def fetch_current_weather(location):
-    """Fetch current weather with hourly data from Open-Meteo"""
-    lat, lon = geocode_location(location)
     
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,weather_code",
-        "current": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,apparent_temperature,weather_code",
-        "timezone": "auto"
-    }
+    if not results:
+        await geocode_cache.store(geocode_cache.FORWARD, cache_key, None)
+        raise ValueError(not_found)
     
-    response = requests.get(OPEN_METEO_URL, params=params)
+    result = results[0]
+    await geocode_cache.store(geocode_cache.FORWARD, cache_key, {"latitude": result["latitude"], "longitude": result["longitude"]})
+    return result["latitude"], result["longitude"]
+
+def snap_to_grid(lat, lon, step=None):
+    """Snap coordinates to the model grid so nearby lookups share upstream data"""
+    step = step or config.WEATHER_GRID_DEGREES
+    return round(round(lat / step) * step, 4), round(round(lon / step) * step, 4)
+
+def _ttl_until_next_update(cadence):
+    """Seconds until the next upstream update boundary (e.g. top of the hour)"""
+    return cadence - (time.time() % cadence)
+
+def client_max_age(cadence, stale):
+    """Seconds a client may reuse a payload: until the cached upstream data expires, none if it already has"""
+    return 0 if stale else int(_ttl_until_next_update(cadence))
+
+def _cache_key(grid_lat, grid_lon, params):
+    return (grid_lat, grid_lon, tuple(sorted(params.items())))
+
+def _track(key, grid_lat, grid_lon, params, cadence):
+    """Count a request for the refresher and return the entry's cached (data, fresh), if any"""
+    refresh_scheduler.touch(key, lambda: _inflight.do(key, lambda: _fetch_open_meteo_upstream(key, grid_lat, grid_lon, params, cadence)))
+    entry = weather_cache.get_stale(key)
+    if entry is not None and not entry[1]:
+        refresh_scheduler.refresh_in_background(key)
+    return entry
+
+async def _fetch_open_meteo(lat, lon, params, cadence):
+    """
+    Fetch from the Open-Meteo forecast API, cached per grid cell and requested variables.
+    Returns (data, stale): an expired entry is served as stale while it is refreshed in the background
+    """
+    grid_lat, grid_lon = snap_to_grid(lat, lon)
+    key = _cache_key(grid_lat, grid_lon, params)
+    
+    entry = _track(key, grid_lat, grid_lon, params, cadence)
+    if entry is not None:
+        return entry[0], not entry[1]
+    data = await _inflight.do(key, lambda: _fetch_open_meteo_upstream(key, grid_lat, grid_lon, params, cadence))
+    return data, False
+
+async def _fetch_open_meteo_upstream(key, grid_lat, grid_lon, params, cadence):
+    response = await upstream_client.get("open_meteo", OPEN_METEO_URL, params={"latitude": grid_lat, "longitude": grid_lon, **params})
     response.raise_for_status()
     data = response.json()
+    weather_cache.set(key, data, ttl=_ttl_until_next_update(cadence))
+    return data
+
+async def _fetch_open_meteo_many(points, params, cadence):
+    """
+    Fetch Open-Meteo data for many (lat, lon) points. Cache misses are sent as
+    comma-separated coordinate lists, chunked by OPEN_METEO_MAX_LOCATIONS_PER_REQUEST.
+    Returns one result per point: (data, stale), or the exception for its chunk.
+    """
+    cells = [snap_to_grid(lat, lon) for lat, lon in points]
+    found = {}
+    for cell in dict.fromkeys(cells):
+        entry = _track(_cache_key(*cell, params), *cell, params, cadence)
+        if entry is not None:
+            found[cell] = (entry[0], not entry[1])
+    
+    missing = list(dict.fromkeys(cell for cell in cells if cell not in found))
+    chunk_size = config.OPEN_METEO_MAX_LOCATIONS_PER_REQUEST
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    responses = await asyncio.gather(
+        *[_fetch_open_meteo_chunk(chunk, params, cadence) for chunk in chunks],
+        return_exceptions=True
+    )
+    for chunk, response in zip(chunks, responses):
+        for i, cell in enumerate(chunk):
+            found[cell] = response if isinstance(response, Exception) else (response[i], False)
+    
+    return [found[cell] for cell in cells]
+
+async def _fetch_open_meteo_chunk(cells, params, cadence):
+    response = await upstream_client.get("open_meteo", OPEN_METEO_URL, params={
+        "latitude": ",".join(str(lat) for lat, _ in cells),
+        "longitude": ",".join(str(lon) for _, lon in cells),
+        **params
+    })
+    response.raise_for_status()
+    results = response.json()
+    # A single coordinate pair comes back as an object rather than a list
+    if isinstance(results, dict):
+        results = [results]
+    if len(results) != len(cells):
+        raise ValueError(f"Expected {len(cells)} locations from Open-Meteo, got {len(results)}")
+    
+    ttl = _ttl_until_next_update(cadence)
+    for cell, data in zip(cells, results):
+        weather_cache.set(_cache_key(*cell, params), data, ttl=ttl)
+    return results
+
+async def _fetch_many(locations, params, cadence, summarize):
+    """
+    Geocode locations concurrently, fetch them with batched upstream calls and
+    summarize each one. Returns a per-location success/error entry.
+    """
+    coordinates = await asyncio.gather(*[geocode_location(location) for location in locations], return_exceptions=True)
+    points = [coords for coords in coordinates if not isinstance(coords, Exception)]
+    fetched = iter(await _fetch_open_meteo_many(points, params, cadence))
     
+    results = []
+    for location, coords in zip(locations, coordinates):
+        fetched_data = coords if isinstance(coords, Exception) else next(fetched)
+        if isinstance(fetched_data, Exception):
+            results.append({"location": location, "status": "error", "message": str(fetched_data)})
+        else:
+            data, stale = fetched_data
+            results.append({"location": location, "status": "success", "data": {**summarize(location, *coords, data), "stale": stale}})
+    return results
+
+def cache_stats():
+    """Hit/miss counters for the upstream weather cache"""
+    return weather_cache.stats()
+
+def coalescing_stats():
+    """Counts of upstream calls made vs. callers that shared an in-flight call"""
+    return _inflight.stats()
+
+def refresh_stats():
+    """Background refresher counters"""
+    return refresh_scheduler.stats()
+
+CURRENT_PARAMS = {
+    "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,weather_code",
+    "current": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m,apparent_temperature,weather_code",
+    "timezone": "auto"
+}
+
+FORECAST_PARAMS = {
+    "daily": "temperature_2m_max,temperature_2m_min,temperature_2m_mean,precipitation_sum,wind_speed_10m_max,weather_code",
+    "timezone": "auto"
+}
+
+async def fetch_current_weather(location):
+    """Fetch current weather with hourly data from Open-Meteo"""
+    lat, lon = await geocode_location(location)
+    data, stale = await _fetch_open_meteo(lat, lon, CURRENT_PARAMS, config.CURRENT_CACHE_TTL)
+    return {**summarize_current(location, lat, lon, data), "stale": stale}
+
+async def fetch_current_weather_many(locations):
+    """Current weather for many locations using as few upstream requests as possible"""
+    return await _fetch_many(locations, CURRENT_PARAMS, config.CURRENT_CACHE_TTL, summarize_current)
+
+# Hourly arrays of the /current payload, aligned with its hourly_times
+CURRENT_HOURLY_SERIES = (
+    "hourly_temperature", "hourly_humidity", "hourly_precipitation", "hourly_wind", "hourly_weather_codes"
+)
+
+def summarize_current(location, lat, lon, data):
+    """Shape an Open-Meteo current+hourly response into the /current payload"""
     # Get current data
     current = data.get("current", {})
     hourly = data.get("hourly", {})
@@ -182,21 +361,21 @@ def fetch_current_weather(location):
         "longitude": lon
     }
 
-def fetch_5day_forecast(location):
+async def fetch_5day_forecast(location):
     """Fetch 5-day forecast from Open-Meteo"""
-    lat, lon = geocode_location(location)
-    
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": "temperature_2m_max,temperature_2m_min,temperature_2m_mean,precipitation_sum,wind_speed_10m_max,weather_code",
-        "timezone": "auto"
-    }
-    
-    response = requests.get(OPEN_METEO_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    
+    lat, lon = await geocode_location(location)
+    data, stale = await _fetch_open_meteo(lat, lon, FORECAST_PARAMS, config.FORECAST_CACHE_TTL)
+    return {**summarize_forecast(location, data), "stale": stale}
+
+async def fetch_5day_forecast_many(locations):
+    """5-day forecasts for many locations using as few upstream requests as possible"""
+    return await _fetch_many(
+        locations, FORECAST_PARAMS, config.FORECAST_CACHE_TTL,
+        lambda location, lat, lon, data: summarize_forecast(location, data)
+    )
+
+def summarize_forecast(location, data):
+    """Shape an Open-Meteo daily response into the /forecast payload"""
     daily = data.get("daily", {})
     
     forecast = []
@@ -225,24 +404,98 @@ def fetch_5day_forecast(location):
     return {"location": location, "forecast": forecast}
 
 # Historical weather for CRUD operations
-def fetch_historical_weather(longitude, latitude, start_date, end_date):
+async def fetch_historical_weather(longitude, latitude, start_date, end_date):
+    """
+    Hourly archive data for a date range, assembled from the local archive store
+    with only the missing days fetched from Open-Meteo
+    """
+    grid_lat, grid_lon = snap_to_grid(latitude, longitude, config.ARCHIVE_GRID_DEGREES)
+    key = ("archive", grid_lat, grid_lon, start_date, end_date)
+    return await _inflight.do(key, lambda: _assemble_archive(grid_lat, grid_lon, start_date, end_date))
+
+def _date_range(start_date, end_date):
+    start = date.fromisoformat(start_date)
+    return [(start + timedelta(days=i)).isoformat() for i in range((date.fromisoformat(end_date) - start).days + 1)]
+
+def _missing_ranges(days, stored):
+    """
+    Group days not yet stored into (start, end) ranges to fetch. Gaps separated
+    by only a few stored days are merged so the range costs a single request.
+    """
+    ranges = []
+    for i, day in enumerate(days):
+        if day in stored:
+            continue
+        if ranges and i - ranges[-1][1] <= config.ARCHIVE_GAP_MERGE_DAYS + 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return [(days[first], days[last]) for first, last in ranges]
+
+def _split_days(hourly):
+    """Split an upstream hourly block into {day: hourly arrays for that day}"""
+    days = {}
+    for i, time_str in enumerate(hourly.get("time", [])):
+        day = days.setdefault(time_str[:10], {name: [] for name in hourly})
+        for name, values in hourly.items():
+            day[name].append(values[i] if i < len(values) else None)
+    return days
+
+def _is_final(day, hourly):
+    """Only complete days old enough to be final upstream are worth storing"""
+    final_before = (date.today() - timedelta(days=config.ARCHIVE_FINAL_AFTER_DAYS)).isoformat()
+    if day >= final_before or len(hourly.get("time", [])) < 24:
+        return False
+    return any(value is not None for name, values in hourly.items() if name != "time" for value in values)
+
+async def _assemble_archive(grid_lat, grid_lon, start_date, end_date):
+    days = _date_range(start_date, end_date)
+    stored = await run_db(archive_repo.read_archive_days, grid_lat, grid_lon, start_date, end_date)
+    meta = await run_db(archive_repo.get_archive_cell, grid_lat, grid_lon) if stored else None
+    
+    gaps = _missing_ranges(days, stored)
+    fetched = await asyncio.gather(*[
+        _inflight.do(("archive_gap", grid_lat, grid_lon, gap_start, gap_end),
+                     lambda gap_start=gap_start, gap_end=gap_end: _fetch_archive(grid_lat, grid_lon, gap_start, gap_end))
+        for gap_start, gap_end in gaps
+    ])
+    if any(data is None for data in fetched):
+        return None
+    
+    for data in fetched:
+        fetched_days = _split_days(data.get("hourly", {}))
+        stored.update(fetched_days)
+        final_days = {day: hourly for day, hourly in fetched_days.items() if _is_final(day, hourly)}
+        if meta is None:
+            meta = {name: value for name, value in data.items() if name != "hourly"}
+            await run_db(archive_repo.put_archive_cell, grid_lat, grid_lon, meta)
+        if final_days:
+            await run_db(archive_repo.write_archive_days, grid_lat, grid_lon, final_days)
+    
+    hourly = {name: [] for name in ["time"] + ARCHIVE_HOURLY_VARIABLES}
+    for day in days:
+        for name, values in stored.get(day, {}).items():
+            hourly.setdefault(name, []).extend(values)
+    return {**(meta or {}), "hourly": hourly}
+
+async def _fetch_archive(latitude, longitude, start_date, end_date):
     params = {
         "latitude": latitude,
         "longitude": longitude,
         "start_date": start_date,
         "end_date": end_date,
-        "hourly": "temperature_2m,precipitation,wind_speed_10m",
+        "hourly": ",".join(ARCHIVE_HOURLY_VARIABLES),
         "timezone": "auto"
     }
     
     try:
-        response = requests.get("https://archive-api.open-meteo.com/v1/archive", params=params)
+        response = await upstream_client.get("archive", ARCHIVE_URL, params=params)
         response.raise_for_status()
         data = response.json()
         return data
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error fetching data: {e}")
         return None
 
-def save_weather_record(location, start_date, end_date, weather_json):
-    create_record(location, start_date, end_date, weather_json)
\ No newline at end of file
+async def save_weather_record(location, start_date, end_date, weather_json):
+    await run_db(create_record, location, start_date, end_date, weather_json)
\ No newline at end of file
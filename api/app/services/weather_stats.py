@@ -0,0 +1,149 @@
+"""
+Aggregations over stored weather records, computed with NumPy from the daily
+rollups (weather_daily_rollups) rather than from weather_json.
+
+Days are grouped by period (day, month, year or all) and by location or
+record. When grouping by location, a day covered by several records of that
+location counts once, taken from the newest record, so overlapping records
+don't double precipitation totals or degree-days.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.repository import weather_repo
+from app.repository.db import run_db
+from app.repository.rollups import ROLLUP_COLUMNS, unpack_rollup
+
+# datetime64 unit each period truncates days to (None: a single period)
+PERIODS = {"day": "D", "month": "M", "year": "Y", "all": None}
+GROUP_BY = ("location", "record")
+# Groups and day/period numbers (which may be negative) are combined into
+# one sortable int64 key: group * KEY_SPAN + KEY_OFFSET + number
+KEY_SPAN = 1 << 32
+KEY_OFFSET = 1 << 31
+
+def _values(array) -> List[Optional[float]]:
+    """Floats rounded for output, NaN as None"""
+    return [None if value != value else value for value in np.round(array, 2).tolist()]
+
+def _day_number(day: Optional[str]) -> Optional[int]:
+    return (date.fromisoformat(day) - date(1970, 1, 1)).days if day else None
+
+def aggregate(rows: List[tuple], period: str, group_by: str, base: float,
+              start_day: Optional[str] = None, end_day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Aggregate read_daily_rollups() rows into one row per (group, period),
+    counting only days in [start_day, end_day]. Degree-days use each day's
+    (min + max) / 2 against base (°C)
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {', '.join(PERIODS)}")
+    if group_by not in GROUP_BY:
+        raise ValueError(f"Unknown group_by '{group_by}', expected one of {', '.join(GROUP_BY)}")
+    first_number, last_number = _day_number(start_day), _day_number(end_day)
+    if not rows:
+        return []
+
+    record_ids = [row[0] for row in rows]
+    locations = [row[1] for row in rows]
+    unpacked = [unpack_rollup(days, blob) for _, _, days, blob in rows]
+
+    # One entry per day across every record, plus the index of the record it came from
+    days = np.concatenate([day_numbers for day_numbers, _ in unpacked]).astype(np.int64)
+    values = {name: np.concatenate([columns[name] for _, columns in unpacked]) for name in ROLLUP_COLUMNS}
+    record_index = np.repeat(np.arange(len(rows)), [row[2] for row in rows])
+
+    if group_by == "location":
+        _, location_codes = np.unique([location.lower() for location in locations], return_inverse=True)
+        groups = np.asarray(location_codes).ravel()[record_index]
+    else:
+        # Rows arrive newest record first, which is also the output order
+        groups = record_index
+
+    selected = np.ones(len(days), dtype=bool)
+    if first_number is not None:
+        selected &= days >= first_number
+    if last_number is not None:
+        selected &= days <= last_number
+    if group_by == "location":
+        # The first occurrence of each (location, day) comes from the newest record
+        _, newest = np.unique(groups * KEY_SPAN + KEY_OFFSET + days, return_index=True)
+        deduplicated = np.zeros(len(days), dtype=bool)
+        deduplicated[newest] = True
+        selected &= deduplicated
+    days, groups, record_index = days[selected], groups[selected], record_index[selected]
+    values = {name: series[selected] for name, series in values.items()}
+    if not len(days):
+        return []
+
+    unit = PERIODS[period]
+    if unit:
+        period_numbers = days.astype("datetime64[D]").astype(f"datetime64[{unit}]").astype(np.int64)
+    else:
+        period_numbers = np.zeros_like(days)
+    keys, first, inverse = np.unique(groups * KEY_SPAN + KEY_OFFSET + period_numbers, return_index=True, return_inverse=True)
+    inverse = np.asarray(inverse).ravel()
+
+    # Sort days by key so each (group, period) is a contiguous run for reduceat
+    order = np.argsort(inverse, kind="stable")
+    starts = np.flatnonzero(np.concatenate(([True], inverse[order][1:] != inverse[order][:-1])))
+
+    def column(name):
+        return values[name][order]
+
+    def total(name):
+        return np.add.reduceat(column(name), starts)
+
+    temp_min, temp_max = column("temp_min"), column("temp_max")
+    midpoint = (temp_min + temp_max) / 2
+    has_temp = ~np.isnan(midpoint)
+    heating = np.where(has_temp, np.maximum(base - midpoint, 0.0), 0.0)
+    cooling = np.where(has_temp, np.maximum(midpoint - base, 0.0), 0.0)
+    temp_days = np.add.reduceat(has_temp.astype(np.int64), starts)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        temp_mean = total("temp_sum") / total("temp_count")
+        wind_mean = total("wind_sum") / total("wind_count")
+    precip_total = np.where(total("precip_count") > 0, total("precip_sum"), np.nan)
+
+    if unit:
+        labels = np.datetime_as_string((keys % KEY_SPAN - KEY_OFFSET).astype(f"datetime64[{unit}]")).tolist()
+    else:
+        labels = ["all"] * len(keys)
+    # first holds a day index of each (group, period), for its record and location
+    first_records = record_index[first].tolist()
+    results = {
+        "location": [locations[index] for index in first_records],
+        "period": labels,
+        "days": np.diff(np.append(starts, len(order))).tolist(),
+        "hours": total("hours").astype(np.int64).tolist(),
+        "temp_min": _values(np.fmin.reduceat(temp_min, starts)),
+        "temp_max": _values(np.fmax.reduceat(temp_max, starts)),
+        "temp_mean": _values(temp_mean),
+        "precip_total": _values(precip_total),
+        "wind_max": _values(np.fmax.reduceat(column("wind_max"), starts)),
+        "wind_mean": _values(wind_mean),
+        "heating_degree_days": _values(np.where(temp_days > 0, np.add.reduceat(heating, starts), np.nan)),
+        "cooling_degree_days": _values(np.where(temp_days > 0, np.add.reduceat(cooling, starts), np.nan)),
+    }
+    if group_by == "record":
+        results = {"record_id": [record_ids[index] for index in first_records], **results}
+
+    names = list(results)
+    return [dict(zip(names, row)) for row in zip(*results.values())]
+
+def _stats(period, group_by, base, record_id=None, location=None, start_day=None, end_day=None):
+    rows = weather_repo.read_daily_rollups(record_id, location, start_day, end_day)
+    return aggregate(rows, period, group_by, base, start_day, end_day)
+
+async def record_stats(record_id: int, period: str, base: float,
+                       start_day: Optional[str] = None, end_day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-period aggregates of one record"""
+    return await run_db(_stats, period, "record", base, record_id=record_id, start_day=start_day, end_day=end_day)
+
+async def grouped_stats(period: str, group_by: str, base: float, location: Optional[str] = None,
+                        start_day: Optional[str] = None, end_day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-period aggregates across records, grouped by location or record"""
+    return await run_db(_stats, period, group_by, base, location=location, start_day=start_day, end_day=end_day)
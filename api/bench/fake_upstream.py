@@ -0,0 +1,143 @@
+"""
+Local stand-in for Open-Meteo (forecast, archive, geocoding), Nominatim and
+YouTube used by the load benchmark. It replays the recorded responses in
+bench/fixtures, adjusted to the requested coordinates and dates, after an
+injected latency, and fails a configurable share of requests.
+
+Point the API at it with UPSTREAM_BASE_URL=http://127.0.0.1:<port>.
+
+    cd api && python -m bench.fake_upstream --port 8900 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+def load_fixture(name):
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as fixture:
+        return json.load(fixture)
+
+def _coordinates(request: Request):
+    latitudes = request.query_params.get("latitude", "0").split(",")
+    longitudes = request.query_params.get("longitude", "0").split(",")
+    return [(float(lat), float(lon)) for lat, lon in zip(latitudes, longitudes)]
+
+def _synthetic_place(name):
+    """A stable made-up place for names not in the geocoding fixture"""
+    digest = int(hashlib.sha1(name.lower().encode("utf-8")).hexdigest()[:12], 16)
+    return {
+        "id": digest % 10_000_000,
+        "name": name.title(),
+        "latitude": round((digest % 12000) / 100 - 60, 4),
+        "longitude": round((digest // 12000 % 36000) / 100 - 180, 4),
+        "country": "Benchland",
+        "admin1": "Fixture",
+        "population": digest % 100000,
+    }
+
+def create_app(latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=None):
+    app = FastAPI(title="Fake upstream")
+    rng = random.Random(seed)
+    fixtures = {name: load_fixture(name) for name in (
+        "forecast_current", "forecast_daily", "archive_day", "geocoding", "reverse", "youtube"
+    )}
+    requests = Counter()
+
+    async def inject(path):
+        """Sleep for the configured latency; return an error response for injected failures"""
+        requests[path] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms))
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if error_rate and rng.random() < error_rate:
+            requests[f"{path} (error)"] += 1
+            return JSONResponse({"error": True, "reason": "Injected failure"}, status_code=error_status)
+        return None
+
+    @app.get("/v1/forecast")
+    async def forecast(request: Request):
+        failure = await inject("/v1/forecast")
+        if failure:
+            return failure
+        template = fixtures["forecast_daily" if "daily" in request.query_params else "forecast_current"]
+        results = [{**template, "latitude": lat, "longitude": lon} for lat, lon in _coordinates(request)]
+        # Open-Meteo answers a single coordinate pair with an object, several with a list
+        return results[0] if len(results) == 1 else results
+
+    @app.get("/v1/archive")
+    async def archive(request: Request):
+        failure = await inject("/v1/archive")
+        if failure:
+            return failure
+        template = fixtures["archive_day"]
+        lat, lon = _coordinates(request)[0]
+        start = date.fromisoformat(request.query_params["start_date"])
+        end = date.fromisoformat(request.query_params["end_date"])
+        hourly = {name: [] for name in template["hourly"]}
+        day = start
+        while day <= end:
+            for name, values in template["hourly"].items():
+                if name == "time":
+                    hourly[name].extend(f"{day.isoformat()}{value[10:]}" for value in values)
+                else:
+                    hourly[name].extend(values)
+            day += timedelta(days=1)
+        return {**template, "latitude": lat, "longitude": lon, "hourly": hourly}
+
+    @app.get("/v1/search")
+    async def geocoding(request: Request):
+        failure = await inject("/v1/search")
+        if failure:
+            return failure
+        name = request.query_params.get("name", "").strip()
+        count = int(request.query_params.get("count", 10))
+        matches = [result for result in fixtures["geocoding"]["results"] if result["name"].lower().startswith(name.lower())]
+        return {"results": (matches or [_synthetic_place(name)])[:count], "generationtime_ms": 0.5}
+
+    @app.get("/reverse")
+    async def reverse(request: Request):
+        failure = await inject("/reverse")
+        if failure:
+            return failure
+        return {**fixtures["reverse"], "lat": request.query_params.get("lat"), "lon": request.query_params.get("lon")}
+
+    @app.get("/youtube/v3/search")
+    async def youtube(request: Request):
+        failure = await inject("/youtube/v3/search")
+        if failure:
+            return failure
+        return fixtures["youtube"]
+
+    @app.get("/__stats")
+    async def stats():
+        """Requests served per endpoint, to check what the API actually sent upstream"""
+        return dict(requests)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="latency varies uniformly by up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible latency and failures")
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Load driver: runs each scenario against a running API at each concurrency
+level for a fixed duration and reports throughput and latency percentiles per
+endpoint. Workers use seeded random choices, so runs are repeatable.
+
+    cd api && python -m bench.load --base-url http://127.0.0.1:8000 --concurrency 1,8,32 --duration 10
+
+Use bench/run.py to start the API against the fake upstream and drive it in one go.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+CITIES = ["Toronto", "London", "Paris", "Tokyo", "New York", "Sydney", "Berlin", "Torino", "Torrance"]
+COORDINATES = ["43.65,-79.38", "51.51,-0.13", "48.85,2.35", "35.69,139.69", "-33.87,151.21", "52.52,13.41"]
+LOCATIONS = CITIES + COORDINATES
+EXPORT_FORMATS = ["json", "csv", "markdown", "parquet"]
+
+def _date_range(rng):
+    """A reproducible 1-30 day range in 2023 (always in the past, within the archive's limits)"""
+    start = 1 + rng.randrange(330)
+    length = rng.randrange(30)
+    to_date = lambda day: time.strftime("%Y-%m-%d", time.strptime(f"2023 {day}", "%Y %j"))
+    return to_date(start), to_date(start + length)
+
+async def scenario_current(request, rng):
+    await request("current", "GET", "/api/weather/current", params={"location": rng.choice(LOCATIONS)})
+
+async def scenario_forecast(request, rng):
+    await request("forecast", "GET", "/api/weather/forecast", params={"location": rng.choice(LOCATIONS)})
+
+async def scenario_history(request, rng):
+    """
+    One create -> batch create -> list -> observations -> update -> delete cycle.
+    POST /history doesn't return the new id, so its record is found in the
+    listing and deleted with the batch-created one
+    """
+    location = rng.choice(LOCATIONS)
+    start_date, end_date = _date_range(rng)
+    await request("history:create", "POST", "/api/weather/history", json={
+        "location": location, "start_date": start_date, "end_date": end_date
+    })
+
+    batch_start, batch_end = _date_range(rng)
+    response = await request("history:create_batch", "POST", "/api/weather/history/batch", json={
+        "items": [{"location": rng.choice(LOCATIONS), "start_date": batch_start, "end_date": batch_end}]
+    })
+    if response is None or response.status_code != 200:
+        return
+    result = response.json()["data"]["results"][0]
+    if result["status"] != "success":
+        return
+    record_id = result["id"]
+
+    response = await request("history:list", "GET", "/api/weather/history", params={
+        "limit": 50, "fields": "id,location,start_date,end_date,created_at,has_weather_data"
+    })
+    await request("history:observations", "GET", f"/api/weather/history/{record_id}/observations")
+    new_start, new_end = _date_range(rng)
+    await request("history:update", "PUT", f"/api/weather/history/{record_id}", json={"start_date": new_start, "end_date": new_end})
+    await request("history:delete", "DELETE", f"/api/weather/history/{record_id}")
+
+    if response is not None and response.status_code == 200:
+        created = next((
+            record for record in response.json()["data"]
+            if (record["location"], record["start_date"], record["end_date"]) == (location, start_date, end_date)
+        ), None)
+        if created is not None:
+            await request("history:delete", "DELETE", f"/api/weather/history/{created['id']}")
+
+async def scenario_export(request, rng):
+    export_format = rng.choice(EXPORT_FORMATS)
+    await request(f"export:{export_format}", "GET", f"/api/weather/export/{export_format}")
+
+async def scenario_search(request, rng):
+    """Typeahead: successive prefixes of one city name, as a user types it"""
+    city = rng.choice(CITIES)
+    for end in range(2, len(city) + 1):
+        await request("search", "GET", "/api/location/search", params={"query": city[:end], "limit": 5})
+
+SCENARIOS = {
+    "current": scenario_current,
+    "forecast": scenario_forecast,
+    "history": scenario_history,
+    "export": scenario_export,
+    "search": scenario_search,
+}
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+async def run_level(base_url, scenario, concurrency, duration, seed):
+    """Run one scenario at one concurrency level; returns a result row per endpoint label"""
+    samples = defaultdict(list)
+    errors = Counter()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def request(label, method, url, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+            except httpx.HTTPError:
+                response = None
+            samples[label].append(time.perf_counter() - start)
+            if response is None or response.status_code >= 400:
+                errors[label] += 1
+            return response
+
+        deadline = time.monotonic() + duration
+
+        async def worker(index):
+            rng = random.Random(f"{seed}:{scenario}:{index}")
+            while time.monotonic() < deadline:
+                await SCENARIOS[scenario](request, rng)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    rows = []
+    for label, values in sorted(samples.items()):
+        values.sort()
+        rows.append({
+            "scenario": scenario,
+            "endpoint": label,
+            "concurrency": concurrency,
+            "requests": len(values),
+            "errors": errors[label],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        })
+    return rows
+
+async def seed_records(base_url, count, seed):
+    """Create records up front so exports have data to stream"""
+    rng = random.Random(f"{seed}:seed")
+    items = []
+    for _ in range(count):
+        start_date, end_date = _date_range(rng)
+        items.append({"location": rng.choice(LOCATIONS), "start_date": start_date, "end_date": end_date})
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        for offset in range(0, len(items), 100):
+            response = await client.post("/api/weather/history/batch", json={"items": items[offset:offset + 100]})
+            response.raise_for_status()
+
+async def run(base_url, scenarios, levels, duration, seed=0, warmup=1.0, records=0):
+    if records:
+        await seed_records(base_url, records, seed)
+    results = []
+    for scenario in scenarios:
+        for concurrency in levels:
+            if warmup:
+                # Fill caches and connection pools so levels are comparable
+                await run_level(base_url, scenario, concurrency, warmup, seed)
+            results.extend(await run_level(base_url, scenario, concurrency, duration, seed))
+    return results
+
+def print_table(results):
+    columns = ["endpoint", "concurrency", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    widths = {column: max(len(column), *(len(str(row[column])) for row in results)) for column in columns}
+    print("  ".join(column.rjust(widths[column]) for column in columns))
+    for row in results:
+        print("  ".join(str(row[column]).rjust(widths[column]) for column in columns))
+
+def add_arguments(parser):
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=1, help="unmeasured seconds before each level")
+    parser.add_argument("--records", type=int, default=50, help="records to create before running (for exports)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+
+def run_from_args(base_url, args):
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = asyncio.run(run(base_url, scenarios, levels, args.duration, args.seed, args.warmup, args.records))
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    add_arguments(parser)
+    args = parser.parse_args()
+    run_from_args(args.base_url, args)
+
+if __name__ == "__main__":
+    main()
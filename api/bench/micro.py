@@ -0,0 +1,199 @@
+"""
+Microbenchmarks for the CPU-bound transforms that run on every request or
+export, on synthetic payloads from one day to ten years of hourly data.
+
+    cd api && python -m bench.micro --save-baseline bench/micro_baseline.json
+    # ... change code ...
+    cd api && python -m bench.micro --compare bench/micro_baseline.json --threshold 0.10
+
+--compare exits with status 1 when any benchmark is slower than the baseline
+by more than the threshold (a fraction; 0.10 = 10%). Each result is the best
+per-call time over several repeats, which is the most stable figure on a
+shared machine; still, compare baselines from the same machine only.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.repository.encoding import decode_weather_json, encode_weather_json
+from app.repository.weather_repo import _derived_rows
+from app.routes.export import _stream_csv
+from app.services.downsample import downsample_rows
+from app.services.weather_service import _split_days, summarize_current, summarize_forecast
+
+SIZES = {"1d": 1, "30d": 30, "1y": 365, "10y": 3650}
+START = datetime(2015, 1, 1)
+WEATHER_CODES = [0, 1, 2, 3, 45, 51, 61, 63, 71, 80, 95]
+
+def _hours(days):
+    return [(START + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M") for i in range(days * 24)]
+
+def _series(rng, count, low, high, decimals=1):
+    return [round(rng.uniform(low, high), decimals) for _ in range(count)]
+
+def hourly_payload(days, seed=0):
+    """An Open-Meteo forecast/archive style response with `days` of hourly data"""
+    rng = random.Random(seed)
+    times = _hours(days)
+    return {
+        "latitude": 43.65, "longitude": -79.38, "generationtime_ms": 0.5, "utc_offset_seconds": 0,
+        "timezone": "GMT", "timezone_abbreviation": "GMT", "elevation": 85.0,
+        "hourly_units": {"time": "iso8601", "temperature_2m": "°C", "precipitation": "mm", "wind_speed_10m": "km/h"},
+        "current": {
+            "temperature_2m": 12.3, "apparent_temperature": 10.1, "relative_humidity_2m": 71,
+            "precipitation": 0.0, "wind_speed_10m": 14.2, "weather_code": 3
+        },
+        "hourly": {
+            "time": times,
+            "temperature_2m": _series(rng, len(times), -20, 35),
+            "relative_humidity_2m": [rng.randint(20, 100) for _ in times],
+            "precipitation": _series(rng, len(times), 0, 5),
+            "wind_speed_10m": _series(rng, len(times), 0, 60),
+            "weather_code": [rng.choice(WEATHER_CODES) for _ in times],
+        },
+    }
+
+def daily_payload(days, seed=0):
+    """An Open-Meteo daily forecast response covering `days` days"""
+    rng = random.Random(seed)
+    return {
+        "daily": {
+            "time": [(START + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)],
+            "temperature_2m_max": _series(rng, days, 5, 35),
+            "temperature_2m_min": _series(rng, days, -20, 5),
+            "temperature_2m_mean": _series(rng, days, -5, 20),
+            "precipitation_sum": _series(rng, days, 0, 30),
+            "wind_speed_10m_max": _series(rng, days, 0, 80),
+            "weather_code": [rng.choice(WEATHER_CODES) for _ in range(days)],
+        }
+    }
+
+def export_rows(payload):
+    """weather_observations rows as _stream_csv receives them from iter_record_observations"""
+    hourly = payload["hourly"]
+    return [
+        (1, "Toronto", time_str, temp, precip, wind)
+        for time_str, temp, precip, wind in zip(
+            hourly["time"], hourly["temperature_2m"], hourly["precipitation"], hourly["wind_speed_10m"]
+        )
+    ]
+
+def observation_dicts(payload):
+    """Rows as read_observations returns them"""
+    hourly = payload["hourly"]
+    return [
+        {"time": time_str, "temperature_2m": temp, "precipitation": precip, "wind_speed_10m": wind}
+        for time_str, temp, precip, wind in zip(
+            hourly["time"], hourly["temperature_2m"], hourly["precipitation"], hourly["wind_speed_10m"]
+        )
+    ]
+
+def benchmarks(sizes):
+    """Yield (name, zero-argument callable) for every benchmark at every size"""
+    for label, days in sizes.items():
+        payload = hourly_payload(days)
+        weather_json = json.dumps(payload)
+        encoded = encode_weather_json(weather_json)
+        daily = daily_payload(days)
+        rows = export_rows(payload)
+        observations = observation_dicts(payload)
+
+        yield f"summarize_current[{label}]", lambda payload=payload: summarize_current("Toronto", 43.65, -79.38, payload)
+        yield f"summarize_forecast[{label}]", lambda daily=daily: summarize_forecast("Toronto", daily)
+        yield f"stream_csv[{label}]", lambda rows=rows: sum(len(chunk) for chunk in _stream_csv(rows))
+        yield f"json_dumps[{label}]", lambda payload=payload: json.dumps(payload)
+        yield f"json_loads[{label}]", lambda weather_json=weather_json: json.loads(weather_json)
+        yield f"encode_weather_json[{label}]", lambda weather_json=weather_json: encode_weather_json(weather_json)
+        yield f"decode_weather_json[{label}]", lambda encoded=encoded: decode_weather_json(encoded)
+        yield f"derived_rows[{label}]", lambda weather_json=weather_json: _derived_rows(1, weather_json)
+        yield f"split_days[{label}]", lambda payload=payload: _split_days(payload["hourly"])
+        yield f"resample_daily[{label}]", lambda observations=observations: downsample_rows(observations, "daily")
+        yield f"lttb_1000[{label}]", lambda observations=observations: downsample_rows(observations, "hourly", 1000)
+
+def measure(func, min_time, repeats):
+    """Best seconds per call over `repeats` runs of a loop lasting about min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / 5 / elapsed))
+
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def run(sizes, name_filter=None, min_time=0.2, repeats=5):
+    results = {}
+    for name, func in benchmarks(sizes):
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(func, min_time, repeats)
+        print(f"{name:<36} {results[name] * 1000:>12.4f} ms", flush=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """Print the change against baseline per benchmark; return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<36} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<36} {'-':>12} {seconds * 1000:>12.4f} {'new':>8}")
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {baseline[name] * 1000:>12.4f} {seconds * 1000:>12.4f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"comma-separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="approximate seconds per measurement")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with the baseline at PATH")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before --compare fails")
+    args = parser.parse_args()
+
+    unknown = [size for size in args.sizes.split(",") if size not in SIZES]
+    if unknown:
+        raise SystemExit(f"Unknown sizes: {', '.join(unknown)}")
+    sizes = {size: SIZES[size] for size in args.sizes.split(",")}
+
+    results = run(sizes, args.filter, args.min_time, args.repeats)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as output:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, output, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+End-to-end load benchmark: starts the fake upstream and the API (against a
+throwaway database) as uvicorn subprocesses, runs the load driver, prints the
+results and shuts both down.
+
+    cd api && python -m bench.run --concurrency 1,8,32 --duration 10 --latency-ms 50 --output results.json
+
+Upstream rate limits are lifted unless --keep-rate-limits is given, so the
+numbers measure the API rather than the configured quotas.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench import load
+
+API_DIR = Path(__file__).resolve().parent.parent
+RATE_LIMIT_VARIABLES = [
+    "OPEN_METEO_RATE_LIMIT", "GEOCODING_RATE_LIMIT", "ARCHIVE_RATE_LIMIT", "NOMINATIM_RATE_LIMIT", "YOUTUBE_RATE_LIMIT"
+]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Process serving {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit(f"Timed out waiting for {url}")
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load.add_arguments(parser)
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake upstream requests that fail")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the API")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep the configured upstream rate limits")
+    args = parser.parse_args()
+
+    upstream_port, api_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {**os.environ, "UPSTREAM_BASE_URL": upstream_url, "DB_PATH": os.path.join(workdir, "bench.db")}
+        if not args.keep_rate_limits:
+            env.update({name: "1000000" for name in RATE_LIMIT_VARIABLES})
+
+        upstream = subprocess.Popen([
+            sys.executable, "-m", "bench.fake_upstream", "--port", str(upstream_port),
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate), "--seed", str(args.seed)
+        ], cwd=API_DIR)
+        api = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port),
+            "--workers", str(args.workers), "--log-level", "warning"
+        ], cwd=API_DIR, env=env)
+
+        try:
+            wait_until_ready(f"{upstream_url}/__stats", upstream)
+            wait_until_ready(f"{api_url}/", api)
+            load.run_from_args(api_url, args)
+            print(f"\nUpstream requests: {httpx.get(f'{upstream_url}/__stats').json()}")
+        finally:
+            stop(api)
+            stop(upstream)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# Point the app at a throwaway database before app.config is imported
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "weather.db")
+os.environ["GAZETTEER_PATH"] = ""
+
+import httpx
+import pytest
+
+from app.repository.db import init_db
+
+init_db()
+
+class FakeUpstream:
+    """Stands in for upstream_client.get: answers from handler(upstream, url, params) and records each call"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    async def get(self, upstream, url, params=None, headers=None):
+        self.calls.append((upstream, params))
+        result = self.handler(upstream, url, params or {})
+        if isinstance(result, Exception):
+            raise result
+        return httpx.Response(200, content=json.dumps(result).encode("utf-8"), request=httpx.Request("GET", url))
+
+@pytest.fixture
+def fake_upstream(monkeypatch):
+    """Replace the shared upstream client's get() with a FakeUpstream around the given handler"""
+    from app.services.http_client import upstream_client
+
+    def install(handler):
+        fake = FakeUpstream(handler)
+        monkeypatch.setattr(upstream_client, "get", fake.get)
+        return fake
+    return install
+
+def run(coro):
+    return asyncio.run(coro)
+
+def archive_payload(start="2015-01-01", days=2, offset=0.0):
+    """An Open-Meteo archive response with `days` of hourly data; values follow the hour index"""
+    from datetime import date, timedelta
+    first = date.fromisoformat(start)
+    times = [f"{first + timedelta(days=hour // 24)}T{hour % 24:02d}:00" for hour in range(days * 24)]
+    return {
+        "latitude": 43.7, "longitude": -79.4, "timezone": "GMT",
+        "hourly": {
+            "time": times,
+            "temperature_2m": [round(offset + (hour % 24) / 2, 1) for hour in range(len(times))],
+            "precipitation": [0.5 if hour % 6 == 0 else 0.0 for hour in range(len(times))],
+            "wind_speed_10m": [10.0 + hour % 5 for hour in range(len(times))],
+        },
+    }
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+def open_meteo_response(params):
+    """Forecast API response for params: hourly + current or daily, a list for comma-separated coordinates"""
+    from bench.micro import daily_payload, hourly_payload
+    latitudes = str(params["latitude"]).split(",")
+    responses = [
+        {**(daily_payload(7) if "daily" in params else hourly_payload(2)), "latitude": float(latitude)}
+        for latitude in latitudes
+    ]
+    return responses if len(latitudes) > 1 else responses[0]
+
+@pytest.fixture
+def weather_cache():
+    """The upstream weather cache, emptied before and after the test"""
+    from app.services import weather_service
+    weather_service.weather_cache.clear()
+    yield weather_service.weather_cache
+    weather_service.weather_cache.clear()
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+
+from app import config
+from app.services import weather_service
+
+from conftest import archive_payload, run
+
+def archive(upstream, url, params):
+    days = (date.fromisoformat(params["end_date"]) - date.fromisoformat(params["start_date"])).days + 1
+    return archive_payload(params["start_date"], days)
+
+def test_only_missing_days_are_fetched(fake_upstream):
+    upstream = fake_upstream(archive)
+    first = run(weather_service.fetch_historical_weather(-60.0, 10.0, "2015-01-01", "2015-01-05"))
+    second = run(weather_service.fetch_historical_weather(-60.0, 10.0, "2015-01-03", "2015-01-08"))
+    assert [(params["start_date"], params["end_date"]) for _, params in upstream.calls] == [
+        ("2015-01-01", "2015-01-05"), ("2015-01-06", "2015-01-08")
+    ]
+    assert len(first["hourly"]["time"]) == 5 * 24
+    assert second["hourly"]["time"][0] == "2015-01-03T00:00" and second["hourly"]["time"][-1] == "2015-01-08T23:00"
+    assert second["timezone"] == "GMT"
+
+def test_fully_stored_ranges_make_no_upstream_call(fake_upstream):
+    upstream = fake_upstream(archive)
+    run(weather_service.fetch_historical_weather(-61.0, 11.0, "2016-03-01", "2016-03-02"))
+    again = run(weather_service.fetch_historical_weather(-61.0, 11.0, "2016-03-01", "2016-03-01"))
+    assert len(upstream.calls) == 1
+    assert again["hourly"]["temperature_2m"] == archive_payload("2016-03-01", 1)["hourly"]["temperature_2m"]
+
+def test_recent_days_are_not_stored(fake_upstream):
+    upstream = fake_upstream(archive)
+    today = date.today().isoformat()
+    for _ in range(2):
+        run(weather_service.fetch_historical_weather(-62.0, 12.0, today, today))
+    assert len(upstream.calls) == 2
+
+def test_small_gaps_are_merged_into_one_request(monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_GAP_MERGE_DAYS", 2)
+    days = [(date(2015, 1, 1) + timedelta(days=i)).isoformat() for i in range(10)]
+    stored = {days[2], days[3], days[6], days[7], days[8]}
+    assert weather_service._missing_ranges(days, stored) == [("2015-01-01", "2015-01-06"), ("2015-01-10", "2015-01-10")]
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from app.repository.db import run_db
+from app.services import weather_service
+from app.services.http_client import upstream_client
+
+from conftest import open_meteo_response, run
+
+def test_upstream_calls_for_different_locations_overlap(monkeypatch, weather_cache):
+    async def slow_get(upstream, url, params=None, headers=None):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=open_meteo_response(params), request=httpx.Request("GET", url))
+    monkeypatch.setattr(upstream_client, "get", slow_get)
+
+    async def fetch_all():
+        return await asyncio.gather(*(weather_service.fetch_current_weather(f"{10 + i},20") for i in range(5)))
+    start = time.perf_counter()
+    results = run(fetch_all())
+    assert len(results) == 5
+    assert time.perf_counter() - start < 0.6
+
+def test_blocking_database_work_runs_off_the_event_loop():
+    async def thread_names():
+        return threading.current_thread().name, await run_db(lambda: threading.current_thread().name)
+    loop_thread, db_thread = run(thread_names())
+    assert loop_thread != db_thread
+    assert db_thread.startswith("sqlite")
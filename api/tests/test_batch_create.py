@@ -0,0 +1,49 @@
+import json
+
+from app.repository import weather_repo
+from app.routes import history
+
+from conftest import archive_payload
+
+def test_create_records_returns_ids_in_order_with_derived_rows():
+    payloads = [archive_payload(days=3), archive_payload("2016-06-01", days=1)]
+    record_ids = weather_repo.create_records([
+        ("Toronto", "2015-01-01", "2015-01-03", json.dumps(payloads[0])),
+        ("Paris", "2016-06-01", "2016-06-01", json.dumps(payloads[1])),
+    ])
+    assert record_ids == sorted(record_ids)
+    assert [weather_repo.return_record(record_id)["location"] for record_id in record_ids] == ["Toronto", "Paris"]
+    assert len(weather_repo.read_observations(record_ids[0])) == 72
+    assert len(weather_repo.read_observations(record_ids[1])) == 24
+    assert [row[2] for row in weather_repo.read_daily_rollups(record_ids[0])] == [3]
+
+def test_batch_endpoint_reports_each_item(client, monkeypatch):
+    geocoded = []
+
+    async def geocode(location):
+        geocoded.append(location)
+        if location == "Nowhere":
+            raise ValueError("no match")
+        return 43.7, -79.4
+
+    async def archive(longitude, latitude, start_date, end_date):
+        return archive_payload(start_date, days=1)
+
+    monkeypatch.setattr(history, "geocode_location", geocode)
+    monkeypatch.setattr(history, "fetch_historical_weather", archive)
+    response = client.post("/api/weather/history/batch", json={"items": [
+        {"location": "Toronto", "start_date": "2020-01-01", "end_date": "2020-01-01"},
+        {"location": "toronto", "start_date": "2020-02-01", "end_date": "2020-02-01"},
+        {"location": "Nowhere", "start_date": "2020-01-01", "end_date": "2020-01-01"},
+        {"location": "Toronto", "start_date": "not a date", "end_date": "2020-01-01"},
+    ]})
+    data = response.json()["data"]
+    assert (data["created"], data["failed"]) == (2, 2)
+    assert [result["status"] for result in data["results"]] == ["success", "success", "error", "error"]
+    assert "Invalid location" in data["results"][2]["message"]
+    # Case variants of a location are geocoded once
+    assert sorted(location.lower() for location in geocoded) == ["nowhere", "toronto"]
+    assert weather_repo.return_record(data["results"][1]["id"])["start_date"] == "2020-02-01"
+
+def test_batch_endpoint_rejects_empty_batches(client):
+    assert client.post("/api/weather/history/batch", json={"items": []}).status_code == 422
@@ -0,0 +1,94 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from bench import load
+from bench.fake_upstream import create_app
+
+from conftest import run
+
+def test_percentile_is_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert load.percentile(values, 50) == 50.0
+    assert load.percentile(values, 99) == 99.0
+    assert load.percentile([7.0], 95) == 7.0
+    assert load.percentile([], 50) == 0.0
+
+def test_fake_upstream_adapts_fixtures_to_the_request():
+    client = TestClient(create_app())
+    single = client.get("/v1/forecast", params={"latitude": "43.7", "longitude": "-79.4", "current": "temperature_2m"}).json()
+    assert (single["latitude"], single["longitude"]) == (43.7, -79.4)
+    several = client.get("/v1/forecast", params={"latitude": "1,2", "longitude": "3,4", "daily": "temperature_2m_max"}).json()
+    assert [(item["latitude"], item["longitude"]) for item in several] == [(1, 3), (2, 4)]
+
+    archive = client.get("/v1/archive", params={
+        "latitude": "1", "longitude": "2", "start_date": "2023-03-01", "end_date": "2023-03-03"
+    }).json()
+    times = archive["hourly"]["time"]
+    assert times[0].startswith("2023-03-01") and times[-1].startswith("2023-03-03")
+    assert all(len(values) == len(times) for values in archive["hourly"].values())
+
+    unknown = client.get("/v1/search", params={"name": "Nowhereville"}).json()["results"]
+    assert unknown == client.get("/v1/search", params={"name": "nowhereville"}).json()["results"]
+    assert client.get("/__stats").json()["/v1/search"] == 2
+
+def test_fake_upstream_injects_failures():
+    client = TestClient(create_app(error_rate=1.0, error_status=502, seed=1))
+    assert client.get("/reverse", params={"lat": "1", "lon": "2"}).status_code == 502
+    assert client.get("/__stats").json() == {"/reverse": 1, "/reverse (error)": 1}
+
+@pytest.fixture
+def in_process(monkeypatch):
+    """Send the load driver's requests to an in-process app instead of over the network"""
+    async_client = httpx.AsyncClient
+
+    def install(app):
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: async_client(transport=httpx.ASGITransport(app=app), **kwargs))
+    return install
+
+def test_run_level_reports_requests_errors_and_percentiles(in_process, monkeypatch):
+    in_process(create_app(error_rate=0.5, seed=3))
+
+    async def scenario(request, rng):
+        await request("forecast", "GET", "/v1/forecast", params={"latitude": "1", "longitude": "2"})
+    monkeypatch.setitem(load.SCENARIOS, "fixture", scenario)
+
+    rows = run(load.run_level("http://bench", "fixture", 2, 0.2, seed=0))
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row["scenario"], row["endpoint"], row["concurrency"]) == ("fixture", "forecast", 2)
+    assert row["requests"] > 0 and 0 < row["errors"] < row["requests"]
+    assert row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"]
+
+def test_history_scenario_covers_single_and_batch_creates():
+    calls, created = [], {}
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, data):
+            self.data = data
+
+        def json(self):
+            return self.data
+
+    async def request(label, method, url, **kwargs):
+        calls.append((label, method, url))
+        if label == "history:create":
+            created.update(kwargs["json"])
+        if label == "history:create_batch":
+            return Response({"data": {"results": [{"status": "success", "id": 7}]}})
+        if label == "history:list":
+            return Response({"data": [{"id": 7, "location": "X", "start_date": "", "end_date": ""}, {"id": 8, **created}]})
+        return Response({})
+
+    run(load.scenario_history(request, load.random.Random(0)))
+    assert calls == [
+        ("history:create", "POST", "/api/weather/history"),
+        ("history:create_batch", "POST", "/api/weather/history/batch"),
+        ("history:list", "GET", "/api/weather/history"),
+        ("history:observations", "GET", "/api/weather/history/7/observations"),
+        ("history:update", "PUT", "/api/weather/history/7"),
+        ("history:delete", "DELETE", "/api/weather/history/7"),
+        ("history:delete", "DELETE", "/api/weather/history/8"),
+    ]
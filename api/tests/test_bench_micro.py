@@ -0,0 +1,47 @@
+import json
+import sys
+
+import pytest
+
+from bench import micro
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["micro", "--sizes", "1d", "--filter", "json_dumps", "--min-time", "0.001", "--repeats", "1", *args])
+    micro.main()
+
+def test_every_benchmark_runs_on_the_smallest_payload():
+    names = []
+    for name, func in micro.benchmarks({"1d": 1}):
+        func()
+        names.append(name)
+    assert len(names) == len(set(names)) and all(name.endswith("[1d]") for name in names)
+    assert "lttb_1000[1d]" in names
+
+def test_compare_flags_only_slowdowns_beyond_the_threshold(capsys):
+    baseline = {"fast": 1.0, "steady": 1.0, "slow": 1.0}
+    results = {"fast": 0.5, "steady": 1.09, "slow": 1.2, "added": 3.0}
+    assert micro.compare(results, baseline, 0.10) == ["slow"]
+    out = capsys.readouterr().out
+    assert "REGRESSION" in out and "new" in out
+
+def test_saved_baseline_round_trips_through_compare(monkeypatch, tmp_path):
+    path = tmp_path / "baseline.json"
+    run_main(monkeypatch, "--save-baseline", str(path))
+    saved = json.loads(path.read_text())
+    assert list(saved["results"]) == ["json_dumps[1d]"]
+
+    # Slower than the baseline by far more than any timing noise
+    saved["results"]["json_dumps[1d]"] /= 1000
+    path.write_text(json.dumps(saved))
+    with pytest.raises(SystemExit) as exited:
+        run_main(monkeypatch, "--compare", str(path))
+    assert exited.value.code == 1
+
+    saved["results"]["json_dumps[1d]"] *= 1_000_000
+    path.write_text(json.dumps(saved))
+    run_main(monkeypatch, "--compare", str(path))
+
+def test_unknown_sizes_are_rejected(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["micro", "--sizes", "1d,2d"])
+    with pytest.raises(SystemExit, match="Unknown sizes: 2d"):
+        micro.main()
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from app.services.cache import TTLCache
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache(default_ttl=60)
+    cache.set("default", 1)
+    cache.set("expired", 2, ttl=-1)
+    assert cache.get("default") == 1
+    assert cache.get("expired", "missing") == "missing"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_expired_entries_are_served_stale_within_stale_ttl():
+    cache = TTLCache(stale_ttl=60)
+    cache.set("key", "value", ttl=-1)
+    assert cache.get("key") is None
+    assert cache.get_stale("key") == ("value", False)
+    cache.set("gone", "value", ttl=-61)
+    assert cache.get_stale("gone") is None
+
+def test_expires_in():
+    cache = TTLCache()
+    cache.set("key", 1, ttl=30)
+    assert 29 < cache.expires_in("key") <= 30
+    assert cache.expires_in("missing") is None
+
+def test_expires_in_takes_the_lock():
+    cache = TTLCache()
+    cache.set("key", 1, ttl=30)
+    results = []
+    with cache._lock:
+        reader = threading.Thread(target=lambda: results.append(cache.expires_in("key")))
+        reader.start()
+        time.sleep(0.05)
+        assert results == []
+    reader.join(1)
+    assert len(results) == 1
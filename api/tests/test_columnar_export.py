@@ -0,0 +1,39 @@
+import io
+import json
+import sys
+
+import pyarrow
+import pyarrow.compute
+import pyarrow.ipc
+import pyarrow.parquet
+import pytest
+
+from app.repository import weather_repo
+
+from conftest import archive_payload
+
+@pytest.fixture
+def record_id():
+    return weather_repo.create_record("Columnar Town", "2015-01-01", "2015-01-02", json.dumps(archive_payload(days=2)))
+
+def test_parquet_export_of_a_record(client, record_id):
+    response = client.get(f"/api/weather/export/record/{record_id}/parquet")
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 48
+    assert table.column_names == ["record_id", "location", "time", "temperature_2m", "precipitation", "wind_speed_10m"]
+    assert table.column("location").to_pylist()[0] == "Columnar Town"
+    assert str(table.column("time")[1]) == "2015-01-01 01:00:00"
+
+def test_arrow_stream_export_of_everything(client, record_id):
+    response = client.get("/api/weather/export/arrow")
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    rows = table.filter(pyarrow.compute.equal(table.column("record_id"), record_id))
+    assert rows.num_rows == 48
+    assert rows.column("wind_speed_10m").to_pylist()[:3] == [10.0, 11.0, 12.0]
+
+def test_unknown_format_and_missing_pyarrow(client, record_id, monkeypatch):
+    assert client.get(f"/api/weather/export/record/{record_id}/xlsx").status_code == 404
+    for module in ("pyarrow", "pyarrow.compute", "pyarrow.parquet"):
+        monkeypatch.setitem(sys.modules, module, None)
+    assert client.get(f"/api/weather/export/record/{record_id}/parquet").status_code == 501
@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+from app.repository import weather_repo
+from app.services import weather_service
+
+from conftest import archive_payload, open_meteo_response, run
+
+@pytest.fixture
+def record_id():
+    record_id = weather_repo.create_record("Gzip City", "2015-01-01", "2015-01-30", json.dumps(archive_payload(days=30)))
+    yield record_id
+    weather_repo.delete_record(record_id)
+
+def test_negotiate_respects_q_values(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("*") == "gzip"
+    assert negotiate("*, gzip;q=0") is None
+    assert negotiate("") is None
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("br;q=0.5, gzip") == "gzip"
+
+def call(app, headers=None):
+    """Run an ASGI app for a GET /; returns the response start and the concatenated body chunks"""
+    messages = []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()]}
+
+    requests = [{"type": "http.request", "body": b""}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # Streaming responses listen for a disconnect until they finish
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+    run(app(scope, receive, send))
+    start = messages[0]
+    bodies = [message for message in messages[1:] if message["type"] == "http.response.body"]
+    return start, dict((k.decode(), v.decode()) for k, v in start["headers"]), bodies
+
+def test_small_bodies_are_sent_as_they_are():
+    app = CompressionMiddleware(PlainTextResponse("x" * 100, headers={"ETag": '"abc"'}), minimum_size=1024)
+    _, headers, bodies = call(app, {"accept-encoding": "gzip"})
+    assert "content-encoding" not in headers and headers["etag"] == '"abc"'
+    assert headers["vary"] == "Accept-Encoding" and bodies[0]["body"] == b"x" * 100
+
+def test_large_bodies_are_gzipped_with_a_distinct_etag():
+    def app():
+        return CompressionMiddleware(PlainTextResponse("x" * 5000, headers={"ETag": '"abc"'}), minimum_size=1024)
+    _, headers, bodies = call(app(), {"accept-encoding": "gzip"})
+    assert headers["content-encoding"] == "gzip" and headers["etag"] == '"abc-gzip"'
+    assert int(headers["content-length"]) == len(bodies[0]["body"])
+    assert gzip.decompress(bodies[0]["body"]) == b"x" * 5000
+    _, headers, _ = call(app())
+    assert "content-encoding" not in headers
+
+def test_streamed_bodies_are_flushed_chunk_by_chunk():
+    chunks = [f"line {index}\n".encode() for index in range(3)]
+
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    app = CompressionMiddleware(StreamingResponse(stream(), media_type="text/csv"), minimum_size=1024)
+    _, headers, bodies = call(app, {"accept-encoding": "gzip"})
+    assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+
+    decompressor = zlib.decompressobj(31)
+    # Every chunk decompresses completely as soon as it arrives
+    for chunk, body in zip(chunks, bodies):
+        assert decompressor.decompress(body["body"]) == chunk
+    assert gzip.decompress(b"".join(body["body"] for body in bodies)) == b"".join(chunks)
+
+def test_not_modified_gets_the_coded_tag_it_was_revalidated_with():
+    def not_modified():
+        return CompressionMiddleware(Response(status_code=304, headers={"ETag": '"abc"'}), minimum_size=0)
+    _, headers, _ = call(not_modified(), {"accept-encoding": "gzip", "if-none-match": '"abc-gzip"'})
+    assert headers["etag"] == '"abc-gzip"' and headers["vary"] == "Accept-Encoding"
+    _, headers, _ = call(not_modified(), {"accept-encoding": "gzip", "if-none-match": '"abc"'})
+    assert headers["etag"] == '"abc"'
+    _, headers, _ = call(not_modified(), {"if-none-match": '"abc-gzip"'})
+    assert headers["etag"] == '"abc"'
+
+def test_binary_and_error_responses_are_not_compressed():
+    for response in (PlainTextResponse("x" * 5000, media_type="application/octet-stream"), PlainTextResponse("x" * 5000, status_code=500)):
+        _, headers, _ = call(CompressionMiddleware(response, minimum_size=0), {"accept-encoding": "gzip"})
+        assert "content-encoding" not in headers and "vary" not in headers
+
+def test_observations_are_gzipped_and_revalidated(client, record_id):
+    url = f"/api/weather/history/{record_id}/observations"
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+    assert etag.endswith('-gzip"') and "Accept-Encoding" in response.headers["vary"]
+    assert len(response.json()["data"]) == 30 * 24
+
+    not_modified = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    # The 304 carries the validator the client cached from the compressed 200
+    assert not_modified.headers["etag"] == etag and "Accept-Encoding" in not_modified.headers["vary"]
+    identity = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == etag.replace("-gzip", "")
+    # The tag without the coding suffix matches too, and stays unsuffixed
+    revalidated = client.get(url, headers={"If-None-Match": identity.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == identity.headers["etag"]
+    # Another representation of the same records has its own tag
+    assert client.get(url, params={"resolution": "daily"}, headers={"If-None-Match": etag}).status_code == 200
+
+def test_record_tags_change_after_a_write(client, record_id):
+    etag = client.get("/api/weather/history").headers["etag"]
+    assert client.get("/api/weather/history", headers={"If-None-Match": etag}).status_code == 304
+    weather_repo.update_record(record_id, location="Gzip Town")
+    assert client.get("/api/weather/history", headers={"If-None-Match": etag}).status_code == 200
+
+def test_streamed_csv_export_decompresses_to_every_row(client, record_id):
+    response = client.get(f"/api/weather/export/record/{record_id}/csv", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert response.text.count("\n") == 30 * 24 + 1
+
+def test_markdown_export_has_a_weak_etag(client, record_id):
+    etag = client.get("/api/weather/export/markdown").headers["etag"]
+    assert etag.startswith("W/") and etag.endswith('-gzip"')
+    not_modified = client.get("/api/weather/export/markdown", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+
+def test_current_weather_is_tagged_by_body_and_cached_until_the_next_update(client, fake_upstream, weather_cache):
+    fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    response = client.get("/api/weather/current", params={"location": "43.7,-79.4"})
+    max_age = int(response.headers["cache-control"].split("=")[1])
+    assert 0 < max_age <= weather_service.config.CURRENT_CACHE_TTL
+    etag = response.headers["etag"]
+    again = client.get("/api/weather/current", params={"location": "43.7,-79.4"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.headers["etag"] == etag
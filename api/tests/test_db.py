@@ -0,0 +1,31 @@
+import threading
+
+from app import config
+from app.repository.db import get_connection, open_connection
+
+def test_connection_is_reused_per_thread():
+    assert get_connection() is get_connection()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not get_connection()
+
+def test_database_uses_wal_and_tuned_pragmas():
+    conn = get_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    synchronous = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}[conn.execute("PRAGMA synchronous").fetchone()[0]]
+    assert synchronous == config.SQLITE_SYNCHRONOUS
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == config.SQLITE_CACHE_SIZE
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+def test_streaming_connections_can_move_between_threads():
+    conn = open_connection()
+    try:
+        result = []
+        thread = threading.Thread(target=lambda: result.append(conn.execute("SELECT 1").fetchone()[0]))
+        thread.start()
+        thread.join()
+        assert result == [1]
+    finally:
+        conn.close()
@@ -0,0 +1,92 @@
+import json
+import math
+import threading
+
+import numpy as np
+
+from app.repository import weather_repo
+from app.services.downsample import downsample, downsample_rows, lttb_indices, resample
+
+from conftest import archive_payload, open_meteo_response
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[333], y[777] = 25.0, -25.0
+    indices = lttb_indices(x, y, 50).tolist()
+    assert len(indices) == 50 and indices == sorted(set(indices))
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 333 in indices and 777 in indices
+
+def test_lttb_skips_missing_values_unless_a_bucket_has_nothing_else():
+    y = np.array([1.0, np.nan, 5.0, np.nan, np.nan, np.nan, 2.0])
+    indices = lttb_indices(np.arange(7, dtype=float), y, 4).tolist()
+    assert indices[:2] == [0, 2] and indices[-1] == 6
+    assert lttb_indices(np.arange(5, dtype=float), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+
+def test_daily_resample_sums_precipitation_maxes_codes_and_averages_the_rest():
+    times = [f"2024-01-0{day}T{hour:02d}:00" for day in (1, 2) for hour in range(24)]
+    series = {
+        "temperature_2m": [float(hour) for hour in range(24)] + [None] * 23 + [4.0],
+        "precipitation": [0.5] * 48,
+        "weather_code": [0] * 47 + [95],
+    }
+    labels, resampled = resample(times, series, "daily")
+    assert labels == ["2024-01-01", "2024-01-02"]
+    assert resampled == {"temperature_2m": [11.5, 4.0], "precipitation": [12.0, 12.0], "weather_code": [0, 95]}
+
+def test_weekly_resample_starts_weeks_on_monday():
+    # 2024-01-01 was a Monday
+    times = ["2023-12-31T12:00", "2024-01-01T12:00", "2024-01-07T12:00", "2024-01-08T12:00"]
+    labels, resampled = resample(times, {"precipitation": [1, 2, 3, 4]}, "weekly")
+    assert labels == ["2023-12-25", "2024-01-01", "2024-01-08"]
+    assert resampled["precipitation"] == [1.0, 5.0, 4.0]
+
+def test_downsampled_series_stay_aligned():
+    times = [f"2024-01-01T{hour:02d}:00" for hour in range(24)]
+    series = {"temperature_2m": [math.sin(hour) for hour in range(24)], "hour": list(range(24))}
+    kept_times, kept = downsample(times, series, max_points=6)
+    assert len(kept_times) == 6
+    assert [int(time[11:13]) for time in kept_times] == kept["hour"]
+
+    rows = [{"time": time, "temperature_2m": value} for time, value in zip(times, series["temperature_2m"])]
+    assert downsample_rows(rows) is rows
+    assert len(downsample_rows(rows, max_points=5)) == 5
+    assert downsample_rows(rows, "daily") == [{"time": "2024-01-01", "temperature_2m": round(sum(series["temperature_2m"]) / 24, 2)}]
+
+def test_observations_endpoint_resamples_and_downsamples(client):
+    record_id = weather_repo.create_record("Chartville", "2015-01-01", "2015-01-10", json.dumps(archive_payload(days=10)))
+    try:
+        url = f"/api/weather/history/{record_id}/observations"
+        daily = client.get(url, params={"resolution": "daily"}).json()["data"]
+        assert len(daily) == 10 and daily[0]["time"] == "2015-01-01"
+        assert daily[0]["precipitation"] == 2.0 and daily[0]["temperature_2m"] == 5.75
+
+        points = client.get(url, params={"max_points": 20, "columns": "temperature_2m"}).json()["data"]
+        assert len(points) == 20 and points[0]["time"] == "2015-01-01T00:00" and points[-1]["time"] == "2015-01-10T23:00"
+
+        assert client.get(url, params={"max_points": 2}).status_code == 422
+        assert client.get(url, params={"resolution": "monthly"}).status_code == 422
+    finally:
+        weather_repo.delete_record(record_id)
+
+def test_observations_are_downsampled_off_the_sqlite_pool(client, monkeypatch):
+    record_id = weather_repo.create_record("Threadville", "2015-01-01", "2015-01-02", json.dumps(archive_payload(days=2)))
+    threads = []
+
+    def downsample_rows(rows, resolution, max_points):
+        threads.append(threading.current_thread().name)
+        return rows
+    monkeypatch.setattr("app.services.downsample.downsample_rows", downsample_rows)
+    try:
+        assert client.get(f"/api/weather/history/{record_id}/observations", params={"max_points": 10}).status_code == 200
+        assert len(threads) == 1 and not threads[0].startswith("sqlite")
+    finally:
+        weather_repo.delete_record(record_id)
+
+def test_current_weather_accepts_chart_parameters(client, fake_upstream, weather_cache):
+    fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    data = client.get("/api/weather/current", params={"location": "43.7,-79.4", "max_points": 5}).json()["data"]
+    assert len(data["hourly_times"]) == 5 and len(data["hourly_temperature"]) == 5
+    data = client.get("/api/weather/current", params={"location": "43.7,-79.4", "resolution": "daily"}).json()["data"]
+    assert all(len(time) == 10 for time in data["hourly_times"])
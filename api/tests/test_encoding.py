@@ -0,0 +1,59 @@
+import json
+
+from app.repository import weather_repo
+from app.repository.db import get_connection
+from app.repository.encoding import LEGACY_EMPTY, MAGIC, decode_weather_json, encode_weather_json
+
+from conftest import archive_payload
+
+def test_archive_response_round_trips():
+    payload = archive_payload(days=3)
+    payload["hourly"]["temperature_2m"][5] = None
+    payload["hourly"]["precise"] = [1.123456789] * 72
+    payload["hourly"]["weather_code"] = [3] * 72
+    payload["hourly_units"] = {"temperature_2m": "°C"}
+    encoded = encode_weather_json(json.dumps(payload))
+    assert encoded.startswith(MAGIC)
+    assert len(encoded) < len(json.dumps(payload)) / 2
+    assert json.loads(decode_weather_json(encoded)) == payload
+
+def test_mixed_int_and_float_series_keep_their_types():
+    payload = {"hourly": {
+        "time": ["2015-01-01T00:00", "2015-01-01T01:00", "2015-01-01T02:00", "2015-01-01T03:00"],
+        "mixed": [1, 2.5, None, 3.0],
+        "precise_mixed": [7, 0.123456789, 2, None],
+        "huge": [2 ** 60, 1.5, 0, 0],
+    }}
+    decoded = json.loads(decode_weather_json(encode_weather_json(json.dumps(payload))))
+    assert decoded == payload
+    assert [type(value) for value in decoded["hourly"]["mixed"]] == [int, float, type(None), float]
+    assert [type(value) for value in decoded["hourly"]["precise_mixed"][:3]] == [int, float, int]
+    assert decoded["hourly"]["huge"][0] == 2 ** 60
+
+def test_irregular_times_and_non_archive_text_round_trip():
+    payload = {"hourly": {"time": ["2015-01-01T00:00", "2015-01-01T05:00", "2015-01-01T06:00"], "label": ["a", "b", "c"]}}
+    assert json.loads(decode_weather_json(encode_weather_json(json.dumps(payload)))) == payload
+    assert decode_weather_json(encode_weather_json("not json")) == "not json"
+
+def test_empty_and_legacy_text_values_pass_through():
+    assert encode_weather_json("") == ""
+    assert encode_weather_json(None) is None
+    assert decode_weather_json('{"legacy": true}') == '{"legacy": true}'
+
+def test_migration_encodes_text_and_clears_legacy_empty_blobs():
+    text = json.dumps(archive_payload(days=1))
+    conn = get_connection()
+    with conn:
+        text_id = conn.execute(
+            "INSERT INTO weather_records (location, start_date, end_date, weather_json) VALUES ('Old', '2015-01-01', '2015-01-01', ?)", (text,)
+        ).lastrowid
+        empty_id = conn.execute(
+            "INSERT INTO weather_records (location, start_date, end_date, weather_json) VALUES ('Empty', '2015-01-01', '2015-01-01', ?)", (LEGACY_EMPTY,)
+        ).lastrowid
+    weather_repo.encode_stored_weather_json()
+    stored = dict(conn.execute("SELECT id, weather_json FROM weather_records WHERE id IN (?, ?)", (text_id, empty_id)).fetchall())
+    assert bytes(stored[text_id]).startswith(MAGIC)
+    assert stored[empty_id] == ""
+    assert json.loads(weather_repo.return_record(text_id)["weather_json"]) == json.loads(text)
+    has_weather_data = conn.execute("SELECT length(weather_json) > 0 FROM weather_records WHERE id = ?", (empty_id,)).fetchone()[0]
+    assert has_weather_data == 0
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.repository import weather_repo
+from app.routes.export import CSV_HEADER, _stream_csv
+
+from conftest import archive_payload
+
+@pytest.fixture
+def record_id():
+    return weather_repo.create_record("Export Town", "2015-01-01", "2015-01-02", json.dumps(archive_payload(days=2)))
+
+def test_record_csv_streams_every_hour(client, record_id):
+    response = client.get(f"/api/weather/export/record/{record_id}/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "Date" and len(rows) == 49
+    assert rows[1] == ["2015-01-01", "00:00", "0.0", "0.5", "10.0", "Export Town"]
+    assert rows[-1][:2] == ["2015-01-02", "23:00"]
+
+def test_record_exports_do_not_decode_weather_json(client, record_id, monkeypatch):
+    def fail(_):
+        raise AssertionError("weather_json decoded")
+    monkeypatch.setattr(weather_repo, "decode_weather_json", fail)
+    assert client.get(f"/api/weather/export/record/{record_id}/csv").status_code == 200
+    assert client.get(f"/api/weather/export/record/{record_id}/arrow").status_code == 200
+
+def test_record_exports_404(client):
+    empty_id = weather_repo.create_record("Empty", "2015-01-01", "2015-01-01", "")
+    assert client.get("/api/weather/export/record/999999/csv").status_code == 404
+    assert client.get(f"/api/weather/export/record/{empty_id}/csv").json()["detail"] == "No weather data available for this record"
+    assert client.get(f"/api/weather/export/record/{empty_id}/parquet").status_code == 404
+    weather_repo.delete_record(empty_id)
+
+def test_json_export_is_a_valid_array_with_parsed_weather(client, record_id):
+    records = json.loads(client.get("/api/weather/export/json").content)
+    exported = next(record for record in records if record["id"] == record_id)
+    assert exported["weather_data"]["hourly"]["time"][0] == "2015-01-01T00:00"
+
+def test_markdown_export_lists_records(client, record_id):
+    text = client.get("/api/weather/export/markdown").text
+    assert f"| {record_id} | Export Town | 2015-01-01 | 2015-01-02 |" in text
+    assert f"### Record {record_id}: Export Town" in text
+
+def test_csv_header_is_sent_before_any_row_is_read():
+    def rows():
+        raise AssertionError("rows read before the header was sent")
+        yield
+    header = next(_stream_csv(rows()))
+    assert header.decode("utf-8").rstrip("\r\n") == ",".join(CSV_HEADER)
+
+    chunks = list(_stream_csv(iter([(1, "Toronto", "2015-01-01T05:00", 1.5, 0.0, 10.0)])))
+    assert len(chunks) == 2 and chunks[1] == b"2015-01-01,05:00,1.5,0.0,10.0,Toronto\r\n"
+    assert len(list(_stream_csv(iter([])))) == 1
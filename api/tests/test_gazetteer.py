@@ -0,0 +1,151 @@
+import os
+import random
+import threading
+
+import pytest
+
+from app import config
+from app.services import gazetteer, location_search
+
+from conftest import run
+
+PLACES = [
+    ("Toronto", 43.70011, -79.4163, 2600000),
+    ("Mississauga", 43.5789, -79.6583, 700000),
+    ("Torbay", 47.66659, -52.73135, 7000),
+    ("Paris", 48.85341, 2.3488, 2100000),
+    ("Longyearbyen", 78.2232, 15.6267, 2000),
+    ("Suva", -18.14161, 178.44149, 77000),
+    ("Apia", -13.83333, -171.76666, 40000),
+]
+
+def geonames_line(geoname_id, name, latitude, longitude, population):
+    fields = [""] * 19
+    fields[0], fields[gazetteer.NAME], fields[gazetteer.ASCII_NAME] = str(geoname_id), name, name
+    fields[gazetteer.LATITUDE], fields[gazetteer.LONGITUDE] = str(latitude), str(longitude)
+    fields[gazetteer.COUNTRY_CODE], fields[gazetteer.POPULATION], fields[gazetteer.TIMEZONE] = "XX", str(population), "UTC"
+    return "\t".join(fields) + "\n"
+
+@pytest.fixture
+def index(tmp_path):
+    source = tmp_path / "cities.txt"
+    rng = random.Random(1)
+    places = PLACES + [(f"Town {i}", rng.uniform(40, 50), rng.uniform(-85, -70), rng.randint(0, 5000)) for i in range(2000)]
+    source.write_text("".join(geonames_line(i, *place) for i, place in enumerate(places)), encoding="utf-8")
+    gazetteer.build_index(str(source), str(tmp_path / "cities.idx"))
+    loaded = gazetteer.Gazetteer(str(tmp_path / "cities.idx"))
+    yield loaded, places
+    loaded.close()
+
+def test_prefix_search_ranks_by_population(index):
+    loaded, _ = index
+    assert [place["name"] for place in loaded.search("tor", 5)] == ["Toronto", "Torbay"]
+    assert loaded.search("nowhere") == []
+
+def test_nearest_matches_brute_force(index):
+    loaded, places = index
+    rng = random.Random(2)
+    points = [(rng.uniform(40, 50), rng.uniform(-85, -70)) for _ in range(200)] + [(0.0, 0.0)]
+    for (latitude, longitude), result in zip(points, loaded.nearest_many(points, 100)):
+        distance, name = min((gazetteer.haversine_km(latitude, longitude, lat, lon), name) for name, lat, lon, _ in places)
+        if distance > 100:
+            assert result is None
+        else:
+            assert result["name"] == name
+            assert result["distance_km"] == pytest.approx(distance, abs=0.01)
+
+def test_nearest_across_the_antimeridian_and_near_the_pole(index):
+    loaded, _ = index
+    suva, longyearbyen = loaded.nearest_many([(-18.1, -179.9), (78.5, 20.0)], 200)
+    assert suva["name"] == "Suva"
+    assert longyearbyen["name"] == "Longyearbyen"
+
+def test_reverse_geocoding_uses_the_loaded_gazetteer(index, monkeypatch):
+    loaded, _ = index
+    monkeypatch.setattr(gazetteer, "_gazetteer", loaded)
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_FALLBACK", False)
+    details = run(location_search.get_locations_details([(43.65, -79.38), (0.0, 0.0)]))
+    assert details[0]["name"] == "Toronto" and details[0]["latitude"] == 43.65
+    assert details[1] == {}
+
+def test_nearest_places_are_found_off_the_sqlite_pool(index, monkeypatch):
+    loaded, _ = index
+    threads = []
+
+    def nearest_many(points):
+        threads.append(threading.current_thread().name)
+        return [None for _ in points]
+    monkeypatch.setattr(gazetteer, "_gazetteer", loaded)
+    monkeypatch.setattr(gazetteer, "nearest_many", nearest_many)
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_FALLBACK", False)
+    run(location_search.get_locations_details([(1.0, 2.0)]))
+    assert len(threads) == 1 and not threads[0].startswith("sqlite")
+
+def test_nominatim_fallback_is_capped(index, fake_upstream, monkeypatch):
+    loaded, _ = index
+    monkeypatch.setattr(gazetteer, "_gazetteer", loaded)
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_FALLBACK", True)
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_BATCH_MAX", 2)
+    upstream = fake_upstream(lambda *_: {"display_name": "Open Sea", "address": {"city": "Open Sea"}})
+    details = run(location_search.get_locations_details([(43.65, -79.38)] + [(-60.0, -120.0 + i) for i in range(4)]))
+    assert details[0]["name"] == "Toronto"
+    assert [bool(result) for result in details[1:]] == [True, True, False, False]
+    assert len(upstream.calls) == 2
+
+def test_reverse_batches_are_limited_to_nominatim_size_without_a_gazetteer(client, index, fake_upstream, monkeypatch):
+    fake_upstream(lambda *_: {"display_name": "Somewhere", "address": {"city": "Somewhere"}})
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_BATCH_MAX", 2)
+    points = [{"latitude": 10.0 + i, "longitude": 20.0} for i in range(3)]
+    response = client.post("/api/location/reverse", json={"points": points})
+    assert response.status_code == 400 and response.json()["detail"] == "At most 2 points per request"
+    assert client.post("/api/location/reverse", json={"points": points[:2]}).status_code == 200
+
+    loaded, _ = index
+    monkeypatch.setattr(gazetteer, "_gazetteer", loaded)
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_NOMINATIM_FALLBACK", False)
+    assert client.post("/api/location/reverse", json={"points": points}).status_code == 200
+
+def springfields(tmp_path):
+    lines = []
+    for geoname_id, (admin1, population) in enumerate((("IL", 116000), ("MO", 169000), ("MA", 155000))):
+        fields = geonames_line(geoname_id, "Springfield", 40.0 + geoname_id, -90.0, population).rstrip("\n").split("\t")
+        fields[gazetteer.COUNTRY_CODE], fields[gazetteer.ADMIN1_CODE] = "US", admin1
+        lines.append("\t".join(fields) + "\n")
+    (tmp_path / "cities.txt").write_text("".join(lines), encoding="utf-8")
+    (tmp_path / "admin1CodesASCII.txt").write_text("US.IL\tIllinois\nUS.MO\tMissouri\nUS.MA\tMassachusetts\n", encoding="utf-8")
+    (tmp_path / "countryInfo.txt").write_text("#ISO\tISO3\tNum\tfips\tCountry\nUS\tUSA\t840\tUS\tUnited States\n", encoding="utf-8")
+    return tmp_path / "cities.txt"
+
+def test_qualifiers_filter_by_admin1_or_country(tmp_path):
+    source = springfields(tmp_path)
+    gazetteer.build_index(str(source), str(tmp_path / "cities.idx"))
+    loaded = gazetteer.Gazetteer(str(tmp_path / "cities.idx"))
+    assert [place["admin1"] for place in loaded.search("springfield")] == ["Missouri", "Massachusetts", "Illinois"]
+    assert [place["admin1"] for place in loaded.search("Springfield, ma")] == ["Massachusetts"]
+    assert [place["admin1"] for place in loaded.search("springfield, united states", 1)] == ["Missouri"]
+    loaded.close()
+
+def test_index_is_built_on_load_and_rebuilt_when_the_source_changes(tmp_path, monkeypatch):
+    source = springfields(tmp_path)
+    index_path = tmp_path / "cities.txt.idx"
+    monkeypatch.setattr(config, "GAZETTEER_PATH", str(source))
+    monkeypatch.setattr(config, "GAZETTEER_INDEX_PATH", str(index_path))
+    monkeypatch.setattr(gazetteer, "_gazetteer", None)
+    try:
+        assert gazetteer.load_gazetteer().place_count == 3
+        with open(source, "a", encoding="utf-8") as extra:
+            extra.write(geonames_line(9, "Shelbyville", 39.4, -88.8, 4000))
+        stat = index_path.stat()
+        os.utime(source, (stat.st_atime + 10, stat.st_mtime + 10))
+        assert gazetteer.load_gazetteer().place_count == 4
+    finally:
+        gazetteer._gazetteer.close()
+        gazetteer._gazetteer = None
+
+def test_search_locations_prefers_the_gazetteer(index, fake_upstream, monkeypatch):
+    loaded, _ = index
+    monkeypatch.setattr(gazetteer, "_gazetteer", loaded)
+    upstream = fake_upstream(lambda *_: {"results": []})
+    suggestions = run(location_search.search_locations("Toro", 5))
+    assert suggestions[0]["name"] == "Toronto" and suggestions[0]["search_query"] == "43.70011,-79.4163"
+    assert upstream.calls == []
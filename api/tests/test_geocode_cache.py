@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from app import config
+from app.repository import geocode_repo
+from app.services import geocode_cache, location_search, weather_service
+from app.services.resilience import UpstreamUnavailable
+
+from conftest import run
+
+@pytest.fixture(autouse=True)
+def empty_memory():
+    geocode_cache._memory.clear()
+
+def geocoding(upstream, url, params):
+    if params["name"].startswith("Atlantis"):
+        return {"results": []}
+    return {"results": [{"name": params["name"], "latitude": 43.7, "longitude": -79.4}]}
+
+def test_normalized_names_share_an_entry_that_survives_restarts(fake_upstream):
+    upstream = fake_upstream(geocoding)
+    assert run(weather_service.geocode_location("Geocode Town")) == (43.7, -79.4)
+    assert run(weather_service.geocode_location("  geocode   TOWN ")) == (43.7, -79.4)
+    geocode_cache._memory.clear()
+    assert run(weather_service.geocode_location("Geocode Town")) == (43.7, -79.4)
+    assert len(upstream.calls) == 1
+
+def test_not_found_is_cached_with_the_negative_ttl(fake_upstream):
+    upstream = fake_upstream(geocoding)
+    for _ in range(2):
+        with pytest.raises(ValueError, match="not found"):
+            run(weather_service.geocode_location("Atlantis"))
+    assert len(upstream.calls) == 1
+    row = geocode_repo.get_geocode(geocode_cache.FORWARD, "atlantis")
+    assert row["result_json"] is None
+    assert row["expires_at"] - time.time() <= config.GEOCODE_NEGATIVE_TTL
+
+def test_expired_rows_are_ignored():
+    geocode_repo.put_geocode(geocode_cache.FORWARD, "expired town", '{"latitude": 1, "longitude": 2}', time.time() - 1)
+    assert run(geocode_cache.lookup(geocode_cache.FORWARD, "expired town")) is None
+
+def test_unavailable_upstream_is_not_cached_as_not_found(fake_upstream):
+    upstream = fake_upstream(lambda *_: UpstreamUnavailable("geocoding", "circuit_open"))
+    with pytest.raises(UpstreamUnavailable):
+        run(weather_service.geocode_location("Atlantis Unavailable"))
+    assert run(geocode_cache.lookup(geocode_cache.FORWARD, "atlantis unavailable")) is None
+    assert len(upstream.calls) == 1
+
+def test_reverse_lookups_are_keyed_by_rounded_coordinates(fake_upstream, monkeypatch):
+    monkeypatch.setattr(config, "REVERSE_GEOCODE_PRECISION", 3)
+    upstream = fake_upstream(lambda *_: {"display_name": "Somewhere, Canada", "address": {"city": "Somewhere", "country": "Canada"}})
+    first = run(location_search.get_location_details(12.34561, 56.78901))
+    second = run(location_search.get_location_details(12.34558, 56.78899))
+    assert len(upstream.calls) == 1
+    assert first["name"] == second["name"] == "Somewhere"
+    assert second["latitude"] == 12.34558
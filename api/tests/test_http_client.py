@@ -0,0 +1,46 @@
+import httpx
+import pytest
+
+from app import config
+from app.services.http_client import UpstreamClient
+
+from conftest import run
+
+@pytest.fixture
+def created(monkeypatch):
+    """Make UpstreamClient's pools answer from a mock transport; yields the kwargs of each client created"""
+    clients = []
+    async_client = httpx.AsyncClient
+
+    def handler(request):
+        return httpx.Response(200, json={"path": request.url.path, "query": dict(request.url.params)})
+
+    def factory(**kwargs):
+        clients.append(kwargs)
+        return async_client(transport=httpx.MockTransport(handler), **kwargs)
+    monkeypatch.setattr(httpx, "AsyncClient", factory)
+    return clients
+
+def test_one_pool_per_upstream_is_reused(created):
+    client = UpstreamClient()
+
+    async def calls():
+        first = await client.get("open_meteo", "https://api.example/v1/forecast", params={"latitude": 1})
+        await client.get("open_meteo", "https://api.example/v1/forecast")
+        await client.get("geocoding", "https://geo.example/v1/search")
+        await client.aclose()
+        return first
+    assert run(calls()).json() == {"path": "/v1/forecast", "query": {"latitude": "1"}}
+    assert len(created) == 2
+
+def test_pools_use_the_configured_limits_and_timeouts(created):
+    client = UpstreamClient()
+    run(client.get("archive", "https://archive.example/v1/archive"))
+    connect, read = config.UPSTREAM_TIMEOUTS.get("archive", config.UPSTREAM_DEFAULT_TIMEOUT)
+    pool_maxsize = config.UPSTREAM_POOL_SIZES.get("archive", config.UPSTREAM_POOL_MAXSIZE)
+    assert created[0]["timeout"] == httpx.Timeout(read, connect=connect)
+    assert created[0]["limits"].max_keepalive_connections == pool_maxsize
+    stats = client.pool_stats()["archive"]
+    assert (stats["host"], stats["requests"], stats["in_flight"], stats["pool_maxsize"]) == ("archive.example", 1, 0, pool_maxsize)
+    run(client.aclose())
+    assert client.pool_stats() == {}
@@ -0,0 +1,44 @@
+from app.services import location_search
+
+from conftest import run
+
+def geocoding(*names):
+    return {"results": [{"name": name, "country": "Canada", "latitude": 1.0, "longitude": 2.0} for name in names]}
+
+def setup_function():
+    location_search._typeahead.clear()
+
+def test_results_are_cached_per_query_and_limit(fake_upstream):
+    upstream = fake_upstream(lambda *_: geocoding("Toronto", "Torbay"))
+    first = run(location_search.search_locations("Tor", 8))
+    assert run(location_search.search_locations("tor", 8)) == first
+    assert len(upstream.calls) == 1
+
+def test_complete_prefix_answers_longer_queries(fake_upstream):
+    upstream = fake_upstream(lambda *_: geocoding("Toronto", "Torbay"))
+    run(location_search.search_locations("Tor", 8))
+    assert [location["name"] for location in run(location_search.search_locations("Toro", 8))] == ["Toronto"]
+    assert len(upstream.calls) == 1
+
+def test_two_character_result_is_not_reused(fake_upstream):
+    # Upstream only exact-matches two-character names, so "To" says nothing about "Tor"
+    upstream = fake_upstream(lambda upstream, url, params: geocoding("To") if params["name"] == "To" else geocoding("Toronto"))
+    run(location_search.search_locations("To", 8))
+    assert [location["name"] for location in run(location_search.search_locations("Tor", 8))] == ["Toronto"]
+    assert len(upstream.calls) == 2
+
+def test_postal_code_matches_survive_narrowing(fake_upstream):
+    results = {"results": [{"name": "Toronto", "postcodes": ["M5V", "M5W"], "latitude": 1.0, "longitude": 2.0}]}
+    upstream = fake_upstream(lambda *_: results)
+    run(location_search.search_locations("M5", 8))
+    run(location_search.search_locations("M5V", 8))
+    assert [location["name"] for location in run(location_search.search_locations("M5V 2", 8))] == []
+    assert [location["name"] for location in run(location_search.search_locations("m5v", 3))] == ["Toronto"]
+    assert len(upstream.calls) == 2
+
+def test_complete_set_with_unexplained_matches_is_not_narrowed(fake_upstream):
+    # Matched on an alternate name upstream doesn't return; narrowing locally could drop it
+    upstream = fake_upstream(lambda *_: geocoding("München"))
+    run(location_search.search_locations("Mun", 8))
+    run(location_search.search_locations("Muni", 8))
+    assert len(upstream.calls) == 2
@@ -0,0 +1,41 @@
+import re
+
+from app import metrics
+from app.repository import weather_repo
+
+def sample(text, name):
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_histogram_seconds", "Test", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "a")
+    assert histogram.render()[2:] == [
+        'test_histogram_seconds_bucket{kind="a",le="0.1"} 1',
+        'test_histogram_seconds_bucket{kind="a",le="1.0"} 3',
+        'test_histogram_seconds_bucket{kind="a",le="+Inf"} 4',
+        'test_histogram_seconds_sum{kind="a"} 6.05',
+        'test_histogram_seconds_count{kind="a"} 4',
+    ]
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_escaped_total", "Test", ("path",))
+    counter.inc('a"b\\c\nd')
+    assert counter.render()[-1] == 'test_escaped_total{path="a\\"b\\\\c\\nd"} 1'
+
+def test_requests_are_labelled_by_route_template(client):
+    name = 'http_request_duration_seconds_count{method="GET",route="/api/weather/history/{record_id}/observations",status="404"}'
+    before = sample(client.get("/metrics").text, name)
+    client.get("/api/weather/history/123456/observations")
+    client.get("/api/weather/history/654321/observations")
+    text = client.get("/metrics").text
+    assert sample(text, name) == before + 2
+    assert "/api/weather/history/123456" not in text
+    assert client.get("/metrics").headers["content-type"].startswith("text/plain; version=0.0.4")
+
+def test_repository_calls_are_timed(client):
+    name = 'db_query_duration_seconds_count{function="count_records"}'
+    before = sample(client.get("/metrics").text, name)
+    weather_repo.count_records()
+    assert sample(client.get("/metrics").text, name) == before + 1
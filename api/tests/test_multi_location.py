@@ -0,0 +1,34 @@
+from app import config
+from app.services import weather_service
+
+from conftest import open_meteo_response, run
+
+def test_cache_misses_share_one_upstream_call(fake_upstream, weather_cache):
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    results = run(weather_service.fetch_current_weather_many(["51,0", "52,1", "51.01,0.01", "53,2"]))
+    assert len(upstream.calls) == 1
+    assert upstream.calls[0][1]["latitude"] == "51.0,52.0,53.0"
+    assert [result["status"] for result in results] == ["success"] * 4
+    assert [result["location"] for result in results] == ["51,0", "52,1", "51.01,0.01", "53,2"]
+
+def test_cached_cells_are_not_refetched(fake_upstream, weather_cache):
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    run(weather_service.fetch_5day_forecast("51,0"))
+    run(weather_service.fetch_5day_forecast_many(["51,0", "52,1"]))
+    assert [params["latitude"] for _, params in upstream.calls] == [51.0, "52.0"]
+
+def test_requests_are_chunked(fake_upstream, weather_cache, monkeypatch):
+    monkeypatch.setattr(config, "OPEN_METEO_MAX_LOCATIONS_PER_REQUEST", 2)
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    run(weather_service.fetch_current_weather_many(["10,0", "11,0", "12,0"]))
+    assert [params["latitude"] for _, params in upstream.calls] == ["10.0,11.0", "12.0"]
+
+def test_failures_are_reported_per_location(fake_upstream, weather_cache):
+    fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    results = run(weather_service.fetch_current_weather_many(["51,0", "95,0"]))
+    assert results[0]["status"] == "success"
+    assert results[1]["status"] == "error" and "Latitude" in results[1]["message"]
+
+def test_endpoint_limits_the_number_of_locations(client, monkeypatch):
+    monkeypatch.setattr(config, "MULTI_LOCATION_MAX", 2)
+    assert client.get("/api/weather/current/multi?locations=a&locations=b&locations=c").status_code == 400
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from app.repository import weather_repo
+from app.repository.db import get_connection
+
+from conftest import archive_payload
+
+@pytest.fixture
+def record_id():
+    record_id = weather_repo.create_record("Obs Town", "2015-01-01", "2015-01-02", json.dumps(archive_payload(days=2)))
+    yield record_id
+    weather_repo.delete_record(record_id)
+
+def test_hourly_series_are_stored_as_rows(record_id):
+    rows = weather_repo.read_observations(record_id)
+    assert len(rows) == 48
+    assert rows[1] == {"time": "2015-01-01T01:00", "temperature_2m": 0.5, "precipitation": 0.0, "wind_speed_10m": 11.0}
+
+def test_time_slices_and_column_subsets(record_id):
+    rows = weather_repo.read_observations(record_id, "2015-01-02T06:00", "2015-01-02", ["precipitation"])
+    assert [row["time"] for row in rows][:2] == ["2015-01-02T06:00", "2015-01-02T07:00"]
+    assert rows[-1]["time"] == "2015-01-02T23:00"
+    assert set(rows[0]) == {"time", "precipitation"}
+    with pytest.raises(ValueError):
+        weather_repo.read_observations(record_id, columns=["humidity"])
+
+def test_update_replaces_and_delete_removes_observations(record_id):
+    weather_repo.update_record(record_id, weather_json=json.dumps(archive_payload("2016-01-01", 1, offset=10)))
+    rows = weather_repo.read_observations(record_id)
+    assert len(rows) == 24 and rows[0] == {"time": "2016-01-01T00:00", "temperature_2m": 10.0, "precipitation": 0.5, "wind_speed_10m": 10.0}
+    weather_repo.delete_record(record_id)
+    assert weather_repo.read_observations(record_id) == []
+
+def test_backfill_fills_records_stored_before_the_table(record_id):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM weather_observations WHERE record_id = ?", (record_id,))
+    weather_repo.backfill_observations()
+    assert len(weather_repo.read_observations(record_id)) == 48
+
+def test_observations_endpoint(client, record_id):
+    response = client.get(f"/api/weather/history/{record_id}/observations?start=2015-01-02&columns=temperature_2m")
+    data = response.json()["data"]
+    assert len(data) == 24 and set(data[0]) == {"time", "temperature_2m"}
+    assert client.get(f"/api/weather/history/{record_id}/observations?columns=humidity").status_code == 400
+    assert client.get("/api/weather/history/999999/observations").status_code == 404
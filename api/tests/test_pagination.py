@@ -0,0 +1,33 @@
+import json
+
+from app.repository import weather_repo
+
+from conftest import archive_payload
+
+def test_pages_cover_every_record_once_newest_first(client):
+    for i in range(5):
+        weather_repo.create_record(f"Page Town {i}", "2015-01-01", "2015-01-01", json.dumps(archive_payload(days=1)))
+    everything = client.get("/api/weather/history?fields=id").json()["data"]
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/weather/history?limit=2&fields=id" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json()
+        assert len(page["data"]) <= 2
+        seen.extend(record["id"] for record in page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [record["id"] for record in everything]
+    assert seen[:5] == sorted(seen[:5], reverse=True)
+
+def test_fields_select_columns_without_weather_json(client):
+    weather_repo.create_record("Fields Town", "2015-01-01", "2015-01-01", json.dumps(archive_payload(days=1)))
+    record = client.get("/api/weather/history?limit=1&fields=location,has_weather_data").json()["data"][0]
+    assert set(record) == {"id", "created_at", "location", "has_weather_data"}
+    assert record["location"] == "Fields Town" and record["has_weather_data"] == 1
+
+def test_bad_cursors_and_fields_are_rejected(client):
+    assert client.get("/api/weather/history?cursor=not-a-cursor").status_code == 400
+    assert client.get("/api/weather/history?fields=id,password").status_code == 400
+    assert client.get("/api/weather/history?limit=0").status_code == 422
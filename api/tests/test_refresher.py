@@ -0,0 +1,98 @@
+import asyncio
+
+from app import config
+from app.services.cache import TTLCache
+from app.services.refresher import RefreshScheduler
+
+from conftest import run
+
+def scheduler(cache, **overrides):
+    settings = {"top_n": 10, "lead": 60, "budget_per_minute": 60, "interval": 5, "half_life": 600, **overrides}
+    return RefreshScheduler(cache, **settings)
+
+def refresher(cache, key, calls, ttl):
+    async def refresh():
+        calls.append(key)
+        cache.set(key, "new", ttl=ttl)
+    return refresh
+
+def test_default_lead_refreshes_ahead_of_expiry():
+    assert 0 < config.REFRESH_LEAD_SECONDS < config.CURRENT_CACHE_TTL
+
+def test_refreshes_entries_expiring_within_lead():
+    cache, calls = TTLCache(), []
+    refresh_scheduler = scheduler(cache)
+    cache.set("soon", "old", ttl=30)
+    cache.set("later", "old", ttl=600)
+    for key in ("soon", "later"):
+        refresh_scheduler.touch(key, refresher(cache, key, calls, ttl=900))
+    run(refresh_scheduler.tick())
+    assert calls == ["soon"]
+    assert cache.get("soon") == "new" and cache.get("later") == "old"
+
+def test_entry_refreshed_inside_the_window_waits_for_it_to_pass():
+    # A refresh just before an update boundary is cached only until the boundary
+    cache, calls = TTLCache(), []
+    refresh_scheduler = scheduler(cache)
+    cache.set("hot", "old", ttl=30)
+    refresh_scheduler.touch("hot", refresher(cache, "hot", calls, ttl=30))
+    run(refresh_scheduler.tick())
+    run(refresh_scheduler.tick())
+    assert calls == ["hot"]
+    refresh_scheduler._refreshed_at["hot"] -= 60
+    run(refresh_scheduler.tick())
+    assert calls == ["hot", "hot"]
+
+def test_budget_and_popularity_limit_refreshes():
+    cache, calls = TTLCache(), []
+    refresh_scheduler = scheduler(cache, budget_per_minute=2)
+    for key, requests in (("a", 5), ("b", 3), ("c", 1)):
+        cache.set(key, "old", ttl=10)
+        for _ in range(requests):
+            refresh_scheduler.touch(key, refresher(cache, key, calls, ttl=900))
+    run(refresh_scheduler.tick())
+    assert calls == ["a", "b"]
+    assert refresh_scheduler.stats()["over_budget"] == 1
+
+def test_failed_refresh_keeps_the_stale_entry():
+    cache = TTLCache(stale_ttl=600)
+    refresh_scheduler = scheduler(cache)
+    cache.set("key", "old", ttl=-1)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+    refresh_scheduler.touch("key", fail)
+    run(refresh_scheduler.tick())
+    assert cache.get_stale("key") == ("old", False)
+    assert refresh_scheduler.stats()["failed"] == 1
+
+def test_background_refresh_of_a_stale_entry():
+    cache, calls = TTLCache(stale_ttl=600), []
+    refresh_scheduler = scheduler(cache)
+    cache.set("key", "old", ttl=-1)
+    refresh_scheduler.touch("key", refresher(cache, "key", calls, ttl=900))
+
+    async def serve():
+        assert cache.get_stale("key") == ("old", False)
+        refresh_scheduler.refresh_in_background("key")
+        await asyncio.gather(*refresh_scheduler._background)
+    run(serve())
+    assert cache.get_stale("key") == ("new", True)
+
+def test_background_refreshes_share_the_budget():
+    cache, calls = TTLCache(stale_ttl=600), []
+    refresh_scheduler = scheduler(cache, budget_per_minute=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, "old", ttl=-1)
+        refresh_scheduler.touch(key, refresher(cache, key, calls, ttl=900))
+
+    async def serve():
+        for key in ("a", "a", "b", "c"):
+            refresh_scheduler.refresh_in_background(key)
+        await asyncio.gather(*refresh_scheduler._background)
+        await refresh_scheduler.tick()
+    run(serve())
+    # "a" was already being refreshed; "c" found the budget spent and stays stale
+    assert calls == ["a", "b"]
+    assert cache.get_stale("c") == ("old", False)
+    assert refresh_scheduler.stats()["over_budget"] == 2
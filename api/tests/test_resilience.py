@@ -0,0 +1,153 @@
+import httpx
+import pytest
+
+from app import config
+from app.services import resilience
+from app.services.http_client import UpstreamClient
+from app.services.resilience import CircuitBreaker, TokenBucket, UpstreamUnavailable
+
+from conftest import run
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock.monotonic)
+    return clock
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    """Answer UpstreamClient's requests with respond(request); yields the requests made"""
+    requests = []
+    async_client = httpx.AsyncClient
+
+    def install(respond):
+        def handler(request):
+            requests.append(request)
+            return respond(request)
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kwargs: async_client(transport=httpx.MockTransport(handler), **kwargs))
+        return requests
+    return install
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve(0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(0.1) is None
+    assert bucket.reserve(0.5) == pytest.approx(0.5)
+    clock.now += 1
+    assert bucket.reserve(0) == 0.0
+
+def test_breaker_opens_after_consecutive_failures_and_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+def test_unanswered_probe_does_not_block_recovery(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    clock.now += 5
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+
+def test_retry_after_keeps_the_circuit_open_that_long(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10)
+    breaker.record_failure(retry_after=60)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_client_rejects_calls_while_the_circuit_is_open(mock_upstream):
+    requests = mock_upstream(lambda request: httpx.Response(429, headers={"Retry-After": "120"}))
+    client = UpstreamClient()
+
+    async def calls():
+        first = await client.get("open_meteo", "https://api.example/v1/forecast")
+        with pytest.raises(UpstreamUnavailable) as rejected:
+            await client.get("open_meteo", "https://api.example/v1/forecast")
+        stats = client.pool_stats()["open_meteo"]
+        await client.aclose()
+        return first, rejected.value, stats
+    first, rejected, stats = run(calls())
+    assert first.status_code == 429 and len(requests) == 1
+    assert (rejected.upstream, rejected.reason) == ("open_meteo", "circuit_open")
+    assert isinstance(rejected, httpx.HTTPError)
+    assert (stats["circuit"], stats["circuit_open"]) == ("open", 1)
+
+def test_client_errors_do_not_open_the_circuit(mock_upstream, monkeypatch):
+    monkeypatch.setattr(config, "UPSTREAM_BREAKER_FAILURES", 1)
+    requests = mock_upstream(lambda request: httpx.Response(404))
+    client = UpstreamClient()
+
+    async def calls():
+        for _ in range(3):
+            await client.get("geocoding", "https://geo.example/v1/search")
+        await client.aclose()
+    run(calls())
+    assert len(requests) == 3
+
+def test_client_rejects_calls_beyond_the_rate_limit(mock_upstream, monkeypatch):
+    monkeypatch.setitem(config.UPSTREAM_RATE_LIMITS, "nominatim", (0.01, 1))
+    monkeypatch.setattr(config, "UPSTREAM_RATE_LIMIT_MAX_WAIT", 0.1)
+    requests = mock_upstream(lambda request: httpx.Response(200))
+    client = UpstreamClient()
+
+    async def calls():
+        await client.get("nominatim", "https://osm.example/reverse")
+        with pytest.raises(UpstreamUnavailable, match="rate limited"):
+            await client.get("nominatim", "https://osm.example/reverse")
+        stats = client.pool_stats()["nominatim"]
+        await client.aclose()
+        return stats
+    stats = run(calls())
+    assert len(requests) == 1 and stats["rate_limited"] == 1
+
+def test_rate_limited_probe_does_not_keep_the_circuit_half_open(mock_upstream, monkeypatch, clock):
+    monkeypatch.setitem(config.UPSTREAM_RATE_LIMITS, "nominatim", (1, 1))
+    monkeypatch.setattr(config, "UPSTREAM_RATE_LIMIT_MAX_WAIT", 0)
+    monkeypatch.setattr(config, "UPSTREAM_BREAKER_RESET_SECONDS", 30)
+    statuses = iter([503, 200])
+    requests = mock_upstream(lambda request: httpx.Response(next(statuses), headers={"Retry-After": "30"}))
+    client = UpstreamClient()
+
+    async def calls():
+        await client.get("nominatim", "https://osm.example/reverse")
+        clock.now += 30
+        # The breaker lets a probe through, but the rate limiter has no token yet
+        client._limiters["nominatim"]._tokens = 0
+        client._limiters["nominatim"]._updated = clock.now
+        with pytest.raises(UpstreamUnavailable, match="rate limited"):
+            await client.get("nominatim", "https://osm.example/reverse")
+        clock.now += 1
+        probe = await client.get("nominatim", "https://osm.example/reverse")
+        stats = client.pool_stats()["nominatim"]
+        await client.aclose()
+        return probe, stats
+    probe, stats = run(calls())
+    assert probe.status_code == 200 and len(requests) == 2
+    assert stats["circuit"] == "closed"
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import weather_service
+from app.services.http_client import upstream_client
+from app.services.singleflight import SingleFlight
+
+from conftest import open_meteo_response, run
+
+def test_concurrent_callers_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def callers():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+    assert run(callers()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "shared": 4}
+
+def test_exceptions_are_shared_and_not_remembered():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def callers():
+        return await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in run(callers()))
+
+    async def succeed():
+        return "ok"
+    assert run(flight.do("key", succeed)) == "ok"
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def callers():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    assert run(callers()) == "done"
+
+def test_identical_weather_requests_make_one_upstream_call(monkeypatch, weather_cache):
+    calls = []
+
+    async def slow_get(upstream, url, params=None, headers=None):
+        calls.append(params)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=open_meteo_response(params), request=httpx.Request("GET", url))
+    monkeypatch.setattr(upstream_client, "get", slow_get)
+
+    async def fetch_all():
+        return await asyncio.gather(*(weather_service.fetch_current_weather("30,40") for _ in range(10)))
+    assert len(run(fetch_all())) == 10
+    assert len(calls) == 1
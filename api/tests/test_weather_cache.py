@@ -0,0 +1,44 @@
+import asyncio
+
+from app import config
+from app.services import weather_service
+
+from conftest import open_meteo_response, run
+
+def test_nearby_coordinates_share_a_grid_cell(fake_upstream, weather_cache):
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    first = run(weather_service.fetch_current_weather("43.71,-79.41"))
+    second = run(weather_service.fetch_current_weather("43.69,-79.38"))
+    assert len(upstream.calls) == 1
+    assert upstream.calls[0][1]["latitude"] == 43.7 and upstream.calls[0][1]["longitude"] == -79.4
+    assert first["stale"] is False and second["hourly_temperature"] == first["hourly_temperature"]
+
+def test_current_and_forecast_are_cached_separately(fake_upstream, weather_cache):
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    run(weather_service.fetch_current_weather("43.7,-79.4"))
+    forecast = run(weather_service.fetch_5day_forecast("43.7,-79.4"))
+    run(weather_service.fetch_5day_forecast("43.7,-79.4"))
+    assert len(upstream.calls) == 2
+    assert len(forecast["forecast"]) == 5
+
+def test_entries_expire_at_the_next_update_boundary(fake_upstream, weather_cache):
+    fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    run(weather_service.fetch_current_weather("43.7,-79.4"))
+    key = weather_service._cache_key(43.7, -79.4, weather_service.CURRENT_PARAMS)
+    assert 0 < weather_cache.expires_in(key) <= config.CURRENT_CACHE_TTL
+    assert weather_service.client_max_age(config.CURRENT_CACHE_TTL, False) <= config.CURRENT_CACHE_TTL
+    assert weather_service.client_max_age(config.CURRENT_CACHE_TTL, True) == 0
+
+def test_expired_entry_is_served_stale_while_refreshing(fake_upstream, weather_cache):
+    upstream = fake_upstream(lambda upstream, url, params: open_meteo_response(params))
+    key = weather_service._cache_key(43.7, -79.4, weather_service.CURRENT_PARAMS)
+
+    async def fetch_twice():
+        await weather_service.fetch_current_weather("43.7,-79.4")
+        weather_cache.set(key, weather_cache.get(key), ttl=-1)
+        stale = await weather_service.fetch_current_weather("43.7,-79.4")
+        await asyncio.gather(*weather_service.refresh_scheduler._background)
+        return stale
+    assert run(fetch_twice())["stale"] is True
+    assert len(upstream.calls) == 2
+    assert weather_cache.get_stale(key)[1] is True
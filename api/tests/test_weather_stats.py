@@ -0,0 +1,117 @@
+import json
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+from app.repository import weather_repo
+from app.repository.rollups import daily_rollup_row
+from app.services.weather_stats import aggregate
+
+from conftest import archive_payload
+
+def random_hourly(start, days, seed):
+    """Hourly series with gaps (None) in every variable"""
+    rng = random.Random(seed)
+    first = date.fromisoformat(start)
+    times = [f"{first + timedelta(days=hour // 24)}T{hour % 24:02d}:00" for hour in range(days * 24)]
+
+    def series(low, high):
+        return [None if rng.random() < 0.1 else round(rng.uniform(low, high), 1) for _ in times]
+    return {"time": times, "temperature_2m": series(-10, 30), "precipitation": series(0, 3), "wind_speed_10m": series(0, 40)}
+
+def rollup(record_id, location, hourly):
+    _, _, _, days, blob = daily_rollup_row(record_id, hourly)
+    return record_id, location, days, blob
+
+def brute_force_by_month(hourly, base):
+    """Monthly stats of one record computed directly from its hours"""
+    months = defaultdict(lambda: defaultdict(list))
+    for index, time in enumerate(hourly["time"]):
+        month = months[time[:7]]
+        month["days"].append(time[:10])
+        for name in ("temperature_2m", "precipitation", "wind_speed_10m"):
+            if hourly[name][index] is not None:
+                month[name].append(hourly[name][index])
+        if hourly["temperature_2m"][index] is not None:
+            month[f"temp:{time[:10]}"].append(hourly["temperature_2m"][index])
+
+    results = {}
+    for label, month in months.items():
+        temps, precip, wind = month["temperature_2m"], month["precipitation"], month["wind_speed_10m"]
+        midpoints = [(min(values) + max(values)) / 2 for key, values in month.items() if key.startswith("temp:")]
+        results[label] = {
+            "days": len(set(month["days"])),
+            "hours": len(month["days"]),
+            "temp_min": min(temps),
+            "temp_max": max(temps),
+            "temp_mean": sum(temps) / len(temps),
+            "precip_total": sum(precip),
+            "wind_max": max(wind),
+            "wind_mean": sum(wind) / len(wind),
+            "heating_degree_days": sum(max(base - midpoint, 0) for midpoint in midpoints),
+            "cooling_degree_days": sum(max(midpoint - base, 0) for midpoint in midpoints),
+        }
+    return results
+
+def test_monthly_stats_match_a_brute_force_computation():
+    hourly = [random_hourly("2023-01-20", 45, seed=1), random_hourly("2023-02-25", 10, seed=2)]
+    rows = [rollup(8, "Oslo", hourly[0]), rollup(7, "Bergen", hourly[1])]
+
+    stats = aggregate(rows, "month", "record", base=15.0)
+    assert [(row["record_id"], row["period"]) for row in stats] == [
+        (8, "2023-01"), (8, "2023-02"), (8, "2023-03"), (7, "2023-02"), (7, "2023-03")
+    ]
+    for row in stats:
+        expected = brute_force_by_month(hourly[0 if row["record_id"] == 8 else 1], 15.0)[row["period"]]
+        for name, value in expected.items():
+            assert row[name] == pytest.approx(value, abs=0.01), (row["period"], name)
+
+def test_overlapping_days_of_a_location_count_once_from_the_newest_record():
+    older = archive_payload("2015-01-01", days=3, offset=0.0)["hourly"]
+    newer = archive_payload("2015-01-02", days=3, offset=10.0)["hourly"]
+    rows = [rollup(2, "Toronto", newer), rollup(1, "toronto", older)]
+
+    (total,) = aggregate(rows, "all", "location", base=18.0)
+    assert (total["period"], total["days"], total["hours"]) == ("all", 4, 96)
+    assert total["precip_total"] == 4 * 4 * 0.5
+    days = aggregate(rows, "day", "location", base=18.0)
+    assert [row["temp_min"] for row in days] == [0.0, 10.0, 10.0, 10.0]
+
+    by_record = aggregate(rows, "all", "record", base=18.0)
+    assert [(row["record_id"], row["days"]) for row in by_record] == [(2, 3), (1, 3)]
+
+def test_day_range_and_validation():
+    rows = [rollup(1, "Toronto", archive_payload("2015-01-01", days=5)["hourly"])]
+    (row,) = aggregate(rows, "all", "record", 18.0, start_day="2015-01-02", end_day="2015-01-03")
+    assert row["days"] == 2
+    assert aggregate(rows, "all", "record", 18.0, start_day="2016-01-01") == []
+    assert aggregate([], "month", "location", 18.0) == []
+    with pytest.raises(ValueError, match="Unknown period"):
+        aggregate(rows, "week", "record", 18.0)
+    with pytest.raises(ValueError, match="Unknown group_by"):
+        aggregate(rows, "all", "country", 18.0)
+
+def test_stats_endpoints(client):
+    older = weather_repo.create_record("Statsville", "2015-01-01", "2015-01-02", json.dumps(archive_payload("2015-01-01", 2)))
+    newer = weather_repo.create_record("statsville", "2015-01-02", "2015-01-03", json.dumps(archive_payload("2015-01-02", 2, 5.0)))
+    try:
+        data = client.get("/api/weather/stats", params={"location": "Statsville", "period": "all"}).json()["data"]
+        assert len(data) == 1 and data[0]["days"] == 3
+
+        data = client.get("/api/weather/stats", params={"location": "Statsville", "group_by": "record", "period": "day"}).json()["data"]
+        assert {(row["record_id"], row["period"]) for row in data} == {
+            (older, "2015-01-01"), (older, "2015-01-02"), (newer, "2015-01-02"), (newer, "2015-01-03")
+        }
+
+        data = client.get(f"/api/weather/stats/record/{older}", params={"base": 5}).json()["data"]
+        assert [row["period"] for row in data] == ["2015-01-01", "2015-01-02"]
+        # Days run from 0 to 11.5 °C: midpoint 5.75
+        assert data[0]["cooling_degree_days"] == 0.75
+
+        assert client.get("/api/weather/stats", params={"period": "week"}).status_code == 400
+        assert client.get("/api/weather/stats/record/999999").status_code == 404
+    finally:
+        weather_repo.delete_record(older)
+        weather_repo.delete_record(newer)
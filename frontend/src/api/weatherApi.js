@@ -22,8 +22,11 @@ export const getForecast = async (location) => {
 };
 
 // History CRUD operations
+// The list view only needs record metadata, not the stored weather data itself
+const HISTORY_LIST_FIELDS = 'id,location,start_date,end_date,created_at,has_weather_data';
+
 export const getAllWeatherRecords = async () => {
-  const response = await api.get('/api/weather/history');
+  const response = await api.get(`/api/weather/history?fields=${HISTORY_LIST_FIELDS}`);
   return response.data;
 };
 
@@ -188,7 +188,7 @@ function WeatherHistory() {
 - **Location**: ${record.location}
 - **Date Range**: ${record.start_date} to ${record.end_date}
 - **Created**: ${record.created_at}
-- **Weather Data**: ${record.weather_json ? 'Available' : 'Not available'}
+- **Weather Data**: ${record.has_weather_data ? 'Available' : 'Not available'}
 
 ## Export Information
 - **Exported on**: ${new Date().toLocaleString()}
@@ -313,7 +313,7 @@ function WeatherHistory() {
               </div>
               <div className="detail-item">
                 <span className="label">Weather Data:</span>
-                <span>{record.weather_json ? '✅ Available' : '❌ Not available'}</span>
+                <span>{record.has_weather_data ? '✅ Available' : '❌ Not available'}</span>
               </div>
             </div>
             